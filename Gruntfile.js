@@ -4,25 +4,27 @@ module.exports = function(grunt) {
     var debug = typeof grunt.option('dev') !== 'undefined';
 
     grunt.loadNpmTasks('grunt-browserify');
+    grunt.loadNpmTasks('grunt-contrib-uglify');
     grunt.loadNpmTasks('grunt-contrib-watch');
 
-    grunt.registerTask('js', ['browserify:bundle']);
+    grunt.registerTask('js', debug ? ['browserify'] : ['browserify', 'uglify']);
     grunt.registerTask('default', ['js']);
 
     var files = grunt.file.expand(
         'vegancity/js/src/**/*.js'
     );
 
-    var aliases = [
-        './vegancity/js/lib/jquery.js:jquery'
-    ];
+    // each page loads only the bundle it needs. collectstatic gives
+    // them hashed names, see vegancity/storage.py.
+    var bundles = {
+        map: ['map.js', 'vendors.js'],
+        forms: ['review_form.js', 'vendor_form.js'],
+        profile: ['profile_page.js']
+    };
 
-    var aliasMappings = [
-        {
-            cwd: 'vegancity/js/src',
-            src: '**/*.js',
-            dest: 'vegancity'
-        }
+    // jQuery comes from the CDN in base.html, don't bundle it again.
+    var aliases = [
+        './vegancity/js/lib/jquery_global.js:jquery'
     ];
 
     var shim = {
@@ -32,19 +34,41 @@ module.exports = function(grunt) {
         }
     };
 
-    grunt.initConfig({
-        browserify: {
-            bundle: {
-                src: files,
-                dest: './vegancity/static/js/bundle.js',
-                options: {
-                    alias: aliases,
-                    aliasMappings: aliasMappings,
-                    shim: shim,
-                    debug: debug
-                }
+    function bundleDest(name) {
+        return './vegancity/static/js/' + name + '.js';
+    }
+
+    var browserify = {},
+        uglify = {};
+
+    Object.keys(bundles).forEach(function (name) {
+        browserify[name] = {
+            src: bundles[name].map(function (file) {
+                return 'vegancity/js/src/' + file;
+            }),
+            dest: bundleDest(name),
+            options: {
+                alias: aliases,
+                aliasMappings: [
+                    {
+                        cwd: 'vegancity/js/src',
+                        src: bundles[name],
+                        dest: 'vegancity'
+                    }
+                ],
+                shim: shim,
+                debug: debug
             }
-        },
+        };
+        uglify[name] = {
+            src: bundleDest(name),
+            dest: bundleDest(name)
+        };
+    });
+
+    grunt.initConfig({
+        browserify: browserify,
+        uglify: uglify,
         watch: {
             options: {
                 spawn: false
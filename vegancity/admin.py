@@ -27,6 +27,36 @@ from django.contrib.auth.models import User
 import models
 import forms
 
+from vegancity import moderation
+from vegancity.fields import StatusField as SF
+
+#####################################
+## BULK ACTIONS
+#####################################
+
+
+def _set_status(modeladmin, request, queryset, status, verb):
+    ids = list(queryset.values_list('pk', flat=True))
+    changed = moderation.set_status(queryset.model, ids, status)
+
+    message = "%d %s %s." % (len(changed),
+                             queryset.model._meta.verbose_name_plural,
+                             verb)
+    if len(changed) < len(ids):
+        message += (" %d were skipped because they were not pending."
+                    % (len(ids) - len(changed)))
+    modeladmin.message_user(request, message)
+
+
+def approve_selected(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, SF.APPROVED, "approved")
+approve_selected.short_description = "Approve selected pending items"
+
+
+def quarantine_selected(modeladmin, request, queryset):
+    _set_status(modeladmin, request, queryset, SF.QUARANTINED, "quarantined")
+quarantine_selected.short_description = "Quarantine selected pending items"
+
 #####################################
 ## MODEL ADMIN CLASSES
 #####################################
@@ -38,6 +68,8 @@ class ReviewAdmin(admin.ModelAdmin):
 
                     )
     list_filter = ('approval_status', 'unlisted_vegan_dish')
+    list_select_related = True
+    actions = [approve_selected, quarantine_selected]
     form = forms.AdminEditReviewForm
 
 
@@ -57,9 +89,23 @@ class VendorAdmin(GeoModelAdmin):
                     'created', 'submitted_by', 'neighborhood')
     list_filter = ('approval_status', 'submitted_by')
     ordering = ('name',)
+    list_select_related = True
+    actions = [approve_selected, quarantine_selected]
     form = AdminVendorForm
 
 
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'status', 'attempts',
+                    'created', 'sent')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('created', 'sent', 'last_error')
+
+
+class SearchSynonymAdmin(admin.ModelAdmin):
+    list_display = ('term', 'synonym', 'created')
+    search_fields = ('term', 'synonym')
+
+
 class UserProfileInline(admin.StackedInline):
     model = models.UserProfile
 
@@ -87,3 +133,5 @@ admin.site.register(models.VeganDish, VeganDishAdmin)
 admin.site.register(models.CuisineTag)
 admin.site.register(models.FeatureTag)
 admin.site.register(models.Neighborhood)
+admin.site.register(models.OutboundEmail, OutboundEmailAdmin)
+admin.site.register(models.SearchSynonym, SearchSynonymAdmin)
@@ -15,61 +15,260 @@
 # You should have received a copy of the GNU General Public License
 # along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.http import HttpResponse
-from django.shortcuts import render_to_response
+import datetime
+import itertools
+
+import dateutil.parser
+
+from django.core.urlresolvers import reverse
+from django.db.models import Avg, Count
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         StreamingHttpResponse)
+from django.shortcuts import redirect, render_to_response
 from django.template import RequestContext
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
 
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 
+from tastypie.exceptions import BadRequest
+
 import models
 
-from djqscsv import render_to_csv_response
+from vegancity import moderation, streaming
+from vegancity.fields import StatusField as SF
 
 
 @staff_member_required
 def pending_approval_count(request):
-    pending_vendor_count = models.Vendor.objects.pending_approval().count()
-    pending_review_count = models.Review.objects.pending_approval().count()
-    return HttpResponse(str(pending_vendor_count + pending_review_count))
+    return HttpResponse(str(moderation.pending_count()))
+
+
+def _queue_page(queue, request_data):
+    paginator = moderation.QueuePaginator(
+        request_data, queue.items(),
+        resource_uri=reverse('pending_approval_queue', args=[queue.name]),
+        limit=moderation.QUEUE_PAGE_SIZE,
+        max_limit=moderation.QUEUE_PAGE_SIZE)
+    page = paginator.page()
+    return {
+        'name': queue.name,
+        'title': queue.title,
+        'items': page['objects'],
+        'next': page['meta']['next'],
+    }
 
 
 @staff_member_required
 def pending_approval(request):
-    pending_vendors = models.Vendor.objects.pending_approval()
-    pending_reviews = models.Review.objects.pending_approval()
+    queues = [_queue_page(moderation.QUEUES[name], {})
+              for name in ('vendors', 'reviews')]
+    ctx = {
+        'pending_count': moderation.pending_count(),
+        'queues': queues,
+    }
+    return render_to_response("admin/pending_approval.html", ctx,
+                              context_instance=RequestContext(request))
+
+
+@staff_member_required
+def pending_approval_queue(request, queue_name):
+    try:
+        queues = [_queue_page(moderation.QUEUES[queue_name],
+                              request.GET)]
+    except BadRequest as e:
+        return HttpResponseBadRequest(str(e))
+
     ctx = {
-        'pending_vendors': pending_vendors,
-        'pending_reviews': pending_reviews,
+        'pending_count': moderation.pending_count(),
+        'queues': queues,
     }
     return render_to_response("admin/pending_approval.html", ctx,
                               context_instance=RequestContext(request))
 
 
+@staff_member_required
+@require_POST
+def pending_approval_action(request):
+    queue = moderation.QUEUES.get(request.POST.get('queue'))
+    status = {
+        'approve': SF.APPROVED,
+        'quarantine': SF.QUARANTINED,
+    }.get(request.POST.get('action'))
+
+    if queue is None or status is None:
+        return HttpResponseBadRequest("Unknown queue or action.")
+
+    try:
+        changed = moderation.set_status(queue.model,
+                                        request.POST.getlist('ids'), status)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid ids.")
+
+    messages.success(request, "%d %s %s." % (
+        len(changed), queue.name,
+        'approved' if status == SF.APPROVED else 'quarantined'))
+
+    next_url = request.POST.get('next', '')
+    if not is_safe_url(next_url, host=request.get_host()):
+        next_url = reverse('pending_approval')
+    return redirect(next_url)
+
+
+def _export_filters(request, date_field, status_field=None,
+                    default_status=None):
+    """
+    Build queryset filters from the optional ?since= and ?until= dates
+    (matched against date_field) and ?status= approval status, which
+    defaults to default_status. Pass ?status=all for every status.
+
+    Raises ValueError for values that can't be used.
+    """
+    filters = {}
+
+    for param, lookup in (('since', 'gte'), ('until', 'lt')):
+        value = request.GET.get(param)
+        if value:
+            try:
+                filters['%s__%s' % (date_field, lookup)] = \
+                    dateutil.parser.parse(value)
+            except (ValueError, TypeError):
+                raise ValueError("Invalid %s date: %s" % (param, value))
+
+    if status_field:
+        status = request.GET.get('status', default_status)
+        if status in dict(SF.CHOICES):
+            filters[status_field] = status
+        elif status != 'all':
+            raise ValueError("Invalid status: %s" % status)
+
+    return filters
+
+
+def _csv_response(request, queryset, columns, filename, headers=None):
+    """
+    Stream a values() queryset as a CSV attachment, without holding it
+    in memory. Pass ?compress=gzip to have it gzipped.
+    """
+    filename = '%s_%s.csv' % (filename,
+                              datetime.date.today().strftime("%Y%m%d"))
+
+    # the byte order mark tells excel that the file is utf-8
+    lines = itertools.chain(
+        [u'\ufeff'.encode('utf8')],
+        streaming.csv_lines(streaming.iter_values(queryset), columns,
+                            headers))
+    content = streaming.buffered(lines)
+
+    if request.GET.get('compress') == 'gzip':
+        response = StreamingHttpResponse(streaming.gzipped(content),
+                                         content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(content, content_type='text/csv')
+
+    response['Content-Disposition'] = 'attachment; filename=%s;' % filename
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _bad_export(error):
+    return HttpResponseBadRequest(str(error))
+
+
 @staff_member_required
 def mailing_list(request):
+    try:
+        filters = _export_filters(request, 'date_joined')
+    except ValueError as e:
+        return _bad_export(e)
+
+    columns = ('username', 'first_name', 'last_name', 'email')
     mailing_list_users = models.User\
-                               .objects.filter(userprofile__mailing_list=True)\
-                                       .values('username',
-                                               'first_name',
-                                               'last_name',
-                                               'email')
+                               .objects.filter(userprofile__mailing_list=True,
+                                               **filters)\
+                                       .order_by('id')\
+                                       .values(*columns)
 
-    return render_to_csv_response(mailing_list_users,
-                                  append_datestamp=True,
-                                  filename='vegphilly_ml')
+    return _csv_response(request, mailing_list_users, columns,
+                         'vegphilly_ml')
 
 
 @staff_member_required
 def vendor_list(request):
+    try:
+        filters = _export_filters(request, 'created', 'approval_status',
+                                  SF.APPROVED)
+    except ValueError as e:
+        return _bad_export(e)
+
+    columns = ('name',
+               'address',
+               'neighborhood__name',
+               'phone',
+               'website',
+               'veg_level__name',
+               'notes')
+    vendors = models.Vendor.objects.filter(**filters)\
+                           .order_by('name')\
+                           .values(*columns)
+
+    return _csv_response(request, vendors, columns, 'vegphilly_vendors')
+
+
+@staff_member_required
+def review_list(request):
+    try:
+        filters = _export_filters(request, 'created', 'approval_status',
+                                  SF.APPROVED)
+    except ValueError as e:
+        return _bad_export(e)
+
+    columns = ('id',
+               'created',
+               'vendor__name',
+               'author__username',
+               'approval_status',
+               'food_rating',
+               'atmosphere_rating',
+               'best_vegan_dish__name',
+               'title',
+               'content')
+    reviews = models.Review.objects.filter(**filters)\
+                           .order_by('id')\
+                           .values(*columns)
+
+    return _csv_response(request, reviews, columns, 'vegphilly_reviews')
+
+
+@staff_member_required
+def vendor_ratings(request):
+    """
+    Each approved vendor's approved review count and average ratings,
+    optionally counting only the reviews written between ?since= and
+    ?until=. Vendors without any reviews are left out.
+    """
+    try:
+        filters = _export_filters(request, 'review__created')
+    except ValueError as e:
+        return _bad_export(e)
+
+    columns = ('name',
+               'neighborhood__name',
+               'review_count',
+               'food_rating_avg',
+               'atmosphere_rating_avg')
     vendors = models.Vendor.objects.approved()\
-                           .values('name',
-                                   'address',
-                                   'neighborhood__name',
-                                   'phone',
-                                   'website',
-                                   'veg_level__name',
-                                   'notes')
-
-    return render_to_csv_response(vendors,
-                                  append_datestamp=True,
-                                  filename='vegphilly_vendors')
+                           .filter(review__approval_status=SF.APPROVED,
+                                   **filters)\
+                           .values('id', 'name', 'neighborhood__name')\
+                           .annotate(review_count=Count('review'),
+                                     food_rating_avg=Avg(
+                                         'review__food_rating'),
+                                     atmosphere_rating_avg=Avg(
+                                         'review__atmosphere_rating'))\
+                           .order_by('name')
+
+    return _csv_response(request, vendors, columns,
+                         'vegphilly_vendor_ratings')
@@ -1,10 +1,22 @@
+import json
+
+import dateutil.parser
+
+from django.conf import settings
 from django.conf.urls import url
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from tastypie import fields
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
 from tastypie.resources import ModelResource
 from tastypie.utils import trailing_slash
-from vegancity import models
-from .search import master_search
+from vegancity import caching, models, search, streaming
+from vegancity.fields import StatusField as SF
+from vegancity.paginators import VendorPaginator, ReviewPaginator
 
 from tastypie.api import Api
 
@@ -16,9 +28,252 @@ def build_api():
     return v1_api
 
 
-class VendorResource(ModelResource):
+class _PrefetchedList(list):
+    """
+    A list of already loaded objects that can stand in for a related
+    manager, which is what tastypie's ToManyField expects to be given.
+    """
+    def all(self):
+        return self
+
+
+# fields that come straight off of the vendor and review tables
+_VENDOR_COLUMNS = ('name', 'address', 'website', 'phone', 'notes')
+
+_REVIEW_COLUMNS = ('atmosphere_rating', 'food_rating', 'title', 'content',
+                   'created', 'modified', 'suggested_feature_tags',
+                   'suggested_cuisine_tags', 'unlisted_vegan_dish')
+
+# maps each rating field of VendorResource to its queryset annotation
+_VENDOR_RATINGS = {
+    'food_rating': 'food_rating_avg',
+    'atmosphere_rating': 'atmosphere_rating_avg',
+    'best_vegan_dish': 'best_vegan_dish_name',
+}
+
+
+def _vendor_queryset(queryset, fields=None):
+    """
+    Load everything a serialized vendor needs up front, so that a page
+    of vendors costs the same number of queries regardless of its size.
+
+    When fields is given, only load what those fields need.
+    """
+    def wanted(name):
+        return fields is None or name in fields
+
+    related = [name for name in ('neighborhood', 'veg_level')
+               if wanted(name)]
+    prefetch = [name for name in ('cuisine_tags', 'feature_tags')
+                if wanted(name)]
+    if wanted('reviews'):
+        prefetch.append('review_set')
+    ratings = [annotation for name, annotation in _VENDOR_RATINGS.items()
+               if wanted(name)]
+
+    # name and modified are always loaded for the paginator's sort keys
+    columns = ([name for name in _VENDOR_COLUMNS if wanted(name)] +
+               ['name', 'modified'] + related)
+
+    queryset = queryset.only(*columns)
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if ratings:
+        queryset = queryset.with_ratings(*ratings)
+    return queryset
+
+
+def _review_queryset(queryset, fields=None):
+    "Like _vendor_queryset, for reviews."
+    def wanted(name):
+        return fields is None or name in fields
+
+    related = [name for name in ('vendor', 'author', 'best_vegan_dish')
+               if wanted(name)]
+
+    # created and modified are always loaded for the paginator's sort keys
+    columns = ([name for name in _REVIEW_COLUMNS if wanted(name)] +
+               ['created', 'modified'] + related)
+
+    queryset = queryset.only(*columns)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset
+
+
+class SparseFieldsMixin(object):
+    """
+    Lets clients ask for a subset of a resource's fields, for example
+    with ?fields=name,address. The resource_uri is always included.
+
+    Resources should also use requested_fields to avoid loading data
+    for fields that weren't asked for.
+    """
+
+    def requested_fields(self, request):
+        "Returns the set of requested field names, or None for all of them."
+        fields_param = request.GET.get('fields') if request else None
+        if not fields_param:
+            return None
+
+        requested = set(name.strip() for name in fields_param.split(',')
+                        if name.strip())
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise BadRequest("Invalid fields requested: %s." %
+                             ', '.join(sorted(unknown)))
+
+        requested.add('resource_uri')
+        return requested
+
+    def full_dehydrate(self, bundle, for_list=False):
+        """
+        Same as ModelResource.full_dehydrate, but skips the fields
+        that weren't requested.
+        """
+        requested = self.requested_fields(bundle.request)
+        use_in = ['all', 'list' if for_list else 'detail']
+
+        for field_name, field_object in self.fields.items():
+            if requested is not None and field_name not in requested:
+                continue
+
+            field_use_in = getattr(field_object, 'use_in', 'all')
+            if callable(field_use_in):
+                if not field_use_in(bundle):
+                    continue
+            elif field_use_in not in use_in:
+                continue
+
+            if getattr(field_object, 'dehydrated_type', None) == 'related':
+                field_object.api_name = self._meta.api_name
+                field_object.resource_name = self._meta.resource_name
+
+            bundle.data[field_name] = field_object.dehydrate(
+                bundle, for_list=for_list)
+
+            method = getattr(self, "dehydrate_%s" % field_name, None)
+            if method:
+                bundle.data[field_name] = method(bundle)
+
+        return self.dehydrate(bundle)
+
+
+def _approved_reviews(bundle):
+    # filter the prefetched reviews here rather than in the database,
+    # calling .filter() on review_set would discard the prefetch cache.
+    return _PrefetchedList(review for review in bundle.obj.review_set.all()
+                           if review.approval_status == SF.APPROVED)
+
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+_EXPORT_FIELDS = ('id', 'name', 'address', 'phone', 'website', 'notes',
+                  'neighborhood__name', 'veg_level__name',
+                  'created', 'modified', 'approval_status')
+
+_EXPORT_SELECT = {
+    'latitude': 'ST_Y(vegancity_vendor.location)',
+    'longitude': 'ST_X(vegancity_vendor.location)',
+    'cuisine_tags': """
+        ARRAY(SELECT T.name
+              FROM vegancity_cuisinetag T
+              INNER JOIN vegancity_vendor_cuisine_tags VT
+              ON VT.cuisinetag_id = T.id
+              WHERE VT.vendor_id = vegancity_vendor.id
+              ORDER BY T.name)
+        """,
+    'feature_tags': """
+        ARRAY(SELECT T.name
+              FROM vegancity_featuretag T
+              INNER JOIN vegancity_vendor_feature_tags VT
+              ON VT.featuretag_id = T.id
+              WHERE VT.vendor_id = vegancity_vendor.id
+              ORDER BY T.name)
+        """,
+}
+
+
+def _vendor_export_queryset(since=None):
+    """
+    Build a values() queryset with one flat row per vendor.
+
+    Without since, only approved vendors are exported. With since, every
+    vendor that changed (or had a review change) after that time is
+    included, so that clients can learn about vendors that have been
+    taken down.
+    """
+    vendors = models.Vendor.objects.all()
+
+    if since is None:
+        vendors = vendors.approved()
+    else:
+        vendors = vendors.extra(
+            where=["""
+                   vegancity_vendor.modified > %s
+                   OR EXISTS (SELECT 1 FROM vegancity_review R
+                              WHERE R.vendor_id = vegancity_vendor.id
+                              AND R.modified > %s)
+                   """],
+            params=[since, since])
+
+    vendors = (vendors
+               .with_ratings()
+               .extra(select=_EXPORT_SELECT)
+               .order_by('modified', 'id'))
+
+    return vendors.values(*(_EXPORT_FIELDS +
+                            tuple(_EXPORT_SELECT) +
+                            ('food_rating_avg', 'atmosphere_rating_avg',
+                             'best_vegan_dish_name')))
+
+
+def _export_row(row):
+    if row['approval_status'] != SF.APPROVED:
+        return {'id': row['id'], 'modified': row['modified'], 'removed': True}
+
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'address': row['address'],
+        'phone': row['phone'],
+        'website': row['website'],
+        'notes': row['notes'],
+        'neighborhood': row['neighborhood__name'],
+        'veg_level': row['veg_level__name'],
+        'cuisine_tags': row['cuisine_tags'],
+        'feature_tags': row['feature_tags'],
+        'food_rating': row['food_rating_avg'],
+        'atmosphere_rating': row['atmosphere_rating_avg'],
+        'best_vegan_dish': row['best_vegan_dish_name'],
+        'latitude': row['latitude'],
+        'longitude': row['longitude'],
+        'created': row['created'],
+        'modified': row['modified'],
+    }
+
+
+def _ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def _json_array(rows):
+    separator = '[\n'
+    for row in rows:
+        yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+        separator = ',\n'
+    yield '[]' if separator == '[\n' else '\n]'
+
+
+class VendorResource(SparseFieldsMixin, ModelResource):
     reviews = fields.ToManyField('vegancity.api.ReviewResource',
-                                 'review_set',
+                                 _approved_reviews,
                                  null=True)
     neighborhood = fields.ToOneField('vegancity.api.NeighborhoodResource',
                                      'neighborhood',
@@ -52,40 +307,146 @@ class VendorResource(ModelResource):
         response_url = url(url_body, self.wrap_view('get_search'),
                            name='api_get_search')
 
-        return [response_url]
+        export_body = (r'^(?P<resource_name>%s)/export%s$' %
+                       (self._meta.resource_name, trailing_slash()))
+
+        export_url = url(export_body, self.wrap_view('get_export'),
+                         name='api_get_export')
+
+        return [response_url, export_url]
+
+    def get_export(self, request, **kwargs):
+        """
+        Stream every vendor as newline delimited JSON (the default) or as
+        a single JSON array, optionally gzipped with ?compress=gzip.
+
+        Pass the X-Export-Timestamp header of a previous export as
+        ?since= to only receive vendors that have changed since then.
+        """
+        self.method_check(request, allowed=['get'])
+
+        since = request.GET.get('since')
+        if since:
+            try:
+                since = dateutil.parser.parse(since)
+            except (ValueError, TypeError):
+                raise BadRequest("Invalid since timestamp: %s" % since)
+        else:
+            since = None
+
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise BadRequest("Unsupported export format: %s" % export_format)
+
+        started = timezone.now()
+
+        rows = (_export_row(row) for row in
+                streaming.iter_values(_vendor_export_queryset(since)))
+
+        if export_format == 'ndjson':
+            content = streaming.buffered(_ndjson(rows))
+        else:
+            content = streaming.buffered(_json_array(rows))
+
+        if request.GET.get('compress') == 'gzip':
+            response = StreamingHttpResponse(streaming.gzipped(content),
+                                             content_type='application/gzip')
+            response['Content-Disposition'] = (
+                'attachment; filename=vendors.%s.gz' % export_format)
+        else:
+            response = StreamingHttpResponse(
+                content, content_type=EXPORT_CONTENT_TYPES[export_format])
+
+        response['X-Export-Timestamp'] = started.isoformat()
+        return response
+
+    def get_object_list(self, request):
+        objects = super(VendorResource, self).get_object_list(request)
+        return _vendor_queryset(objects, self.requested_fields(request))
 
     def get_search(self, request, **kwargs):
-        raw_results = master_search(request.GET.get('q', ''))
-        vendors = []
+        """
+        Return a page of the vendors that match ?q=.
 
-        results, status_code = raw_results
-        for result in results:
-            bundle = self.build_bundle(obj=result, request=request)
-            bundle = self.full_dehydrate(bundle)
-            vendors.append(bundle)
+        Both the matching ids and each vendor's serialized form are
+        cached, so a popular search usually runs no queries at all.
+        """
+        self.method_check(request, allowed=['get'])
 
-        ctx = {'vendors': vendors}
+        requested = self.requested_fields(request)
+        vendor_ids = search.cached_search_ids(request.GET.get('q', ''))
 
+        paginator = Paginator(request.GET, vendor_ids,
+                              resource_uri=self.get_resource_uri() + 'search/',
+                              limit=self._meta.limit,
+                              max_limit=self._meta.max_limit,
+                              collection_name='vendors')
+        ctx = paginator.page()
+
+        fragments = self.get_fragments(ctx['vendors'])
+        vendors = []
+        for vendor_id in ctx['vendors']:
+            # a vendor can disappear between caching the search and
+            # serializing its results.
+            if vendor_id not in fragments:
+                continue
+            data = fragments[vendor_id]
+            if requested is not None:
+                data = dict((name, value) for name, value in data.items()
+                            if name in requested)
+            vendors.append(data)
+
+        ctx['vendors'] = vendors
         return self.create_response(request, ctx)
 
+    def get_fragments(self, vendor_ids):
+        """
+        Return a dict of the full serialized form of each of the given
+        vendors, by id. Fragments are cached until vendor data changes.
+        """
+        version = caching.get_data_version()
+        keys = dict((caching.make_key('api_vendor', version, vendor_id),
+                     vendor_id) for vendor_id in vendor_ids)
+
+        fragments = dict((keys[key], fragment) for key, fragment
+                         in cache.get_many(keys.keys()).items())
+
+        missing = [vendor_id for vendor_id in vendor_ids
+                   if vendor_id not in fragments]
+
+        if missing:
+            new_fragments = {}
+            vendors = _vendor_queryset(models.Vendor.objects.approved()
+                                       .filter(pk__in=missing))
+            for vendor in vendors:
+                bundle = self.full_dehydrate(self.build_bundle(obj=vendor),
+                                             for_list=True)
+                fragment = self._meta.serializer.to_simple(bundle, {})
+                fragments[vendor.pk] = fragment
+                new_fragments[caching.make_key('api_vendor', version,
+                                               vendor.pk)] = fragment
+            cache.set_many(new_fragments, settings.API_FRAGMENT_CACHE_TIMEOUT)
+
+        return fragments
+
     def dehydrate_best_vegan_dish(self, bundle):
-        vegan_dish = bundle.obj.best_vegan_dish()
-        return vegan_dish
+        return bundle.obj.best_vegan_dish_name
 
     def dehydrate_food_rating(self, bundle):
-        return bundle.obj.food_rating()
+        return bundle.obj.food_rating_avg
 
     def dehydrate_atmosphere_rating(self, bundle):
-        return bundle.obj.atmosphere_rating()
+        return bundle.obj.atmosphere_rating_avg
 
     class Meta:
-        queryset = models.Vendor.objects.approved().all()
+        queryset = models.Vendor.objects.approved()
         resource_name = 'vendors'
+        paginator_class = VendorPaginator
         fields = ['id', 'name', 'address', 'website', 'phone',
                   'notes', 'resource_uri']
 
 
-class ReviewResource(ModelResource):
+class ReviewResource(SparseFieldsMixin, ModelResource):
     vendor = fields.ToOneField('vegancity.api.VendorResource', 'vendor')
     author = fields.ToOneField('vegancity.api.UserResource',
                                'author',
@@ -96,9 +457,14 @@ class ReviewResource(ModelResource):
                                         null=True,
                                         full=True)
 
+    def get_object_list(self, request):
+        objects = super(ReviewResource, self).get_object_list(request)
+        return _review_queryset(objects, self.requested_fields(request))
+
     class Meta:
-        queryset = models.Review.objects.approved().all()
+        queryset = models.Review.objects.approved()
         resource_name = 'reviews'
+        paginator_class = ReviewPaginator
         fields = [
             'id', 'atmosphere_rating', 'food_rating', 'title', 'content',
             'created', 'modified', 'suggested_feature_tags',
@@ -0,0 +1,144 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache helpers shared by the views and the api.
+
+Most cached data is keyed on the global data version, which is bumped
+whenever a vendor, review or tag changes. Bumping it orphans every
+entry that was built from the old data, and the cache backend evicts
+them in its own time.
+
+This module must not import vegancity.models; the models module
+connects its signals to bump_data_version instead.
+"""
+
+import hashlib
+import threading
+import time
+
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+DATA_VERSION_KEY = 'vegancity:data_version'
+
+DATA_CHANGED_KEY = 'vegancity:data_changed'
+
+PENDING_COUNT_KEY = 'vegancity:pending_count'
+
+STAFF_RECIPIENTS_KEY = 'vegancity:staff_recipients'
+
+USER_REVIEW_STATS_KEY = 'vegancity:user_review_stats:%s'
+
+
+def _initial_version():
+    # start from the clock rather than from 1, so that losing the
+    # version key can never bring back entries from an older version.
+    return int(time.time() * 1000)
+
+
+def get_data_version():
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, _initial_version(), None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    cache.set(DATA_CHANGED_KEY, time.time(), None)
+    try:
+        return cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        version = _initial_version()
+        cache.set(DATA_VERSION_KEY, version, None)
+        return version
+
+
+def data_changed_within(seconds):
+    "Whether the data version was bumped in the last few seconds."
+    changed = cache.get(DATA_CHANGED_KEY)
+    return changed is not None and time.time() - changed < seconds
+
+
+def make_key(prefix, *parts):
+    """
+    Build a cache key from a prefix and any number of parts. The parts
+    are hashed, so they may be arbitrary user input.
+    """
+    digest = hashlib.md5(u':'.join(unicode(part) for part in parts)
+                         .encode('utf-8')).hexdigest()
+    return 'vegancity:%s:%s' % (prefix, digest)
+
+
+def adjust_pending_count(delta):
+    """
+    Add delta to the cached count of items pending approval. If the
+    count isn't cached there's nothing to adjust; it will be counted
+    afresh the next time it's needed.
+    """
+    if delta:
+        try:
+            cache.incr(PENDING_COUNT_KEY, delta)
+        except ValueError:
+            pass
+
+
+def invalidate_pending_count():
+    cache.delete(PENDING_COUNT_KEY)
+
+
+def invalidate_staff_recipients():
+    cache.delete(STAFF_RECIPIENTS_KEY)
+
+
+def invalidate_user_review_stats(user_ids):
+    cache.delete_many([USER_REVIEW_STATS_KEY % pk for pk in user_ids])
+
+
+class LRUCache(object):
+    """
+    A thread-safe LRU mapping, holding at most size entries, for small
+    in-process caches of things too cheap to fetch from the cache
+    backend.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return None
+            self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
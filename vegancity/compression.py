@@ -0,0 +1,220 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+gzip and brotli, for responses and for static files.
+
+Brotli is used when the brotli package is installed and the client
+accepts it, gzip otherwise. CompressionMiddleware compresses html and
+api responses as they go out; vegancity.storage compresses the static
+files once, at the highest levels, when they are collected.
+
+Every response compressed is counted in this process's stats, by
+content type: how many, the bytes before and after, and the seconds
+spent compressing them.
+"""
+
+import gzip
+import re
+import struct
+import threading
+import time
+import zlib
+from StringIO import StringIO
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+##########################################################
+# negotiation
+##########################################################
+
+
+def _accepted(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        match = ENCODING_RE.match(part)
+        if match:
+            try:
+                quality = float(match.group(2) or 1)
+            except ValueError:
+                continue
+            accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """
+    The encoding to compress a response with for a request with the
+    given Accept-Encoding header, or None to send it as it is.
+    """
+    accepted = _accepted(accept_encoding)
+    available = [GZIP] if brotli is None else [BROTLI, GZIP]
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+##########################################################
+# compressing
+##########################################################
+
+
+def gzip_bytes(content, level=None):
+    level = settings.RESPONSE_GZIP_LEVEL if level is None else level
+    buf = StringIO()
+    # no name or mtime in the header, so that the same content always
+    # compresses to the same bytes
+    with gzip.GzipFile('', 'wb', level, buf, mtime=0) as compressed:
+        compressed.write(content)
+    return buf.getvalue()
+
+
+def brotli_bytes(content, quality=None):
+    quality = (settings.RESPONSE_BROTLI_QUALITY if quality is None
+               else quality)
+    return brotli.compress(content, quality=quality)
+
+
+def compress(content, encoding, content_type=''):
+    "Compress content with encoding, and count it in the stats."
+    start = time.time()
+    if encoding == BROTLI:
+        compressed = brotli_bytes(content)
+    else:
+        compressed = gzip_bytes(content)
+    record(content_type, len(content), len(compressed), time.time() - start)
+    return compressed
+
+
+def _gzip_stream():
+    # a raw deflate stream in a gzip wrapper, like GzipFile writes
+    compressor = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL,
+                                  zlib.DEFLATED, -zlib.MAX_WBITS)
+    state = {'crc': zlib.crc32(''), 'size': 0}
+
+    def process(chunk):
+        state['crc'] = zlib.crc32(chunk, state['crc'])
+        state['size'] += len(chunk)
+        return (compressor.compress(chunk) +
+                compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish():
+        return (compressor.flush() +
+                struct.pack('<LL', state['crc'] & 0xffffffff,
+                            state['size'] & 0xffffffff))
+
+    header = '\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    return header, process, finish
+
+
+def _brotli_stream():
+    compressor = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+
+    def process(chunk):
+        return compressor.process(chunk) + compressor.flush()
+
+    return '', process, compressor.finish
+
+
+def compress_sequence(chunks, encoding, content_type=''):
+    """
+    Compress an iterable of strings as it is consumed, flushing after
+    each one so that streamed pages still arrive a piece at a time.
+    """
+    stream = _brotli_stream if encoding == BROTLI else _gzip_stream
+    header, process, finish = stream()
+    size = compressed_size = 0
+    seconds = 0.0
+    yield header
+    compressed_size += len(header)
+    for chunk in chunks:
+        start = time.time()
+        compressed = process(chunk)
+        seconds += time.time() - start
+        size += len(chunk)
+        compressed_size += len(compressed)
+        if compressed:
+            yield compressed
+    compressed = finish()
+    compressed_size += len(compressed)
+    record(content_type, size, compressed_size, seconds)
+    yield compressed
+
+
+def precompressed(content):
+    """
+    Return (suffix, compressed content) for each encoding that makes
+    content smaller, compressed as small as they go.
+    """
+    encodings = [('.gz', lambda content: gzip_bytes(content, 9))]
+    if brotli is not None:
+        encodings.append(('.br', lambda content: brotli_bytes(content, 11)))
+    results = []
+    for suffix, compress in encodings:
+        compressed = compress(content)
+        if len(compressed) < len(content):
+            results.append((suffix, compressed))
+    return results
+
+
+##########################################################
+# stats
+##########################################################
+
+
+def record(content_type, size, compressed_size, seconds):
+    content_type = content_type.split(';')[0].strip()
+    with _stats_lock:
+        count, total, compressed, spent = _stats.get(content_type,
+                                                     (0, 0, 0, 0.0))
+        _stats[content_type] = (count + 1, total + size,
+                                compressed + compressed_size,
+                                spent + seconds)
+
+
+def compression_stats():
+    """
+    Return this process's compression so far, as a dict of content
+    type to a dict of count, bytes, compressed bytes and milliseconds.
+    """
+    with _stats_lock:
+        return dict((content_type, {'count': count,
+                                    'bytes': total,
+                                    'compressed': compressed,
+                                    'ms': spent * 1000})
+                    for content_type, (count, total, compressed, spent)
+                    in _stats.items())
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
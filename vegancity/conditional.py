@@ -0,0 +1,157 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Conditional responses for the html pages.
+
+Pages get an ETag and a Last-Modified header worked out without
+rendering them, so that a browser or nginx revalidating a page it
+already has gets a 304 back instead.
+
+Pages listing vendors change whenever any vendor data does, so their
+ETag is the data version and their Last-Modified the time it was last
+bumped. A vendor's page also goes by its own modified time and that of
+its latest review, which are read in one small query.
+
+Logged in users see their own name and links on every page, so their
+ETags include who they are, and they get no Last-Modified. Pages with a
+message waiting aren't conditional at all.
+"""
+
+import datetime
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from vegancity import caching
+from vegancity.models import Vendor
+
+
+def _conditional(request, uncached_params):
+    messages = getattr(request, '_messages', None)
+    return (not (messages is not None and len(messages)) and
+            not any(param in request.GET for param in uncached_params))
+
+
+def _etag(request, *parts):
+    user = request.user.pk if request.user.is_authenticated() else None
+    return hashlib.md5(':'.join(str(part) for part in parts + (user,))
+                       ).hexdigest()
+
+
+def _utc(dt):
+    # naive datetimes are in local time, condition() wants utc
+    if dt is not None and timezone.is_naive(dt):
+        return datetime.datetime.utcfromtimestamp(time.mktime(dt.timetuple()))
+    return dt
+
+
+def _data_changed():
+    changed = cache.get(caching.DATA_CHANGED_KEY)
+    if changed is not None:
+        return datetime.datetime.utcfromtimestamp(changed)
+    return None
+
+
+##########################################################
+# validators
+##########################################################
+
+
+def data_etag(request, *args, **kwargs):
+    return _etag(request, caching.get_data_version())
+
+
+def data_last_modified(request, *args, **kwargs):
+    return _data_changed()
+
+
+def _vendor_state(request, key):
+    # both validators need it, only look it up once per request
+    if not hasattr(request, '_vendor_state'):
+        vendor = (Vendor.objects.approved()
+                  .only('id', 'slug', 'modified')
+                  .annotate(latest_review=Max('review__modified'))
+                  .get_by_url_key(key))
+        # other urls for the vendor only redirect to its own
+        if vendor is None or vendor.get_absolute_url() != request.path:
+            request._vendor_state = None
+        else:
+            request._vendor_state = (vendor.pk, vendor.modified,
+                                     vendor.latest_review)
+    return request._vendor_state
+
+
+def vendor_etag(request, key):
+    state = _vendor_state(request, key)
+    if state is None:
+        return None
+    return _etag(request, caching.get_data_version(), *state)
+
+
+def vendor_last_modified(request, key):
+    state = _vendor_state(request, key)
+    if state is None:
+        return None
+    pk, modified, latest_review = state
+    times = [dt for dt in (_utc(modified), _utc(latest_review),
+                           _data_changed())
+             if dt is not None]
+    return max(times) if times else None
+
+
+##########################################################
+# the decorator
+##########################################################
+
+
+def conditional_page(etag_func, last_modified_func, uncached_params=()):
+    """
+    Answer requests for a page that hasn't changed with a 304, using
+    the given validators, and make clients revalidate every time they
+    show it. Requests with any of uncached_params in their query string
+    always get the full page.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            if _conditional(request, uncached_params):
+                return etag_func(request, *args, **kwargs)
+            return None
+
+        def last_modified(request, *args, **kwargs):
+            if (_conditional(request, uncached_params) and
+                    not request.user.is_authenticated()):
+                return last_modified_func(request, *args, **kwargs)
+            return None
+
+        conditional_view = condition(etag, last_modified)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+            if request.user.is_authenticated():
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
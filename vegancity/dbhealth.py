@@ -0,0 +1,63 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Health checks for persistent database connections.
+
+With CONN_MAX_AGE set, a worker keeps its connection between requests.
+Django closes connections that have expired or that broke during the
+last request, but not ones that died while the worker was idle (the
+database restarted, or pgbouncer dropped them), and the next request
+would fail on its first query.
+
+So before a request uses a connection that has been idle for longer
+than DB_HEALTH_CHECK_IDLE_SECONDS, it is pinged, and closed if it
+doesn't answer. Django reconnects on the next query. Busy workers never
+pay for the ping.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def check_connections(**kwargs):
+    "Close idle connections that no longer work. Runs on request_started."
+    now = time.time()
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        # connections are per thread, and so is this attribute
+        last_used = getattr(conn, 'vegancity_last_used', None)
+        if (last_used is not None and
+                now - last_used < settings.DB_HEALTH_CHECK_IDLE_SECONDS):
+            continue
+        if not conn.is_usable():
+            logger.warn("Closing unusable connection to %s" % conn.alias)
+            conn.close()
+
+
+def mark_used(**kwargs):
+    "Remember when each connection was last used. Runs on request_finished."
+    now = time.time()
+    for conn in connections.all():
+        if conn.connection is not None:
+            conn.vegancity_last_used = now
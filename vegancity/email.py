@@ -15,45 +15,44 @@
 # You should have received a copy of the GNU General Public License
 # along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
 
-""" A simple module for sending emails through gmail """
+"""
+Emails sent by the site. They are queued rather than sent directly,
+see vegancity.mailqueue.
+"""
 
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.utils.html import strip_tags
-from django.template.loader import render_to_string
+from vegancity import mailqueue, notifications
 
-from vegancity.models import User
+
+NEW_VENDOR_APPROVAL = 'new_vendor_approval'
+NEW_VENDOR_ALERT = 'new_vendor_alert'
+
+
+def new_vendor_approval_message(vendor):
+    return notifications.build_message('[VegPhilly] New Vendor Approved',
+                                       'vegancity/approval_email.html',
+                                       {'vendor': vendor},
+                                       [vendor.submitted_by.email])
 
 
 def send_new_vendor_approval(vendor):
-    subject = '[VegPhilly] New Vendor Approved'
-    html_body = render_to_string(
-        "vegancity/approval_email.html", {'vendor': vendor})
-    text_body = strip_tags(html_body)
-    sender = settings.EMAIL_HOST_USER
-    recipients = [vendor.submitted_by.email]
+    mailqueue.enqueue(new_vendor_approval_message(vendor),
+                      NEW_VENDOR_APPROVAL)
+
+
+def send_new_vendor_approvals(vendors):
+    "Queue approval emails for many vendors at once."
+    mailqueue.enqueue_many([new_vendor_approval_message(vendor)
+                            for vendor in vendors],
+                           NEW_VENDOR_APPROVAL)
 
-    msg = EmailMultiAlternatives(subject,
-                                 text_body,
-                                 sender,
-                                 recipients)
 
-    msg.attach_alternative(html_body, "text/html")
-    msg.send(fail_silently=True)
+def new_vendor_alert_message(vendor):
+    # the recipients are filled in with the staff when it's sent
+    return notifications.build_message('[VegPhilly] New Vendor Submitted',
+                                       'vegancity/new_vendor_alert_email.html',
+                                       {'vendor': vendor})
 
 
 def send_new_vendor_alert(vendor):
-    subject = '[VegPhilly] New Vendor Submitted'
-    html_body = render_to_string(
-        'vegancity/new_vendor_alert_email.html', {'vendor': vendor})
-    text_body = strip_tags(html_body)
-    sender = settings.EMAIL_HOST_USER
-    recipients = [user.email for user in User.objects.filter(is_staff=True)]
-
-    msg = EmailMultiAlternatives(subject,
-                                 text_body,
-                                 sender,
-                                 recipients)
-
-    msg.attach_alternative(html_body, 'text/html')
-    msg.send(fail_silently=True)
+    mailqueue.enqueue(new_vendor_alert_message(vendor), NEW_VENDOR_ALERT,
+                      to_staff=True)
@@ -0,0 +1,83 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cached HTML for each review.
+
+Rendering a review runs linebreaks over its content, builds the rating
+images and hashes its author's email for the gravatar, and the vendor
+and profile pages do it for every review they show. The markup only
+changes when the review does, so each review is rendered once and kept
+in the cache.
+
+Fragments are keyed on the review's modified time and on everything
+else the fragment shows (its author, vendor and dish), so editing any
+of them renders it afresh without any invalidation.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from vegancity import caching
+
+REVIEW_TEMPLATE = 'vegancity/partials/review.html'
+
+# bump this when REVIEW_TEMPLATE changes, so that a deploy doesn't
+# serve fragments rendered by the old template.
+REVIEW_TEMPLATE_VERSION = 1
+
+
+def review_key(review, show_vendor_name):
+    dish = review.best_vegan_dish
+    return caching.make_key('review_html', REVIEW_TEMPLATE_VERSION,
+                            show_vendor_name, review.pk,
+                            review.modified.isoformat(),
+                            review.author.username, review.author.email,
+                            review.vendor_id, review.vendor.name,
+                            dish.name if dish else '')
+
+
+def render_review(review, show_vendor_name=False):
+    return get_template(REVIEW_TEMPLATE).render(
+        Context({'review': review, 'show_vendor_name': show_vendor_name}))
+
+
+def with_html(reviews, show_vendor_name=False):
+    """
+    Return the reviews as a list, each with its rendered markup as
+    review.html. Pass a queryset that selects the author, vendor and
+    best_vegan_dish of each review, or every review costs queries.
+    """
+    reviews = list(reviews)
+    keys = dict((review.pk, review_key(review, show_vendor_name))
+                for review in reviews)
+    fragments = cache.get_many(keys.values())
+
+    new_fragments = {}
+    for review in reviews:
+        key = keys[review.pk]
+        if key not in fragments:
+            fragments[key] = new_fragments[key] = render_review(
+                review, show_vendor_name)
+        review.html = mark_safe(fragments[key])
+
+    if new_fragments:
+        cache.set_many(new_fragments, settings.REVIEW_FRAGMENT_CACHE_TIMEOUT)
+    return reviews
@@ -0,0 +1,179 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+SQL for the triggers that keep each model's search_index up to date,
+and for the synonyms that search queries are expanded with.
+
+The functions take the table, the weighted columns and the text search
+configuration explicitly, rather than reading them from the models.
+Migrations keep frozen copies of the SQL they run, so a change here
+needs a migration of its own to reinstall the triggers. Whatever the
+latest migration installs should match the fields, weights and config
+of the model's search manager.
+
+Synonyms are stored as SearchSynonym rows. A trigger compiles them into
+pairs of tsqueries in SYNONYM_RULES_TABLE whenever they change, and
+searches pass that table to ts_rewrite, so a query is expanded in the
+same statement that runs it.
+"""
+
+SYNONYM_TABLE = 'vegancity_searchsynonym'
+SYNONYM_RULES_TABLE = 'vegancity_searchsynonym_rule'
+
+# the rewrite rules, in the form ts_rewrite expects
+SYNONYM_RULES_SQL = 'SELECT target, substitute FROM %s' % SYNONYM_RULES_TABLE
+
+
+def _name(table):
+    # used for both the trigger and its function
+    return '%s_search_index_update' % table
+
+
+def vector_sql(columns, config, row='NEW'):
+    """
+    The weighted tsvector expression for columns, a sequence of
+    (column, weight) pairs, of the given row.
+    """
+    return ' || '.join(
+        "setweight(to_tsvector('%s', coalesce(%s.%s, '')), '%s')" %
+        (config, row, column, weight) for column, weight in columns)
+
+
+def create_trigger_sql(table, columns, config):
+    """
+    Statements that create a trigger that sets search_index whenever a
+    row is inserted, or any of the searched columns are updated.
+    """
+    name = _name(table)
+    return [
+        """
+        CREATE OR REPLACE FUNCTION %(function)s() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_index := %(vector)s;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """ % {'function': name,
+               'vector': vector_sql(columns, config)},
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, table),
+        """
+        CREATE TRIGGER %(trigger)s
+        BEFORE INSERT OR UPDATE OF %(columns)s ON %(table)s
+        FOR EACH ROW EXECUTE PROCEDURE %(function)s()
+        """ % {'trigger': name,
+               'columns': ', '.join(column for column, _ in columns),
+               'table': table,
+               'function': name},
+    ]
+
+
+def drop_trigger_sql(table):
+    name = _name(table)
+    return [
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, table),
+        "DROP FUNCTION IF EXISTS %s()" % name,
+    ]
+
+
+def create_config_sql(name, copy='pg_catalog.english'):
+    """
+    Statements that create a text search configuration like copy, but
+    that also strips accents, so that words match with or without
+    them. Needs the unaccent extension.
+    """
+    return [
+        "CREATE TEXT SEARCH CONFIGURATION %s (COPY = %s)" % (name, copy),
+        "ALTER TEXT SEARCH CONFIGURATION %s "
+        "ALTER MAPPING FOR hword, hword_part, word "
+        "WITH unaccent, english_stem" % name,
+    ]
+
+
+def drop_config_sql(name):
+    return ["DROP TEXT SEARCH CONFIGURATION IF EXISTS %s" % name]
+
+
+def _synonym_rules_sql(config):
+    # each synonym rewrites to itself or its partner, in both directions.
+    # Terms that are all stopwords parse to an empty query, and are
+    # skipped.
+    return """
+        INSERT INTO %(rules)s (target, substitute)
+        SELECT target, target || other FROM (
+            SELECT plainto_tsquery('%(config)s', term) AS target,
+                   plainto_tsquery('%(config)s', synonym) AS other
+            FROM %(synonyms)s
+          UNION ALL
+            SELECT plainto_tsquery('%(config)s', synonym),
+                   plainto_tsquery('%(config)s', term)
+            FROM %(synonyms)s
+        ) AS pairs
+        WHERE numnode(target) > 0 AND numnode(other) > 0
+        """ % {'rules': SYNONYM_RULES_TABLE,
+               'synonyms': SYNONYM_TABLE,
+               'config': config}
+
+
+def create_synonym_rules_sql(config):
+    """
+    Statements that (re)create the trigger that compiles the synonyms
+    into rewrite rules with the given config, and compile them now.
+    """
+    name = '%s_update' % SYNONYM_RULES_TABLE
+    return [
+        """
+        CREATE OR REPLACE FUNCTION %(function)s() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM %(rules)s;
+            %(insert)s;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """ % {'function': name,
+               'rules': SYNONYM_RULES_TABLE,
+               'insert': _synonym_rules_sql(config)},
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, SYNONYM_TABLE),
+        """
+        CREATE TRIGGER %(trigger)s
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %(table)s
+        FOR EACH STATEMENT EXECUTE PROCEDURE %(function)s()
+        """ % {'trigger': name,
+               'table': SYNONYM_TABLE,
+               'function': name},
+        "DELETE FROM %s" % SYNONYM_RULES_TABLE,
+        _synonym_rules_sql(config),
+    ]
+
+
+def drop_synonym_rules_sql():
+    name = '%s_update' % SYNONYM_RULES_TABLE
+    return [
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, SYNONYM_TABLE),
+        "DROP FUNCTION IF EXISTS %s()" % name,
+    ]
+
+
+def search_sql(vector, config):
+    """
+    A WHERE clause matching vector against a query, expanded with the
+    synonyms. It takes the query as its only parameter. The expansion is
+    a scalar subquery, so it is run once per statement rather than once
+    per row, and the search index can still be used.
+    """
+    return ("(%s) @@ (SELECT ts_rewrite(plainto_tsquery('%s', %%s), '%s'))"
+            % (vector, config, SYNONYM_RULES_SQL))
@@ -1,2 +0,0 @@
-// Return global jQuery reference.
-module.exports = $;
@@ -0,0 +1,2 @@
+// base.html loads jQuery from the CDN before any bundle.
+module.exports = window.jQuery;
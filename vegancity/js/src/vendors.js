@@ -28,6 +28,16 @@ var SearchFormView = Backbone.View.extend({
             $('html, body').animate({ scrollTop: 100 }, 'slow');
             $('#map-area').show();
        },
+        "keyup #search-input": "suggest",
+        "click #typeahead-suggestions a": function (event) {
+            var vendorId = $(event.currentTarget).data("vendor-id");
+            if (vendorId && _vendorMap.markers[vendorId]) {
+                event.preventDefault();
+                $("#typeahead-suggestions").hide();
+                google.maps.event.trigger(_vendorMap.markers[vendorId], 'click');
+                $('#map-area').show();
+            }
+        },
         "change #id_neighborhood, #id_cuisine, #id_checked_features, #id_feature": function (event) {
             $('form#filters').submit();
         }
@@ -43,6 +53,35 @@ var SearchFormView = Backbone.View.extend({
         this.styleVegLevelPins();
     },
 
+    suggest: _.debounce(function () {
+        var query = $.trim($("#search-input").val()),
+            $list = $("#typeahead-suggestions"),
+            itemTemplate = _.template('<li><a href="<%- url %>" data-vendor-id="<%- vendorId %>">' +
+                                      '<span class="suggestion-type"><%- type %></span><%- name %></a></li>');
+
+        if (!query) {
+            $list.empty().hide();
+            return;
+        }
+
+        $.getJSON($list.data("url"), { q: query }, function (data) {
+            // ignore responses to queries the user has since typed past
+            if ($.trim($("#search-input").val()) !== query) {
+                return;
+            }
+            $list.empty();
+            _.each(data.suggestions, function (suggestion) {
+                $list.append(itemTemplate({
+                    url: suggestion.url,
+                    vendorId: suggestion.type === "vendor" ? suggestion.id : "",
+                    type: suggestion.type,
+                    name: suggestion.name
+                }));
+            });
+            $list.toggle(data.suggestions.length > 0);
+        });
+    }, 150),
+
     styleVegLevelPins: function() {
         var vegLevels = [
             { pinSummary: "Vegan", icon: map.vegCategoryMarkerMapping.vegan },
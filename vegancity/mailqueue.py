@@ -0,0 +1,235 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A database-backed queue for outbound email.
+
+Views only insert OutboundEmail rows; the send_queued_email management
+command sends them, so a request never waits on the mail server.
+
+Several workers can run at once. Each claims the emails it is about to
+send by marking them SENDING, so no email is sent twice, and an email
+that can't be built or sent is scheduled to be retried without holding
+up the rest of its batch.
+"""
+
+import datetime
+import logging
+import smtplib
+import socket
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from vegancity import notifications
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+SEND_ERRORS = (smtplib.SMTPException, socket.error)
+
+
+def _queued_email(message, kind, to_staff):
+    # imported here because vegancity.models imports vegancity.email,
+    # which imports this module.
+    from vegancity.models import OutboundEmail
+
+    html_body = u''
+    for content, mimetype in getattr(message, 'alternatives', []):
+        if mimetype == 'text/html':
+            html_body = content
+
+    return OutboundEmail(kind=kind,
+                         subject=message.subject,
+                         text_body=message.body,
+                         html_body=html_body,
+                         sender=message.from_email,
+                         recipients=u'\n'.join(message.to),
+                         to_staff=to_staff)
+
+
+def enqueue(message, kind, to_staff=False):
+    """
+    Queue an EmailMessage to be sent by the worker. If to_staff is set
+    the message's own recipients are ignored, and it is sent to every
+    staff member at the time it goes out.
+    """
+    queued = _queued_email(message, kind, to_staff)
+    queued.save()
+    return queued
+
+
+def enqueue_many(messages, kind, to_staff=False):
+    "Queue many EmailMessages with a single INSERT."
+    from vegancity.models import OutboundEmail
+    OutboundEmail.objects.bulk_create(
+        [_queued_email(message, kind, to_staff) for message in messages])
+
+
+def _group(queued):
+    """
+    Split a batch of queued emails into the groups that will each be
+    sent as one message: staff emails of the same kind are combined,
+    everything else is sent on its own.
+    """
+    groups = []
+    digests = {}
+    for email in queued:
+        if email.to_staff:
+            if email.kind not in digests:
+                digests[email.kind] = []
+                groups.append(digests[email.kind])
+            digests[email.kind].append(email)
+        else:
+            groups.append([email])
+    return groups
+
+
+def build_message(group, staff=None):
+    "Build the EmailMessage for a group of queued emails."
+    first = group[0]
+    if first.to_staff:
+        recipients = (staff if staff is not None
+                      else notifications.staff_recipients())
+    else:
+        recipients = [address for address in first.recipients.splitlines()
+                      if address]
+
+    if len(group) == 1:
+        subject, text_body, html_body = (first.subject, first.text_body,
+                                         first.html_body)
+    else:
+        subject = u'%s (%d)' % (first.subject, len(group))
+        text_body, html_body = notifications.render(
+            'vegancity/email_digest.html', {'emails': group})
+
+    message = EmailMultiAlternatives(subject, text_body, first.sender,
+                                     recipients)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    return message
+
+
+def _mark_sent(group):
+    from vegancity.models import OutboundEmail
+    (OutboundEmail.objects
+     .filter(pk__in=[email.pk for email in group])
+     .update(status=OutboundEmail.SENT, sent=timezone.now()))
+
+
+def _mark_failed(group, error):
+    """
+    Schedule the group's emails to be retried, backing off
+    exponentially, or give up on them after EMAIL_QUEUE_MAX_ATTEMPTS.
+    """
+    for email in group:
+        email.attempts += 1
+        email.last_error = unicode(error)
+        if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            email.status = email.FAILED
+            logger.error("Giving up on email %d (%s): %s" %
+                         (email.pk, email.subject, error))
+        else:
+            email.status = email.QUEUED
+            delay = (settings.EMAIL_QUEUE_RETRY_DELAY *
+                     2 ** (email.attempts - 1))
+            email.send_after = timezone.now() + datetime.timedelta(
+                seconds=delay)
+        email.save()
+
+
+def _claim(batch_size):
+    """
+    Claim up to batch_size emails that are due, and return them. Rows
+    are locked while they are claimed, so a worker running at the same
+    time skips them. Emails still SENDING after EMAIL_QUEUE_CLAIM_TIMEOUT
+    belonged to a worker that died, and are claimed again.
+    """
+    from vegancity.models import OutboundEmail
+
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(OutboundEmail.objects
+                       .select_for_update()
+                       .filter(status__in=(OutboundEmail.QUEUED,
+                                           OutboundEmail.SENDING),
+                               send_after__lte=now)
+                       .order_by('id')[:batch_size])
+        (OutboundEmail.objects
+         .filter(pk__in=[email.pk for email in claimed])
+         .update(status=OutboundEmail.SENDING,
+                 send_after=now + datetime.timedelta(
+                     seconds=settings.EMAIL_QUEUE_CLAIM_TIMEOUT)))
+    return claimed
+
+
+def send_queued(connection=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Send up to batch_size queued emails that are due, and return how
+    many were processed.
+
+    A connection passed in is opened if need be and left open, so that
+    callers can reuse it across batches. Otherwise a connection is
+    opened for just this batch.
+    """
+    queued = _claim(batch_size)
+    if not queued:
+        return 0
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+
+    staff = None
+    try:
+        for group in _group(queued):
+            try:
+                if group[0].to_staff and staff is None:
+                    staff = notifications.staff_recipients()
+                message = build_message(group, staff)
+            except Exception as e:
+                logger.exception("Failed to build email '%s'" %
+                                 group[0].subject)
+                _mark_failed(group, e)
+                continue
+            if not message.recipients():
+                _mark_sent(group)
+                continue
+            try:
+                connection.open()
+                connection.send_messages([message])
+            except SEND_ERRORS as e:
+                logger.warn("Failed to send email '%s': %s" %
+                            (message.subject, e))
+                _mark_failed(group, e)
+                # drop the connection, it's reopened for the next group
+                connection.close()
+            except Exception as e:
+                logger.exception("Failed to send email '%s'" %
+                                 message.subject)
+                _mark_failed(group, e)
+                connection.close()
+            else:
+                _mark_sent(group)
+    finally:
+        if owns_connection:
+            connection.close()
+
+    return len(queued)
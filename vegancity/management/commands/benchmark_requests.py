@@ -0,0 +1,90 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.client import RequestFactory
+
+
+class Command(BaseCommand):
+    args = "[path ...]"
+    help = ("Measure requests per second for the given paths (the home "
+            "and vendors pages by default), through the full request "
+            "handler, first opening a database connection for every "
+            "request and then keeping connections open. Run it again "
+            "with settings that point at pgbouncer to measure the pool.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--requests',
+                    type='int',
+                    dest='requests',
+                    default=200,
+                    help="Number of requests to make in each mode."),
+        make_option('--max-age',
+                    type='int',
+                    dest='max_age',
+                    default=300,
+                    help="CONN_MAX_AGE to use for persistent connections."),
+        make_option('--host',
+                    dest='host',
+                    default=settings.HOSTNAME,
+                    help="Host header to send, it must be allowed by "
+                    "ALLOWED_HOSTS."),
+    )
+
+    def handle(self, *paths, **options):
+        paths = paths or ('/', '/vendors/')
+        handler = WSGIHandler()
+        modes = (("new connection per request", 0),
+                 ("persistent connections", options['max_age']))
+
+        for label, max_age in modes:
+            self.set_max_age(max_age)
+            # one request first, so both modes start with warm caches
+            self.run(handler, paths, 1, options['host'])
+            rate = self.run(handler, paths, options['requests'],
+                            options['host'])
+            self.stdout.write("%s: %.1f requests/second" % (label, rate))
+
+    def set_max_age(self, max_age):
+        for conn in connections.all():
+            conn.settings_dict['CONN_MAX_AGE'] = max_age
+            conn.close()
+
+    def run(self, handler, paths, count, host):
+        factory = RequestFactory()
+        start = time.time()
+        for i in range(count):
+            path = paths[i % len(paths)]
+            environ = factory.get(path, HTTP_HOST=host).environ
+            response = handler(environ, self.start_response)
+            for chunk in response:
+                pass
+            # sends request_finished, which closes expired connections
+            response.close()
+        return count / (time.time() - start)
+
+    def start_response(self, status, headers):
+        if not status.startswith('200'):
+            self.stderr.write("Unexpected response: %s" % status)
@@ -0,0 +1,89 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vegancity import models
+
+SEARCHED_MODELS = {
+    'vendor': models.Vendor,
+    'review': models.Review,
+    'vegandish': models.VeganDish,
+    'cuisinetag': models.CuisineTag,
+    'featuretag': models.FeatureTag,
+}
+
+
+class Command(BaseCommand):
+    args = "[%s ...]" % ' '.join(sorted(SEARCHED_MODELS))
+    help = ("Recompute the search_index of every row, for the given models "
+            "or all of them. Rows are updated in batches, each in its own "
+            "transaction, so no table is locked for long.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=1000,
+                    help="Number of rows to update in each transaction."),
+        make_option('--pause',
+                    type='float',
+                    dest='pause',
+                    default=0,
+                    help="Seconds to wait between batches, to leave room "
+                    "for other queries on a busy database."),
+    )
+
+    def handle(self, *names, **options):
+        unknown = set(names) - set(SEARCHED_MODELS)
+        if unknown:
+            raise CommandError("Unknown model(s): %s" %
+                               ', '.join(sorted(unknown)))
+
+        for name in names or sorted(SEARCHED_MODELS):
+            count = self.rebuild(SEARCHED_MODELS[name],
+                                 options['batch_size'], options['pause'])
+            self.stdout.write("Rebuilt %d %s search indexes" % (count, name))
+
+    def rebuild(self, model, batch_size, pause):
+        """
+        Walk the table in primary key order, recomputing the search index
+        of batch_size rows at a time with the same expression the search
+        manager (and the trigger) uses.
+        """
+        manager = model._fts_manager
+        count = 0
+        last_pk = 0
+        while True:
+            pks = list(model._default_manager
+                       .filter(pk__gt=last_pk)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return count
+
+            # update_search_field runs in its own transaction
+            manager.update_search_field(pk=pks)
+
+            count += len(pks)
+            last_pk = pks[-1]
+            if pause:
+                time.sleep(pause)
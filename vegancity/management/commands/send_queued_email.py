@@ -0,0 +1,69 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+from optparse import make_option
+
+from django.core.mail import get_connection
+from django.core.management.base import NoArgsCommand
+
+from vegancity import mailqueue
+
+
+class Command(NoArgsCommand):
+    help = "Send the emails waiting in the outbound email queue."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop',
+                    action='store_true',
+                    dest='loop',
+                    default=False,
+                    help="Keep running, and check the queue for new "
+                    "emails every --interval seconds."),
+        make_option('--interval',
+                    type='int',
+                    dest='interval',
+                    default=10,
+                    help="Seconds to wait between checks with --loop."),
+        make_option('--batch-size',
+                    type='int',
+                    dest='batch_size',
+                    default=mailqueue.DEFAULT_BATCH_SIZE,
+                    help="Number of emails to load from the queue at a "
+                    "time."),
+    )
+
+    def handle_noargs(self, **options):
+        connection = get_connection()
+        while True:
+            self.drain(connection, options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, connection, batch_size):
+        """
+        Send batches until the queue is empty, over one connection.
+        The connection is closed before going idle, rather than waiting
+        for the mail server to time it out.
+        """
+        try:
+            while mailqueue.send_queued(connection, batch_size) == batch_size:
+                pass
+        finally:
+            connection.close()
@@ -17,12 +17,17 @@
 
 
 import random
+import re
 
 from django.contrib.gis.db import models
 from django.db.models import Count
+from django.utils.datastructures import SortedDict
 
 from djorm_pgfulltext.models import SearchManagerMixIn, SearchQuerySet
 from django.contrib.gis.db.models.query import GeoQuerySet
+from django.db import connections
+
+from vegancity import fulltext
 from vegancity.fields import StatusField as SF
 
 
@@ -30,8 +35,56 @@ from vegancity.fields import StatusField as SF
 # Managers for models that relate to vendor
 ##########################################################>
 
-
-class SearchByVendorQuerySet(SearchQuerySet, GeoQuerySet):
+# the id and optional slug in a vendor url
+VENDOR_URL_KEY_RE = re.compile(r'^(\d+)(?:-(.+))?$')
+
+
+# correlated subqueries that summarize a vendor's approved reviews,
+# each takes the approved status as its only parameter.
+RATING_SELECTS = SortedDict((
+    ('food_rating_avg', """
+        SELECT CAST(FLOOR(AVG(R.food_rating)) AS integer)
+        FROM vegancity_review R
+        WHERE R.vendor_id = vegancity_vendor.id
+        AND R.approval_status = %s
+        """),
+    ('atmosphere_rating_avg', """
+        SELECT CAST(FLOOR(AVG(R.atmosphere_rating)) AS integer)
+        FROM vegancity_review R
+        WHERE R.vendor_id = vegancity_vendor.id
+        AND R.approval_status = %s
+        """),
+    ('best_vegan_dish_name', """
+        SELECT D.name
+        FROM vegancity_review R INNER JOIN vegancity_vegandish D
+        ON D.id = R.best_vegan_dish_id
+        WHERE R.vendor_id = vegancity_vendor.id
+        AND R.approval_status = %s
+        GROUP BY D.id, D.name
+        ORDER BY count(R.id) DESC, D.name
+        LIMIT 1
+        """),
+))
+
+
+class SynonymSearchQuerySet(SearchQuerySet):
+    def search(self, query, config=None):
+        """
+        Filter to the rows whose search_index matches query, after the
+        query has been expanded with the SearchSynonyms. An empty query
+        matches everything.
+        """
+        if not query:
+            return self
+
+        qn = connections[self.db].ops.quote_name
+        vector = '%s.%s' % (qn(self.model._meta.db_table),
+                            qn(self.manager.search_field))
+        where = fulltext.search_sql(vector, config or self.manager.config)
+        return self.extra(where=[where], params=[query])
+
+
+class SearchByVendorQuerySet(SynonymSearchQuerySet, GeoQuerySet):
     def vendor_search(self, *args, **kwargs):
         from models import Vendor
         qs = self.search(*args, **kwargs).values_list('vendor', flat=True)
@@ -81,7 +134,7 @@ class ReviewManager(SearchByVendorManager):
         return pending
 
 
-class VendorQuerySet(GeoQuerySet, SearchQuerySet):
+class VendorQuerySet(GeoQuerySet, SynonymSearchQuerySet):
     def pending_approval(self):
         """returns all vendors that are not approved, which are
         otherwise impossible to get in a normal query."""
@@ -109,6 +162,40 @@ class VendorQuerySet(GeoQuerySet, SearchQuerySet):
         except IndexError:
             return None
 
+    def get_by_url_key(self, key):
+        """
+        Find the vendor for the key in a vendor url, which is either its
+        id and slug ("12-blackbird-pizzeria"), its id alone, or its slug
+        alone. An id with an old slug still finds the vendor. Returns
+        None when there's no such vendor.
+        """
+        by_pk = None
+        match = VENDOR_URL_KEY_RE.match(key)
+        if match:
+            pk, slug = match.groups()
+            by_pk = self.filter(pk=pk).first()
+            if by_pk is not None and slug in (None, by_pk.slug):
+                return by_pk
+        by_slug = self.filter(slug=key).first()
+        if by_slug is not None:
+            return by_slug
+        return by_pk
+
+    def with_ratings(self, *names):
+        """
+        Annotate each vendor with the summaries of its approved reviews
+        so that they can be read without running extra queries per vendor.
+
+        The values match those returned by Vendor.food_rating,
+        Vendor.atmosphere_rating and Vendor.best_vegan_dish (by name).
+        Pass the names of the annotations to limit them to a subset.
+        """
+        names = names or RATING_SELECTS.keys()
+        select = SortedDict((name, RATING_SELECTS[name]) for name in names)
+
+        return self.extra(select=select,
+                          select_params=[SF.APPROVED] * len(select))
+
 
 class VendorManager(SearchManagerMixIn, models.GeoManager):
     def get_queryset(self):
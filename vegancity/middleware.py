@@ -0,0 +1,112 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from vegancity import caching, compression, routers
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaMiddleware(object):
+    """
+    Let read-only requests read from the replicas.
+
+    A request reads from the primary instead when:
+
+    - it isn't a GET or HEAD, or its path starts with one of
+      PRIMARY_ONLY_URL_PREFIXES (the admin and account pages).
+    - the client wrote something in the last REPLICA_PIN_SECONDS, which
+      is remembered with a cookie, so that users see their own reviews
+      and vendors straight away.
+    - any vendor data changed in the last REPLICA_PIN_SECONDS, so that
+      the caches rebuilt after a change aren't built from stale data.
+    """
+
+    def use_replicas(self, request):
+        return (bool(settings.DATABASE_REPLICAS) and
+                request.method in SAFE_METHODS and
+                not request.path.startswith(
+                    settings.PRIMARY_ONLY_URL_PREFIXES) and
+                settings.REPLICA_PIN_COOKIE not in request.COOKIES and
+                not caching.data_changed_within(
+                    settings.REPLICA_PIN_SECONDS))
+
+    def process_request(self, request):
+        routers.start_request(self.use_replicas(request))
+
+    def process_response(self, request, response):
+        if routers.wrote() or request.method not in SAFE_METHODS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        routers.end_request()
+        return response
+
+
+class CompressionMiddleware(object):
+    """
+    Compress html and api responses with brotli or gzip, whichever the
+    client accepts, see vegancity.compression.
+
+    Only responses of RESPONSE_COMPRESSION_TYPES are compressed, and
+    only those of at least RESPONSE_COMPRESSION_MIN_SIZE bytes unless
+    they are streamed. Streamed responses are compressed a chunk at a
+    time as they go out.
+    """
+
+    def compressible(self, response):
+        content_type = response.get('Content-Type', '').split(';')[0]
+        return (content_type.strip().lower() in
+                settings.RESPONSE_COMPRESSION_TYPES and
+                not response.has_header('Content-Encoding') and
+                (response.streaming or len(response.content) >=
+                 settings.RESPONSE_COMPRESSION_MIN_SIZE))
+
+    def process_response(self, request, response):
+        if (not settings.RESPONSE_COMPRESSION_ENABLED or
+                not self.compressible(response)):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        content_type = response['Content-Type']
+        if response.streaming:
+            response.streaming_content = compression.compress_sequence(
+                response.streaming_content, encoding, content_type)
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(response.content, encoding,
+                                              content_type)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # the compressed bytes differ, but it's the same page: a weak
+        # ETag still matches the If-None-Match of an uncompressed copy.
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^(?!W/)', 'W/', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+CONFIG = 'public.vegancity'
+PREVIOUS_CONFIG = 'pg_catalog.english'
+
+SEARCHED_COLUMNS = (
+    ('vegancity_vendor', (('name', 'A'), ('notes', 'B'),
+                          ('address', 'C'), ('website', 'D'))),
+    ('vegancity_review', (('title', 'A'), ('content', 'B'))),
+    ('vegancity_vegandish', (('name', 'A'),)),
+    ('vegancity_cuisinetag', (('name', 'A'), ('description', 'B'))),
+    ('vegancity_featuretag', (('name', 'A'), ('description', 'B'))),
+)
+
+# a hand-picked starting vocabulary of the ways people write the same
+# foods and places. Staff can add more in the admin.
+SYNONYMS = (
+    ('seitan', 'wheat meat'),
+    ('seitan', 'wheat gluten'),
+    ('gf', 'gluten free'),
+    ('vegan cheese', 'cashew cheese'),
+    ('vegan cheese', 'daiya'),
+    ('fake meat', 'mock meat'),
+    ('fake meat', 'faux meat'),
+    ('fake meat', 'meat substitute'),
+    ('cheesesteak', 'cheese steak'),
+    ('bbq', 'barbecue'),
+    ('veggie burger', 'vegan burger'),
+    ('tofu', 'bean curd'),
+    ('soy milk', 'soymilk'),
+    ('nondairy', 'dairy free'),
+    ('coffeehouse', 'coffee shop'),
+    ('coffeehouse', 'cafe'),
+    ('food cart', 'food truck'),
+    ('dessert', 'sweet treats'),
+)
+
+
+# as in vegancity.fulltext, frozen here
+
+
+def _trigger_name(table):
+    return '%s_search_index_update' % table
+
+
+def _vector_sql(columns, config, row='NEW'):
+    return ' || '.join(
+        "setweight(to_tsvector('%s', coalesce(%s.%s, '')), '%s')" %
+        (config, row, column, weight) for column, weight in columns)
+
+
+def _create_trigger_sql(table, columns, config):
+    name = _trigger_name(table)
+    return [
+        """
+        CREATE OR REPLACE FUNCTION %(function)s() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_index := %(vector)s;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """ % {'function': name,
+               'vector': _vector_sql(columns, config)},
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, table),
+        """
+        CREATE TRIGGER %(trigger)s
+        BEFORE INSERT OR UPDATE OF %(columns)s ON %(table)s
+        FOR EACH ROW EXECUTE PROCEDURE %(function)s()
+        """ % {'trigger': name,
+               'columns': ', '.join(column for column, _ in columns),
+               'table': table,
+               'function': name},
+    ]
+
+
+SYNONYM_TABLE = 'vegancity_searchsynonym'
+SYNONYM_RULES_TABLE = 'vegancity_searchsynonym_rule'
+SYNONYM_RULES_FUNCTION = '%s_update' % SYNONYM_RULES_TABLE
+
+
+def _create_config_sql(name):
+    return [
+        "CREATE TEXT SEARCH CONFIGURATION %s (COPY = pg_catalog.english)"
+        % name,
+        "ALTER TEXT SEARCH CONFIGURATION %s "
+        "ALTER MAPPING FOR hword, hword_part, word "
+        "WITH unaccent, english_stem" % name,
+    ]
+
+
+def _synonym_rules_sql(config):
+    return """
+        INSERT INTO %(rules)s (target, substitute)
+        SELECT target, target || other FROM (
+            SELECT plainto_tsquery('%(config)s', term) AS target,
+                   plainto_tsquery('%(config)s', synonym) AS other
+            FROM %(synonyms)s
+          UNION ALL
+            SELECT plainto_tsquery('%(config)s', synonym),
+                   plainto_tsquery('%(config)s', term)
+            FROM %(synonyms)s
+        ) AS pairs
+        WHERE numnode(target) > 0 AND numnode(other) > 0
+        """ % {'rules': SYNONYM_RULES_TABLE,
+               'synonyms': SYNONYM_TABLE,
+               'config': config}
+
+
+def _create_synonym_rules_sql(config):
+    name = SYNONYM_RULES_FUNCTION
+    return [
+        """
+        CREATE OR REPLACE FUNCTION %(function)s() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM %(rules)s;
+            %(insert)s;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """ % {'function': name,
+               'rules': SYNONYM_RULES_TABLE,
+               'insert': _synonym_rules_sql(config)},
+        "DROP TRIGGER IF EXISTS %s ON %s" % (name, SYNONYM_TABLE),
+        """
+        CREATE TRIGGER %(trigger)s
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %(table)s
+        FOR EACH STATEMENT EXECUTE PROCEDURE %(function)s()
+        """ % {'trigger': name,
+               'table': SYNONYM_TABLE,
+               'function': name},
+        "DELETE FROM %s" % SYNONYM_RULES_TABLE,
+        _synonym_rules_sql(config),
+    ]
+
+
+def _rebuild_search_indexes(config):
+    for table, columns in SEARCHED_COLUMNS:
+        for sql in _create_trigger_sql(table, columns, config):
+            db.execute(sql)
+        db.execute("UPDATE %s SET search_index = %s" %
+                   (table, _vector_sql(columns, config, row=table)))
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'SearchSynonym'
+        db.create_table(u'vegancity_searchsynonym', (
+            (u'id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('term', self.gf('django.db.models.fields.CharField')(max_length=255)),
+            ('synonym', self.gf('django.db.models.fields.CharField')(max_length=255)),
+            ('created', self.gf('django.db.models.fields.DateTimeField')(auto_now_add=True, null=True, blank=True)),
+        ))
+        db.send_create_signal(u'vegancity', ['SearchSynonym'])
+
+        # Adding unique constraint on 'SearchSynonym', fields ['term', 'synonym']
+        db.create_unique(u'vegancity_searchsynonym', ['term', 'synonym'])
+
+        # unaccent is normally installed by ansible, as it needs a
+        # superuser; this covers development and test databases.
+        db.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        for sql in _create_config_sql(CONFIG):
+            db.execute(sql)
+
+        db.execute("CREATE TABLE %s (target tsquery, substitute tsquery)" %
+                   SYNONYM_RULES_TABLE)
+        for sql in _create_synonym_rules_sql(CONFIG):
+            db.execute(sql)
+        for term, synonym in SYNONYMS:
+            db.execute("INSERT INTO vegancity_searchsynonym "
+                       "(term, synonym, created) VALUES (%s, %s, now())",
+                       [term, synonym])
+        _rebuild_search_indexes(CONFIG)
+
+    def backwards(self, orm):
+        _rebuild_search_indexes(PREVIOUS_CONFIG)
+        db.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS %s" % CONFIG)
+        db.execute("DROP TRIGGER IF EXISTS %s ON %s" %
+                   (SYNONYM_RULES_FUNCTION, SYNONYM_TABLE))
+        db.execute("DROP FUNCTION IF EXISTS %s()" % SYNONYM_RULES_FUNCTION)
+        db.execute("DROP TABLE %s" % SYNONYM_RULES_TABLE)
+
+        # Removing unique constraint on 'SearchSynonym', fields ['term', 'synonym']
+        db.delete_unique(u'vegancity_searchsynonym', ['term', 'synonym'])
+
+        # Deleting model 'SearchSynonym'
+        db.delete_table(u'vegancity_searchsynonym')
+
+
+    models = {
+        u'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': u"orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        u'auth.permission': {
+            'Meta': {'ordering': "(u'content_type__app_label', u'content_type__model', u'codename')", 'unique_together': "((u'content_type', u'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['contenttypes.ContentType']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        u'auth.user': {
+            'Meta': {'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Group']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'related_name': "u'user_set'", 'blank': 'True', 'to': u"orm['auth.Permission']"}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '30'})
+        },
+        u'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        u'vegancity.cuisinetag': {
+            'Meta': {'ordering': "('name',)", 'object_name': 'CuisineTag'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'search_index': ('djorm_pgfulltext.fields.VectorField', [], {'default': "''", 'null': 'True', 'db_index': 'True'})
+        },
+        u'vegancity.featuretag': {
+            'Meta': {'ordering': "('name',)", 'object_name': 'FeatureTag'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'search_index': ('djorm_pgfulltext.fields.VectorField', [], {'default': "''", 'null': 'True', 'db_index': 'True'})
+        },
+        u'vegancity.neighborhood': {
+            'Meta': {'ordering': "('name',)", 'object_name': 'Neighborhood'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'})
+        },
+        u'vegancity.outboundemail': {
+            'Meta': {'ordering': "('id',)", 'object_name': 'OutboundEmail', 'index_together': "[['status', 'send_after']]"},
+            'attempts': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'html_body': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'kind': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'last_error': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'recipients': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'send_after': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime.now'}),
+            'sender': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'sent': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'status': ('django.db.models.fields.CharField', [], {'default': "'queued'", 'max_length': '20'}),
+            'subject': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'text_body': ('django.db.models.fields.TextField', [], {}),
+            'to_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'})
+        },
+        u'vegancity.review': {
+            'Meta': {'ordering': "('created',)", 'object_name': 'Review', 'index_together': "[['modified', 'id'], ['created', 'id']]"},
+            'approval_status': ('vegancity.fields.StatusField', [], {'default': "'pending'", 'max_length': '100', 'db_index': 'True'}),
+            'atmosphere_rating': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'author': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.User']"}),
+            'best_vegan_dish': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['vegancity.VeganDish']", 'null': 'True', 'blank': 'True'}),
+            'content': ('django.db.models.fields.TextField', [], {}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'food_rating': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'modified': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'search_index': ('djorm_pgfulltext.fields.VectorField', [], {'default': "''", 'null': 'True', 'db_index': 'True'}),
+            'suggested_cuisine_tags': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'suggested_feature_tags': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'unlisted_vegan_dish': ('django.db.models.fields.CharField', [], {'max_length': '100', 'null': 'True', 'blank': 'True'}),
+            'vendor': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['vegancity.Vendor']"})
+        },
+        u'vegancity.searchsynonym': {
+            'Meta': {'ordering': "('term', 'synonym')", 'unique_together': "(('term', 'synonym'),)", 'object_name': 'SearchSynonym'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'synonym': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'term': ('django.db.models.fields.CharField', [], {'max_length': '255'})
+        },
+        u'vegancity.userprofile': {
+            'Meta': {'object_name': 'UserProfile'},
+            'bio': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'karma_points': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'mailing_list': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.User']", 'unique': 'True'})
+        },
+        u'vegancity.vegandish': {
+            'Meta': {'ordering': "('name',)", 'object_name': 'VeganDish'},
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'search_index': ('djorm_pgfulltext.fields.VectorField', [], {'default': "''", 'null': 'True', 'db_index': 'True'})
+        },
+        u'vegancity.veglevel': {
+            'Meta': {'object_name': 'VegLevel'},
+            'description': ('django.db.models.fields.TextField', [], {}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'}),
+            'super_category': ('django.db.models.fields.CharField', [], {'max_length': '30'})
+        },
+        u'vegancity.vendor': {
+            'Meta': {'ordering': "('name',)", 'object_name': 'Vendor', 'index_together': "[['modified', 'id']]"},
+            'address': ('django.db.models.fields.TextField', [], {'null': 'True'}),
+            'approval_status': ('vegancity.fields.StatusField', [], {'default': "'pending'", 'max_length': '100', 'db_index': 'True'}),
+            'created': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'null': 'True', 'blank': 'True'}),
+            'cuisine_tags': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'to': u"orm['vegancity.CuisineTag']", 'null': 'True', 'blank': 'True'}),
+            'feature_tags': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'to': u"orm['vegancity.FeatureTag']", 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'location': ('django.contrib.gis.db.models.fields.PointField', [], {'default': 'None', 'null': 'True', 'blank': 'True'}),
+            'modified': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255', 'db_index': 'True'}),
+            'neighborhood': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['vegancity.Neighborhood']", 'null': 'True', 'blank': 'True'}),
+            'notes': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'phone': ('django.db.models.fields.CharField', [], {'max_length': '50', 'null': 'True', 'blank': 'True'}),
+            'search_index': ('djorm_pgfulltext.fields.VectorField', [], {'default': "''", 'null': 'True', 'db_index': 'True'}),
+            'submitted_by': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['auth.User']", 'null': 'True', 'blank': 'True'}),
+            'veg_level': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['vegancity.VegLevel']", 'null': 'True', 'blank': 'True'}),
+            'vegan_dishes': ('django.db.models.fields.related.ManyToManyField', [], {'symmetrical': 'False', 'to': u"orm['vegancity.VeganDish']", 'null': 'True', 'blank': 'True'}),
+            'website': ('django.db.models.fields.URLField', [], {'max_length': '200', 'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['vegancity']
\ No newline at end of file
@@ -15,20 +15,24 @@
 # You should have received a copy of the GNU General Public License
 # along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
 
+from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
 from django.contrib.auth.models import User
 
-from django.db.models.signals import m2m_changed
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save)
 
 
 from django.template.defaultfilters import slugify
+from django.utils import timezone
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 
 import collections
 import logging
 
-from vegancity import geocode, validators
+from vegancity import caching, dbhealth, geocode, pagecache, validators
 import email
 from vegancity.managers import (VendorManager, SearchByVendorManager,
                                 ReviewManager)
@@ -39,6 +43,9 @@ from djorm_pgfulltext.fields import VectorField
 
 logger = logging.getLogger(__name__)
 
+# the other urls under /vendors/, which vendor slugs must not shadow
+RESERVED_VENDOR_SLUGS = ('add', 'review', 'typeahead')
+
 
 class _TagModel(models.Model):
 
@@ -117,9 +124,11 @@ class VeganDish(models.Model):
 
     search_index = VectorField()
 
+    # search_index is kept up to date by a database trigger, see
+    # vegancity.fulltext.
     objects = SearchByVendorManager(
-        fields=('name'),
-        auto_update_search_field=True
+        fields=(('name', 'A'),),
+        config=settings.SEARCH_CONFIG
     )
 
     def __unicode__(self):
@@ -145,8 +154,8 @@ class Review(models.Model):
     search_index = VectorField()
 
     objects = ReviewManager(
-        fields=('title', 'content'),
-        auto_update_search_field = True
+        fields=(('title', 'A'), ('content', 'B')),
+        config=settings.SEARCH_CONFIG
     )
 
     # DESCRIPTIVE FIELDS
@@ -177,11 +186,14 @@ class Review(models.Model):
         return "%s -- %s" % (self.vendor.name, str(self.created))
 
     def get_absolute_url(self):
-        return "/vendors/%d-%s/" % (self.vendor.id, slugify(self.vendor.name))
+        # select_related('vendor') when linking many reviews
+        return self.vendor.get_absolute_url()
 
     class Meta:
         get_latest_by = "created"
         ordering = ('created',)
+        index_together = [['modified', 'id'], ['created', 'id'],
+                          ['author', 'created', 'id']]
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
 
@@ -192,6 +204,8 @@ class Vendor(models.Model):
 
     # CORE FIELDS
     name = models.CharField(max_length=255, unique=True, db_index=True)
+    # kept in step with name by save()
+    slug = models.SlugField(max_length=255, unique=True, editable=False)
     address = models.TextField(null=True)
     neighborhood = models.ForeignKey('Neighborhood', blank=True, null=True,
                                      db_index=True)
@@ -211,8 +225,9 @@ class Vendor(models.Model):
     search_index = VectorField()
 
     objects = VendorManager(
-        fields=('name', 'notes', 'website', 'address'),
-        auto_update_search_field = True
+        fields=(('name', 'A'), ('notes', 'B'), ('address', 'C'),
+                ('website', 'D')),
+        config=settings.SEARCH_CONFIG
     )
 
     # DESCRIPTIVE FIELDS
@@ -298,7 +313,25 @@ class Vendor(models.Model):
         else:
             self.save_existing(*args, **kwargs)
 
+    def unique_slug(self):
+        """
+        A slug for the vendor's name that no other vendor has, and that
+        doesn't collide with the other urls under /vendors/.
+        """
+        base = slugify(self.name)[:240] or 'vendor'
+        taken = set(Vendor.objects
+                    .filter(slug__startswith=base)
+                    .exclude(pk=self.pk)
+                    .values_list('slug', flat=True))
+        taken.update(RESERVED_VENDOR_SLUGS)
+        slug, n = base, 1
+        while slug in taken:
+            n += 1
+            slug = '%s-%d' % (base, n)
+        return slug
+
     def save_new(self, *args, **kwargs):
+        self.slug = self.unique_slug()
         if self.address:
             self.apply_geocoding()
         super(Vendor, self).save(*args, **kwargs)
@@ -309,6 +342,9 @@ class Vendor(models.Model):
 
         self.validate_pending(previous_state)
 
+        if not self.slug or self.name != previous_state.name:
+            self.slug = self.unique_slug()
+
         if self.needs_geocoding(previous_state):
             self.apply_geocoding()
 
@@ -376,7 +412,9 @@ class Vendor(models.Model):
             return None
 
     def get_absolute_url(self):
-        return "/vendors/%d-%s/" % (self.id, slugify(self.name))
+        if not self.slug:
+            return "/vendors/%d/" % self.id
+        return "/vendors/%d-%s/" % (self.id, self.slug)
 
     def __unicode__(self):
         return self.name
@@ -391,6 +429,7 @@ class Vendor(models.Model):
     class Meta:
         get_latest_by = "created"
         ordering = ('name',)
+        index_together = [['modified', 'id']]
         verbose_name = "Vendor"
         verbose_name_plural = "Vendors"
 
@@ -442,8 +481,8 @@ class CuisineTag(_TagModel):
     search_index = VectorField()
 
     objects = SearchByVendorManager(
-        fields=('name', 'description'),
-        auto_update_search_field=True
+        fields=(('name', 'A'), ('description', 'B')),
+        config=settings.SEARCH_CONFIG
     )
 
     class Meta(_TagModel.Meta):
@@ -455,10 +494,213 @@ class FeatureTag(_TagModel):
     search_index = VectorField()
 
     objects = SearchByVendorManager(
-        fields=('name', 'description'),
-        auto_update_search_field=True
+        fields=(('name', 'A'), ('description', 'B')),
+        config=settings.SEARCH_CONFIG
     )
 
     class Meta(_TagModel.Meta):
         verbose_name = "Feature Tag"
         verbose_name_plural = "Feature Tags"
+
+
+#######################################
+# SEARCH
+#######################################
+
+
+class SearchSynonym(models.Model):
+    """
+    Two words or phrases that search treats as the same, in both
+    directions. Queries are expanded in the database, see
+    vegancity.fulltext.
+    """
+    term = models.CharField(max_length=255)
+    synonym = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True, null=True)
+
+    def __unicode__(self):
+        return u'%s = %s' % (self.term, self.synonym)
+
+    class Meta:
+        ordering = ('term', 'synonym')
+        unique_together = (('term', 'synonym'),)
+        verbose_name = "Search Synonym"
+        verbose_name_plural = "Search Synonyms"
+
+
+#######################################
+# OUTBOUND EMAIL
+#######################################
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting for the send_queued_email worker. Messages with
+    to_staff set go to every staff member, and are combined into a
+    digest when several of the same kind are waiting.
+    """
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((QUEUED, 'Queued'),
+                      (SENDING, 'Sending'),
+                      (SENT, 'Sent'),
+                      (FAILED, 'Failed'))
+
+    kind = models.CharField(max_length=50)
+    subject = models.CharField(max_length=255)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    sender = models.CharField(max_length=255)
+    recipients = models.TextField(blank=True,
+                                  help_text="One address per line.")
+    to_staff = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+
+    def __unicode__(self):
+        return self.subject
+
+    class Meta:
+        ordering = ('id',)
+        index_together = [['status', 'send_after']]
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+
+
+#######################################
+# CACHE INVALIDATION
+#######################################
+
+
+def bump_data_version(sender, **kwargs):
+    # m2m_changed is sent before and after each change, only count
+    # the changes that actually happened.
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        caching.bump_data_version()
+
+for model in (Vendor, Review, VeganDish, CuisineTag, FeatureTag,
+              Neighborhood, VegLevel, SearchSynonym):
+    post_save.connect(bump_data_version, sender=model)
+    post_delete.connect(bump_data_version, sender=model)
+
+for through in (Vendor.cuisine_tags.through, Vendor.feature_tags.through,
+                Vendor.vegan_dishes.through):
+    m2m_changed.connect(bump_data_version, sender=through)
+
+
+# the models whose instances cached pages are tagged with
+PAGE_CACHE_MODELS = (Vendor, Review, VeganDish, CuisineTag, FeatureTag,
+                     Neighborhood, VegLevel, User)
+
+
+def purge_pages(sender, instance, **kwargs):
+    pagecache.purge(sender, [instance.pk])
+    if sender is Review:
+        # reviews are listed on their vendor's and their author's pages
+        pagecache.purge(Vendor, [instance.vendor_id], lists=False)
+        pagecache.purge(User, [instance.author_id], lists=False)
+
+
+def purge_related_pages(sender, instance, action, model, pk_set=None,
+                        **kwargs):
+    if action.startswith('post_'):
+        pagecache.purge(instance.__class__, [instance.pk])
+        # pk_set is None when the relation was cleared
+        pagecache.purge(model, pk_set or ())
+
+for model in PAGE_CACHE_MODELS:
+    post_init.connect(pagecache.collect, sender=model)
+    post_save.connect(purge_pages, sender=model)
+    post_delete.connect(purge_pages, sender=model)
+
+for through in (Vendor.cuisine_tags.through, Vendor.feature_tags.through,
+                Vendor.vegan_dishes.through):
+    m2m_changed.connect(purge_related_pages, sender=through)
+
+
+def remember_approval_status(sender, instance, **kwargs):
+    # read the field from __dict__ so that deferred instances don't
+    # run a query for it.
+    instance._loaded_approval_status = instance.__dict__.get(
+        'approval_status')
+
+
+def update_pending_count(sender, instance, created=False, **kwargs):
+    previous = getattr(instance, '_loaded_approval_status', None)
+
+    if created:
+        previous = None
+    elif previous is None:
+        # we don't know what the status was before, so count again
+        caching.invalidate_pending_count()
+        return
+
+    current = instance.approval_status
+    caching.adjust_pending_count((current == SF.PENDING) -
+                                 (previous == SF.PENDING))
+    instance._loaded_approval_status = current
+
+
+def decrement_pending_count(sender, instance, **kwargs):
+    status = instance.__dict__.get('approval_status')
+    if status is None:
+        caching.invalidate_pending_count()
+    elif status == SF.PENDING:
+        caching.adjust_pending_count(-1)
+
+for model in (Vendor, Review):
+    post_init.connect(remember_approval_status, sender=model)
+    post_save.connect(update_pending_count, sender=model)
+    post_delete.connect(decrement_pending_count, sender=model)
+
+
+def invalidate_review_stats(sender, instance, **kwargs):
+    caching.invalidate_user_review_stats([instance.author_id])
+
+post_save.connect(invalidate_review_stats, sender=Review)
+post_delete.connect(invalidate_review_stats, sender=Review)
+
+
+# the fields that decide whether a user gets staff alerts
+_STAFF_RECIPIENT_FIELDS = ('is_staff', 'is_active', 'email')
+
+
+def remember_staff_fields(sender, instance, **kwargs):
+    instance._loaded_staff_fields = tuple(
+        instance.__dict__.get(field) for field in _STAFF_RECIPIENT_FIELDS)
+
+
+def staff_fields_changed(sender, instance, created=False, **kwargs):
+    current = tuple(instance.__dict__.get(field)
+                    for field in _STAFF_RECIPIENT_FIELDS)
+    previous = getattr(instance, '_loaded_staff_fields', None)
+
+    # logins save the user too, but rarely change any of these
+    if created or current != previous:
+        caching.invalidate_staff_recipients()
+    instance._loaded_staff_fields = current
+
+
+def staff_user_deleted(sender, instance, **kwargs):
+    caching.invalidate_staff_recipients()
+
+post_init.connect(remember_staff_fields, sender=User)
+post_save.connect(staff_fields_changed, sender=User)
+post_delete.connect(staff_user_deleted, sender=User)
+
+
+#######################################
+# DATABASE CONNECTIONS
+#######################################
+
+request_started.connect(dbhealth.check_connections)
+request_finished.connect(dbhealth.mark_used)
@@ -0,0 +1,123 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The moderation queue: vendors and reviews waiting for a staff member
+to approve or quarantine them.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from vegancity import caching, email, models, pagecache
+from vegancity.fields import StatusField as SF
+from vegancity.paginators import KeysetPaginator
+
+QUEUE_PAGE_SIZE = 50
+
+
+class Queue(object):
+    def __init__(self, name, title, model, related):
+        self.name = name
+        self.title = title
+        self.model = model
+        self.related = related
+
+    def items(self):
+        """
+        The pending items, with everything the queue page shows about
+        them loaded in the same query.
+        """
+        return (self.model.objects.pending_approval()
+                .select_related(*self.related))
+
+
+QUEUES = {
+    'vendors': Queue('vendors', "Pending Vendors", models.Vendor,
+                     ('submitted_by', 'neighborhood')),
+    'reviews': Queue('reviews', "Pending Reviews", models.Review,
+                     ('vendor', 'author')),
+}
+
+
+class QueuePaginator(KeysetPaginator):
+    """
+    Pages through a queue oldest first. The total is already shown by
+    pending_count(), so the pages themselves don't count anything.
+    """
+
+    def include_count(self):
+        return False
+
+
+def pending_count():
+    "The number of vendors and reviews waiting for approval."
+    count = cache.get(caching.PENDING_COUNT_KEY)
+    if count is None:
+        count = (models.Vendor.objects.pending_approval().count() +
+                 models.Review.objects.pending_approval().count())
+        cache.set(caching.PENDING_COUNT_KEY, count,
+                  settings.PENDING_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def set_status(model, ids, status):
+    """
+    Move the pending items of model with the given ids to status,
+    in a single UPDATE. Items that aren't pending are left alone.
+
+    Returns the ids of the items that were changed.
+    """
+    ids = [int(pk) for pk in ids]
+    if not ids:
+        return []
+
+    # the status check in the WHERE clause makes the transition safe
+    # against another moderator acting on the same items.
+    with transaction.atomic():
+        cursor = connection.cursor()
+        cursor.execute("UPDATE %s SET approval_status = %%s, modified = %%s "
+                       "WHERE id = ANY(%%s) AND approval_status = %%s "
+                       "RETURNING id" % model._meta.db_table,
+                       [status, timezone.now(), ids, SF.PENDING])
+        changed = [row[0] for row in cursor.fetchall()]
+
+    if changed:
+        caching.adjust_pending_count(-len(changed))
+        caching.bump_data_version()
+        pagecache.purge(model, changed)
+
+    if changed and model is models.Review:
+        vendor_ids, author_ids = zip(*models.Review.objects
+                                     .filter(pk__in=changed)
+                                     .values_list('vendor_id', 'author_id'))
+        # the UPDATE skips models.purge_pages, which purges the pages
+        # that reviews are listed on as well
+        pagecache.purge(models.Vendor, set(vendor_ids), lists=False)
+        pagecache.purge(models.User, set(author_ids), lists=False)
+        caching.invalidate_user_review_stats(set(author_ids))
+
+    if changed and model is models.Vendor and status == SF.APPROVED:
+        vendors = (models.Vendor.objects
+                   .filter(pk__in=changed, submitted_by__isnull=False)
+                   .exclude(submitted_by__email='')
+                   .select_related('submitted_by'))
+        email.send_new_vendor_approvals(vendors)
+
+    return changed
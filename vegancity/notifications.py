@@ -0,0 +1,76 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Building blocks for the emails the site sends: compiled templates
+that are kept between messages, and the cached list of staff
+addresses that alerts go to.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.template import Context
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+from vegancity import caching
+
+_templates = {}
+
+
+def get_email_template(template_name):
+    """
+    Return the compiled template, loading it only the first time.
+    Templates are reloaded every time in DEBUG, so that edits show up.
+    """
+    if settings.DEBUG:
+        return get_template(template_name)
+    if template_name not in _templates:
+        _templates[template_name] = get_template(template_name)
+    return _templates[template_name]
+
+
+def render(template_name, ctx):
+    "Render an email template once, returning its text and html parts."
+    html_body = get_email_template(template_name).render(Context(ctx))
+    return strip_tags(html_body), html_body
+
+
+def build_message(subject, template_name, ctx, recipients=None):
+    text_body, html_body = render(template_name, ctx)
+    msg = EmailMultiAlternatives(subject,
+                                 text_body,
+                                 settings.EMAIL_HOST_USER,
+                                 recipients)
+    msg.attach_alternative(html_body, 'text/html')
+    return msg
+
+
+def staff_recipients():
+    """
+    The addresses of the active staff members. The list is cached until
+    a user's staff status, active status or address changes.
+    """
+    recipients = cache.get(caching.STAFF_RECIPIENTS_KEY)
+    if recipients is None:
+        recipients = list(User.objects.filter(is_staff=True, is_active=True)
+                          .exclude(email='')
+                          .values_list('email', flat=True))
+        cache.set(caching.STAFF_RECIPIENTS_KEY, recipients, None)
+    return recipients
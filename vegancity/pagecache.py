@@ -0,0 +1,230 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A full-page cache for anonymous visitors, purged by surrogate keys.
+
+While a cached view runs, every instance of a tracked model that gets
+loaded is noted, and the page is tagged with each one ("vendor.12").
+Pages that load more than PAGE_CACHE_MAX_TAGS_PER_MODEL instances of
+a model, and views that declare they list a model, are tagged with the
+model instead ("vendor"). Saving or deleting an instance purges its
+own tag and its model's tag, so a vendor edit purges its detail page
+and the pages listing vendors, and nothing else.
+
+Tags are versioned rather than tracked: a page remembers the versions
+of its tags, purging a tag bumps its version, and a page whose tags
+have moved on is stale. That needs nothing more than get_many and
+incr, so it works with any cache backend.
+
+models.py connects the signals that collect and purge tags; code that
+changes rows without sending signals should call purge() itself.
+"""
+
+import functools
+import threading
+import time
+import urllib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from vegancity import caching
+
+TAG_KEY = 'vegancity:pagetag:%s'
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def model_tag(model):
+    return model._meta.concrete_model._meta.model_name
+
+
+def object_tag(model, pk):
+    return '%s.%s' % (model_tag(model), pk)
+
+
+##########################################################
+# collecting tags
+##########################################################
+
+
+def collect(sender, instance, **kwargs):
+    "Note an instance loaded by a cached view. Runs on post_init."
+    collected = getattr(_state, 'collected', None)
+    if collected is not None and instance.pk is not None:
+        collected.setdefault(model_tag(sender), set()).add(instance.pk)
+
+
+def collected():
+    """
+    The instances noted so far in this thread, for threads doing work
+    for the same view to share with share_collected().
+    """
+    return getattr(_state, 'collected', None)
+
+
+def share_collected(collected):
+    _state.collected = collected
+
+
+def _page_tags(collected, lists):
+    tags = set(model_tag(model) for model in lists)
+    for tag, pks in collected.items():
+        if len(pks) > settings.PAGE_CACHE_MAX_TAGS_PER_MODEL:
+            tags.add(tag)
+        else:
+            tags.update('%s.%s' % (tag, pk) for pk in pks)
+    return tags
+
+
+##########################################################
+# tag versions
+##########################################################
+
+
+def _tag_versions(tags):
+    keys = dict((TAG_KEY % tag, tag) for tag in tags)
+    found = cache.get_many(keys.keys())
+    versions = {}
+    for key, tag in keys.items():
+        if key not in found:
+            # like the data version, start from the clock so that a
+            # lost key can't bring back pages from before it was lost
+            cache.add(key, int(time.time() * 1000), None)
+            found[key] = cache.get(key)
+        versions[tag] = found[key]
+    return versions
+
+
+def _is_fresh(entry):
+    tags = entry['tags']
+    if not tags:
+        return True
+    current = cache.get_many([TAG_KEY % tag for tag in tags])
+    return all(current.get(TAG_KEY % tag) == version
+               for tag, version in tags.items())
+
+
+def purge(model, pks=(), lists=True):
+    """
+    Purge the pages tagged with any of the given instances of model,
+    and unless lists is False, the pages that list model.
+    """
+    tags = [object_tag(model, pk) for pk in pks]
+    if lists:
+        tags.append(model_tag(model))
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY % tag)
+        except ValueError:
+            # no page has been tagged with it since the key was lost
+            pass
+
+
+##########################################################
+# the cache itself
+##########################################################
+
+
+def page_key(request):
+    "The cache key for a page: its path and its sorted query string."
+    params = sorted((key, value)
+                    for key, values in request.GET.lists()
+                    for value in values)
+    query = urllib.urlencode([(key, value.encode('utf-8'))
+                              for key, value in params])
+    return caching.make_key('page', request.path, query)
+
+
+def _cacheable_request(request, uncached_params):
+    return (settings.PAGE_CACHE_ENABLED and
+            request.method in SAFE_METHODS and
+            not request.user.is_authenticated() and
+            not any(param in request.GET for param in uncached_params))
+
+
+def _cacheable_response(request, response):
+    # a page with a csrf token, a cookie or a message is for one
+    # visitor only.
+    messages = getattr(request, '_messages', None)
+    return (response.status_code == 200 and
+            not response.streaming and
+            not response.cookies and
+            not request.META.get('CSRF_COOKIE_USED') and
+            not (messages is not None and len(messages)))
+
+
+def _add_headers(response, status, tags=()):
+    response['X-Page-Cache'] = status
+    if settings.PAGE_CACHE_NGINX_SECONDS:
+        response['X-Accel-Expires'] = str(settings.PAGE_CACHE_NGINX_SECONDS)
+        if tags:
+            response['Surrogate-Key'] = ' '.join(sorted(tags))
+
+
+def cache_anonymous_page(lists=(), uncached_params=()):
+    """
+    Cache the pages a view renders for anonymous visitors.
+
+    lists is the models whose every change should purge the page, like
+    the vendors a list page shows; instances the view loads are
+    tracked without being listed here. Requests with any of
+    uncached_params in their query string aren't cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request, uncached_params):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request)
+            entry = cache.get(key)
+            if entry is not None and _is_fresh(entry):
+                response = HttpResponse(entry['content'],
+                                        content_type=entry['content_type'])
+                _add_headers(response, 'hit', entry['tags'])
+                return response
+
+            data_version = caching.get_data_version()
+            _state.collected = {}
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    # TemplateResponses render lazily, render them while
+                    # their queries can still be noted.
+                    response.render()
+                collected = _state.collected
+            finally:
+                _state.collected = None
+
+            tags = _page_tags(collected, lists)
+            # anything that changed while the page rendered may not be
+            # in it, and must not be cached under the new tag versions.
+            if (_cacheable_response(request, response) and
+                    caching.get_data_version() == data_version):
+                cache.set(key, {'content': response.content,
+                                'content_type': response['Content-Type'],
+                                'tags': _tag_versions(tags)},
+                          settings.PAGE_CACHE_TIMEOUT)
+            _add_headers(response, 'miss', tags)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,196 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import datetime
+import json
+
+from urllib import urlencode
+
+from django.db.models import Q
+from tastypie.exceptions import BadRequest
+from tastypie.paginator import Paginator
+
+
+def _encode_key_value(value):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which
+    # isn't precise enough to resume from.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError("%r is not JSON serializable" % value)
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginates by remembering where the previous page ended, instead of
+    by offset, so that a deep page costs the same as the first one.
+
+    Each page's meta contains a ``next`` uri with an opaque ``cursor``
+    parameter. Clients choose a sort order with ``?ordering=`` (one of
+    the keys in ``orderings``) and can skip the total count with
+    ``?count=false``.
+
+    Requests that pass an explicit ``offset`` are paginated the old
+    way, so that existing clients keep working.
+    """
+
+    # maps each ordering name to the fields that make up its key,
+    # the last of which must be unique. Prefix a field with '-' to sort
+    # it descending.
+    orderings = {'id': ('id',)}
+    default_ordering = 'id'
+
+    def get_ordering(self):
+        ordering = self.request_data.get('ordering', self.default_ordering)
+        if ordering not in self.orderings:
+            raise BadRequest("Invalid ordering '%s' provided. Please use "
+                             "one of: %s." %
+                             (ordering, ', '.join(sorted(self.orderings))))
+        return ordering
+
+    def encode_cursor(self, ordering, obj):
+        values = [getattr(obj, field.lstrip('-'))
+                  for field in self.orderings[ordering]]
+        payload = json.dumps([ordering, values], default=_encode_key_value)
+        return base64.urlsafe_b64encode(payload)
+
+    def decode_cursor(self, cursor):
+        try:
+            ordering, values = json.loads(base64.urlsafe_b64decode(
+                str(cursor)))
+        except (TypeError, ValueError):
+            raise BadRequest("Invalid cursor '%s' provided." % cursor)
+
+        if (ordering not in self.orderings or
+                len(values) != len(self.orderings[ordering])):
+            raise BadRequest("Invalid cursor '%s' provided." % cursor)
+
+        return ordering, values
+
+    def after(self, objects, fields, values):
+        """
+        Filter objects to those that sort after values, comparing fields
+        in order. The leading field also gets a plain >= (or <=) bound so
+        that the database can start its index scan in the right place.
+        """
+        def lookup(field, op):
+            if field.startswith('-'):
+                return '%s__%s' % (field[1:], {'gt': 'lt', 'gte': 'lte'}[op])
+            return '%s__%s' % (field, op)
+
+        def after_q(fields, values):
+            field, value = fields[0], values[0]
+            q = Q(**{lookup(field, 'gt'): value})
+            if len(fields) > 1:
+                q |= (Q(**{field.lstrip('-'): value}) &
+                      after_q(fields[1:], values[1:]))
+            return q
+
+        return objects.filter(Q(**{lookup(fields[0], 'gte'): values[0]}) &
+                              after_q(fields, values))
+
+    def include_count(self):
+        return self.request_data.get('count', 'true').lower() not in (
+            'false', '0', 'no')
+
+    def get_next_uri(self, limit, cursor):
+        if self.resource_uri is None:
+            return None
+
+        request_params = dict((key, value) for key, value
+                              in self.request_data.items()
+                              if key not in ('offset', 'ordering'))
+        request_params.update({'limit': limit, 'cursor': cursor})
+
+        return '%s?%s' % (self.resource_uri, urlencode(request_params))
+
+    def page(self):
+        if 'offset' in self.request_data and \
+                'cursor' not in self.request_data:
+            return super(KeysetPaginator, self).page()
+
+        limit = self.get_limit()
+        cursor = self.request_data.get('cursor')
+
+        if cursor:
+            ordering, values = self.decode_cursor(cursor)
+        else:
+            ordering, values = self.get_ordering(), None
+
+        fields = self.orderings[ordering]
+        objects = self.objects.order_by(*fields)
+
+        if values is not None:
+            objects = self.after(objects, fields, values)
+
+        if limit:
+            # fetch one extra row to find out if there is a next page
+            page = list(objects[:limit + 1])
+            has_next = len(page) > limit
+            page = page[:limit]
+        else:
+            page = list(objects)
+            has_next = False
+
+        meta = {
+            'limit': limit,
+            'ordering': ordering,
+            'previous': None,
+            'next': None,
+        }
+
+        if has_next:
+            meta['next'] = self.get_next_uri(
+                limit, self.encode_cursor(ordering, page[-1]))
+
+        if self.include_count():
+            meta['total_count'] = self.get_count()
+
+        return {
+            self.collection_name: page,
+            'meta': meta,
+        }
+
+
+class VendorPaginator(KeysetPaginator):
+    orderings = {
+        'name': ('name', 'id'),
+        'modified': ('modified', 'id'),
+    }
+    default_ordering = 'name'
+
+
+class ReviewPaginator(KeysetPaginator):
+    orderings = {
+        'created': ('created', 'id'),
+        'modified': ('modified', 'id'),
+    }
+    default_ordering = 'created'
+
+
+class ProfileReviewPaginator(KeysetPaginator):
+    """
+    Pages through a user's reviews newest first. The profile shows the
+    total from the user's cached review stats, so pages don't count.
+    """
+    orderings = {
+        'newest': ('-created', '-id'),
+    }
+    default_ordering = 'newest'
+
+    def include_count(self):
+        return False
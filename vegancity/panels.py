@@ -0,0 +1,145 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Loading the independent panels of a page at the same time.
+
+The home page shows eight lists that each take their own query. They
+don't depend on each other, so load() runs them on a pool of
+PANEL_WORKERS threads, each with its own database connection, and the
+page waits for the slowest of them rather than for all of them in turn.
+
+The threads read from the same database as the request would, and the
+instances they load tag the page in the page cache like the request's
+own. With PANEL_WORKERS set to 0 the panels are loaded one after the
+other in the request's thread, which the tests do, since other threads
+can't see the data of a test's transaction.
+
+Each panel's load time is recorded in this process's stats, and panels
+slower than PANEL_SLOW_MS are logged.
+"""
+
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from vegancity import dbhealth, pagecache, routers
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+##########################################################
+# timing
+##########################################################
+
+
+def record_load(name, seconds):
+    with _stats_lock:
+        count, total, slowest = _stats.get(name, (0, 0.0, 0.0))
+        _stats[name] = (count + 1, total + seconds, max(slowest, seconds))
+    if seconds * 1000 > settings.PANEL_SLOW_MS:
+        logger.warn("Slow panel %s: %.1fms" % (name, seconds * 1000))
+
+
+def panel_stats():
+    """
+    Return this process's panel load times so far, as a dict of panel
+    name to a dict of count, and total and max milliseconds.
+    """
+    with _stats_lock:
+        return dict((name, {'count': count,
+                            'total': total * 1000,
+                            'max': slowest * 1000})
+                    for name, (count, total, slowest) in _stats.items())
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _timed(name, panel, request):
+    start = time.time()
+    try:
+        return panel(request)
+    finally:
+        record_load(name, time.time() - start)
+
+
+##########################################################
+# loading
+##########################################################
+
+
+def _get_pool():
+    # made on first use, so that each gunicorn worker gets its own
+    # threads rather than sharing the dead ones of the master
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(settings.PANEL_WORKERS)
+        return _pool
+
+
+def _load_in_thread(args):
+    name, panel, request, use_replicas, collected = args
+    # like a request of its own, the thread's connection is checked
+    # before the panel uses it and closed after if it has expired.
+    close_old_connections()
+    dbhealth.check_connections()
+    routers.start_request(use_replicas)
+    pagecache.share_collected(collected)
+    try:
+        return _timed(name, panel, request)
+    finally:
+        pagecache.share_collected(None)
+        routers.end_request()
+        dbhealth.mark_used()
+        close_old_connections()
+
+
+def load(request, panels):
+    """
+    Load each of panels, a sequence of (name, function) pairs, and
+    return a dict of name to what its function returned for request.
+
+    Panel functions must evaluate their querysets, or the queries will
+    run when the page is rendered, one after the other, after all.
+    Errors raised by a panel are raised by load().
+    """
+    start = time.time()
+    if settings.PANEL_WORKERS:
+        state = (request, routers.using_replicas(), pagecache.collected())
+        results = _get_pool().map(_load_in_thread,
+                                  [(name, panel) + state
+                                   for name, panel in panels])
+    else:
+        results = [_timed(name, panel, request) for name, panel in panels]
+    logger.debug("Loaded %d panels in %.1fms"
+                 % (len(panels), (time.time() - start) * 1000))
+    return dict((name, result)
+                for (name, panel), result in zip(panels, results))
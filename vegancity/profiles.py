@@ -0,0 +1,77 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The review history on user profile pages.
+
+A profile shows one page of the user's reviews at a time, newest
+first, paginated by keyset so that an old page of a prolific reviewer
+costs the same as the first. The totals above them are cached per
+user, and dropped whenever one of the user's reviews is saved, deleted
+or moderated.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db.models import Avg, Count
+
+from vegancity import caching, fragments
+from vegancity.models import Review
+from vegancity.paginators import ProfileReviewPaginator
+
+REVIEW_PAGE_SIZE = 20
+
+
+def review_stats(user):
+    """
+    The number of approved reviews user has written, of the vendors
+    they reviewed, and their average food and atmosphere ratings.
+    """
+    key = caching.USER_REVIEW_STATS_KEY % user.pk
+    stats = cache.get(key)
+    if stats is None:
+        stats = (Review.objects.approved()
+                 .filter(author=user)
+                 .aggregate(review_count=Count('id'),
+                            vendor_count=Count('vendor', distinct=True),
+                            food_rating=Avg('food_rating'),
+                            atmosphere_rating=Avg('atmosphere_rating')))
+        cache.set(key, stats, settings.USER_REVIEW_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def review_page(user, request_data):
+    """
+    Return the page of user's approved reviews that request_data asks
+    for, with their html rendered, and the url of the next page or
+    None.
+
+    Raises tastypie's BadRequest for a malformed cursor.
+    """
+    reviews = (Review.objects.approved()
+               .filter(author=user)
+               .select_related('author', 'vendor', 'best_vegan_dish'))
+    paginator = ProfileReviewPaginator(
+        request_data, reviews,
+        resource_uri=reverse('user_profile',
+                             kwargs={'username': user.username}),
+        limit=REVIEW_PAGE_SIZE,
+        max_limit=REVIEW_PAGE_SIZE)
+    page = paginator.page()
+    return (fragments.with_html(page['objects'], show_vendor_name=True),
+            page['meta']['next'])
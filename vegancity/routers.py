@@ -0,0 +1,80 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Database routing between the primary and its read replicas.
+
+Replicas are only ever used for reads inside a request that
+ReplicaMiddleware has found safe for them. Everything else, including
+management commands, the mail worker and the tests, reads from and
+writes to the primary, so only code that opts in can see stale data.
+
+Once anything has been written during a request, the rest of the
+request reads from the primary too.
+"""
+
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# models that are read on every request and written by the request
+# before, so they must never lag behind.
+PRIMARY_ONLY_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+def start_request(use_replicas):
+    _state.use_replicas = use_replicas
+    _state.wrote = False
+
+
+def end_request():
+    _state.use_replicas = False
+    _state.wrote = False
+
+
+def using_replicas():
+    return (getattr(_state, 'use_replicas', False) and
+            not getattr(_state, 'wrote', False))
+
+
+def wrote():
+    "Whether anything was written since the request started."
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        if (not settings.DATABASE_REPLICAS or not using_replicas() or
+                model._meta.app_label in PRIMARY_ONLY_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_syncdb(self, db, model):
+        return db == DEFAULT_DB_ALIAS
@@ -19,9 +19,40 @@
 
 import geocode
 
+from vegancity import caching
 from vegancity.models import FeatureTag, CuisineTag, Vendor, VeganDish, Review
 
+from django.conf import settings
 from django.contrib.gis.geos import Point
+from django.core.cache import cache
+
+
+def normalize_query(query):
+    "Lowercase a query and collapse its whitespace."
+    return u' '.join(query.lower().split())
+
+
+def cached_search_ids(query):
+    """
+    Return the ids of the vendors that match query, in name order, as
+    master_search returns them. The ids are cached for a short time,
+    and until any vendor data changes.
+
+    The search runs on the normalized query it is cached under, so
+    queries that differ only in case and spacing share an entry.
+    Stopwords are kept: the geocoder needs them, "5th and market" is
+    an intersection.
+    """
+    query = normalize_query(query)
+    key = caching.make_key('search', caching.get_data_version(), query)
+    vendor_ids = cache.get(key)
+
+    if vendor_ids is None:
+        vendor_ids = list(master_search(query)
+                          .values_list('id', flat=True))
+        cache.set(key, vendor_ids, settings.SEARCH_CACHE_TIMEOUT)
+
+    return vendor_ids
 
 
 def master_search(query, initial_queryset=None):
@@ -38,9 +38,32 @@ DATABASES = {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
         'NAME': 'vegphilly',
         'USER': 'postgres',
+        'CONN_MAX_AGE': 300,
     }
 }
 
+# Persistent connections (CONN_MAX_AGE) that have been idle for longer
+# than this are checked before a request uses them, see
+# vegancity.dbhealth.
+DB_HEALTH_CHECK_IDLE_SECONDS = 30
+
+# Aliases of DATABASES entries that are read replicas of 'default'.
+# Read-only requests read from one of them at random, see
+# vegancity.routers. Give each one 'TEST_MIRROR': 'default' so that the
+# tests don't try to create them.
+DATABASE_REPLICAS = ()
+
+DATABASE_ROUTERS = ('vegancity.routers.ReplicaRouter',)
+
+# Requests to these paths always read from the primary.
+PRIMARY_ONLY_URL_PREFIXES = ('/admin/', '/accounts/')
+
+# After a client writes, or any vendor data changes, reads go to the
+# primary for this many seconds. It should comfortably exceed the
+# replication lag.
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = 'use_primary'
+
 GOOGLE_ANALYTICS_TRACKING_ID = ''
 
 TIME_ZONE = None
@@ -86,6 +109,8 @@ TEMPLATE_LOADERS = (
 )
 
 GLOBAL_MIDDLEWARE_CLASSES = (
+    'vegancity.middleware.CompressionMiddleware',
+    'vegancity.middleware.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -268,6 +293,102 @@ EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 EMAIL_PORT = 587
 
+# Queued emails that fail to send are retried after
+# EMAIL_QUEUE_RETRY_DELAY seconds, doubling after each attempt, until
+# they have been tried EMAIL_QUEUE_MAX_ATTEMPTS times.
+EMAIL_QUEUE_RETRY_DELAY = 60
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+
+# A worker claims the emails it is about to send for this many seconds.
+# Emails claimed by a worker that died are sent again after it.
+EMAIL_QUEUE_CLAIM_TIMEOUT = 600
+
+# The default cache is local to each process, which is only good
+# enough for a single process. Deploys point it at memcached in
+# settings_local.py, so that the data version, the page cache's tags
+# and the other invalidations reach every gunicorn worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# The postgres text search configuration used to build the search
+# indexes and to parse queries, created in migration 0027. The search
+# index triggers and the synonym rules have to be recreated, and the
+# indexes rebuilt, when this changes.
+SEARCH_CONFIG = 'public.vegancity'
+
+# Seconds to keep the vendor ids that match an api search query.
+SEARCH_CACHE_TIMEOUT = 5 * 60
+
+# Seconds to keep each vendor's serialized api representation.
+API_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Seconds to keep each review's rendered html. Fragments are keyed on
+# everything they show, so this only decides how long unused ones last.
+REVIEW_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Seconds to keep the count of items pending approval. The count is
+# adjusted as items change status, this only limits how long any drift
+# can last.
+PENDING_COUNT_CACHE_TIMEOUT = 10 * 60
+
+# Seconds to keep each user's review count and average ratings. They
+# are dropped whenever one of the user's reviews changes.
+USER_REVIEW_STATS_CACHE_TIMEOUT = 60 * 60
+
+# Pages for anonymous visitors are cached for up to PAGE_CACHE_TIMEOUT
+# seconds, and purged as soon as anything on them changes, see
+# vegancity.pagecache. Pages that show more than
+# PAGE_CACHE_MAX_TAGS_PER_MODEL instances of a model are purged by any
+# change to that model instead.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_MAX_TAGS_PER_MODEL = 50
+
+# When set, cached pages tell nginx's proxy_cache to keep them for this
+# many seconds. nginx can't be purged, so keep it short.
+PAGE_CACHE_NGINX_SECONDS = 0
+
+# Without DEBUG, compiled templates are kept for the life of each
+# worker and compiled when it starts, see vegancity.templating. With
+# TEMPLATE_TIMING set, the render times of each template are recorded,
+# and renders slower than TEMPLATE_SLOW_RENDER_MS are logged.
+TEMPLATE_TIMING = False
+TEMPLATE_SLOW_RENDER_MS = 250
+
+# Without DEBUG, collectstatic writes every static file under a hashed
+# name, listed in STATIC_MANIFEST_NAME, and gzips (and with the brotli
+# package installed, brotlis) the text files of at least
+# STATIC_PRECOMPRESS_MIN_SIZE bytes, see vegancity.storage.
+STATIC_MANIFEST_NAME = 'staticfiles.json'
+STATIC_PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.txt')
+STATIC_PRECOMPRESS_MIN_SIZE = 256
+
+# html and api responses of these types and at least
+# RESPONSE_COMPRESSION_MIN_SIZE bytes are sent compressed, with brotli
+# when the brotli package is installed and the client accepts it, and
+# gzip otherwise. See vegancity.compression.
+RESPONSE_COMPRESSION_ENABLED = True
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_COMPRESSION_TYPES = (
+    'text/html',
+    'text/plain',
+    'application/json',
+    'application/xml',
+    'text/javascript',
+)
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 5
+
+# The home page loads its panels on this many threads at once, or in
+# the request's own thread when it's 0. Every thread keeps its own
+# database connection, so count them against the pool size. Panels
+# slower than PANEL_SLOW_MS are logged, see vegancity.panels.
+PANEL_WORKERS = 4
+PANEL_SLOW_MS = 100
+
 DEVELOPMENT_APPS = tuple()
 DEVELOPMENT_MIDDLEWARE_CLASSES = tuple()
 
@@ -280,6 +401,10 @@ INSTALLED_APPS = UNMANAGED_APPS + MANAGED_APPS + DEVELOPMENT_APPS
 
 MIDDLEWARE_CLASSES = GLOBAL_MIDDLEWARE_CLASSES + DEVELOPMENT_MIDDLEWARE_CLASSES
 
+if not DEBUG:
+    TEMPLATE_LOADERS = (('vegancity.templating.Loader', TEMPLATE_LOADERS),)
+    STATICFILES_STORAGE = 'vegancity.storage.ManifestStaticFilesStorage'
+
 if EMAIL_HOST_USER == '' or EMAIL_HOST_PASSWORD == '':
     error_message = ("No valid email login configured. Please specify "
                      "EMAIL_HOST_USER and EMAIL_HOST_PASSWORD "
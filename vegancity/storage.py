@@ -0,0 +1,117 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fingerprinted, precompressed static files.
+
+Without DEBUG, settings.py makes collectstatic go through
+ManifestStaticFilesStorage, which copies every file to a name with a
+hash of its content in it ("css/base.3f2a9c1d0e4b.css"), points the
+url()s in stylesheets at the hashed names, and writes the mapping to
+STATIC_MANIFEST_NAME in STATIC_ROOT. {% static %} looks names up in
+the manifest, so pages always link the files of the last deploy, and
+nginx can tell browsers to keep them forever.
+
+Hashed text files are also written gzipped next to themselves, and
+brotli'd when the brotli package is installed, for nginx's gzip_static
+and brotli_static to send without compressing them on every request.
+"""
+
+import json
+import os
+from urllib import unquote
+from urlparse import urldefrag
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (CachedStaticFilesStorage,
+                                                StaticFilesStorage)
+from django.core.files.base import ContentFile
+
+from vegancity.compression import precompressed
+
+
+class ManifestStaticFilesStorage(CachedStaticFilesStorage):
+    """
+    CachedStaticFilesStorage, with the hashed names kept in a manifest
+    file instead of the cache, and precompressed copies of the hashed
+    text files.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ManifestStaticFilesStorage, self).__init__(*args, **kwargs)
+        self.hashed_files = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with self.open(settings.STATIC_MANIFEST_NAME) as manifest:
+                return json.loads(manifest.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        if self.exists(settings.STATIC_MANIFEST_NAME):
+            self.delete(settings.STATIC_MANIFEST_NAME)
+        self._save(settings.STATIC_MANIFEST_NAME,
+                   ContentFile(json.dumps(self.hashed_files, indent=0,
+                                          sort_keys=True)))
+
+    def url(self, name, force=False):
+        if settings.DEBUG and not force:
+            return super(ManifestStaticFilesStorage, self).url(name, force)
+        clean_name, fragment = urldefrag(name)
+        hashed_name = self.hashed_files.get(clean_name)
+        if hashed_name is None:
+            try:
+                return super(ManifestStaticFilesStorage, self).url(name,
+                                                                   force)
+            except ValueError:
+                # not collected, link the file itself rather than
+                # break the page
+                return StaticFilesStorage.url(self, name)
+        if fragment:
+            hashed_name = '%s#%s' % (hashed_name, fragment)
+        return unquote(StaticFilesStorage.url(self, hashed_name))
+
+    def precompress(self, hashed_name):
+        if (os.path.splitext(hashed_name)[1] not in
+                settings.STATIC_PRECOMPRESS_EXTENSIONS):
+            return
+        with self.open(hashed_name) as hashed_file:
+            content = hashed_file.read()
+        if len(content) < settings.STATIC_PRECOMPRESS_MIN_SIZE:
+            return
+        for suffix, compressed in precompressed(content):
+            if self.exists(hashed_name + suffix):
+                self.delete(hashed_name + suffix)
+            self._save(hashed_name + suffix, ContentFile(compressed))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        # the old manifest would point stylesheets at old images
+        self.hashed_files = {}
+        processed_files = super(ManifestStaticFilesStorage,
+                                self).post_process(paths, dry_run, **options)
+        for name, hashed_name, processed in processed_files:
+            if hashed_name is not None:
+                self.hashed_files[name.replace('\\', '/')] = hashed_name
+                # files collected before there was precompression
+                # aren't processed again, so look for their .gz too
+                if processed or not self.exists(hashed_name + '.gz'):
+                    self.precompress(hashed_name)
+            yield name, hashed_name, processed
+        self.save_manifest()
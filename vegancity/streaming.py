@@ -0,0 +1,118 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Helpers for streaming large result sets to a client without
+holding them in memory.
+"""
+
+import csv
+import uuid
+import zlib
+
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.db import connections, transaction
+from django.utils.encoding import force_bytes
+
+DEFAULT_BATCH_SIZE = 500
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_values(queryset, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield the rows of a values() queryset as dicts, the same as iterating
+    over the queryset would, but fetch them batch_size rows at a time
+    through a PostgreSQL server-side cursor.
+
+    The normal queryset iterator pulls the entire result set into
+    memory before returning the first row.
+    """
+    names = (list(queryset.query.extra_select) +
+             queryset.field_names +
+             list(queryset.query.aggregate_select))
+
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return
+
+    connection = connections[queryset.db]
+
+    # server-side cursors only live as long as their transaction
+    with transaction.atomic(using=queryset.db):
+        connection.ensure_connection()
+        cursor_name = 'vegancity_stream_%s' % uuid.uuid4().hex
+        cursor = connection.connection.cursor(name=cursor_name)
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(sql, params)
+            for row in cursor:
+                yield dict(zip(names, row))
+        finally:
+            cursor.close()
+
+
+def buffered(chunks, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Join many small strings into chunks of at least chunk_size bytes,
+    so that the response isn't written a line at a time.
+    """
+    buf = []
+    buf_size = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        buf_size += len(chunk)
+        if buf_size >= chunk_size:
+            yield ''.join(buf)
+            buf = []
+            buf_size = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def gzipped(chunks, compress_level=6):
+    "Compress a stream of strings into a stream of gzip data."
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED,
+                                  zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _Echo(object):
+    "A file-like object for csv.writer that hands back what is written."
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns, headers=None):
+    """
+    Yield a CSV header line, followed by a line for each of the dict
+    rows, with the values of columns in order. None becomes an empty
+    cell and everything else is written as utf-8.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow([force_bytes(header)
+                           for header in headers or columns])
+    for row in rows:
+        yield writer.writerow(['' if row[column] is None
+                               else force_bytes(row[column])
+                               for column in columns])
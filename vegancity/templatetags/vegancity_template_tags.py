@@ -5,25 +5,65 @@ from urllib import quote_plus
 
 from django import template
 from django.conf import settings
+from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
 DEFAULT_USER_ICON = quote_plus(
     "http://%s/static/images/default_user_icon.jpg" % settings.HOSTNAME)
 
+# emails hashed for gravatar urls, kept per process. A plain dict,
+# emptied when it fills up: an LRU's lock and reordering cost more
+# than the md5 it saves, see TemplateFilterBenchmark.
+GRAVATAR_CACHE_SIZE = 2000
+
+HTTP_RE = re.compile('https?://')
+
+RATING_IMG = '<img class="rating" src="%s">'
+
+_gravatar_urls = {}
+
+
+# built on first use rather than at import, so that the images go
+# through the staticfiles storage and get their hashed names.
+_rating_icons_by_rating = {}
+
+
+def _rating_icons(rating):
+    return ((RATING_IMG % static('images/rating-solid.png')) * rating +
+            (RATING_IMG % static('images/rating-faded.png')) * (4 - rating))
+
+
+def rating_icons():
+    "The rating images for each rating from 0 to 4."
+    if not _rating_icons_by_rating:
+        _rating_icons_by_rating.update(
+            (rating, _rating_icons(rating)) for rating in range(5))
+    return _rating_icons_by_rating
+
+
+def _gravatar_url(email_address, size):
+    hash = hashlib.md5(email_address).hexdigest()
+    return ("http://gravatar.com/avatar/%s?s=%i&d=%s" %
+            (hash, size, DEFAULT_USER_ICON))
+
 
 def gravatar_urlify(email_address, size=72):
     if email_address:
-        hash = hashlib.md5(email_address).hexdigest()
-        return ("http://gravatar.com/avatar/%s?s=%i&d=%s" %
-                (hash, size, DEFAULT_USER_ICON))
+        key = (email_address, size)
+        url = _gravatar_urls.get(key)
+        if url is None:
+            if len(_gravatar_urls) >= GRAVATAR_CACHE_SIZE:
+                _gravatar_urls.clear()
+            url = _gravatar_urls[key] = _gravatar_url(email_address, size)
+        return url
     else:
         return DEFAULT_USER_ICON
 
 
 def strip_http(text):
     if text:
-        text = re.sub('https?://', '', text)
+        text = HTTP_RE.sub('', text)
         if text[-1] == '/':
             text = text[:-1]
         return text
@@ -32,13 +72,10 @@ def strip_http(text):
 
 
 def graphical_rating(rating):
-    rating_icons = ('<img class="rating" src="' +
-                    settings.STATIC_URL +
-                    'images/rating-solid.png">') * rating
-    rating_icons += ('<img class="rating" src="' +
-                     settings.STATIC_URL +
-                     'images/rating-faded.png">') * (4 - rating)
-    return rating_icons
+    try:
+        return rating_icons()[rating]
+    except (KeyError, TypeError):
+        return _rating_icons(rating)
 
 
 def spaces_to_nbsps(obj):
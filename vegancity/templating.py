@@ -0,0 +1,152 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Template loading and render timing for production.
+
+Without DEBUG, settings.py wraps the template loaders in Loader, which
+keeps every compiled template for the life of the worker instead of
+reading and parsing vendor_detail.html, its base templates and its
+partials on every request. warm_templates() compiles them all up front
+and is called by the gunicorn post_worker_init hook, so that the first
+requests a worker serves don't pay for it either.
+
+With TEMPLATE_TIMING set, Loader also times every render of every
+template it hands out, including the ones rendered by {% include %}
+and {% extends %}. Times include the templates rendered inside them.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.template.loaders import cached
+from django.template.loaders.app_directories import app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+##########################################################
+# render timing
+##########################################################
+
+
+def record_render(name, seconds):
+    with _stats_lock:
+        count, total, slowest = _stats.get(name, (0, 0.0, 0.0))
+        _stats[name] = (count + 1, total + seconds, max(slowest, seconds))
+    if seconds * 1000 > settings.TEMPLATE_SLOW_RENDER_MS:
+        logger.warn("Slow render of %s: %.1fms" % (name, seconds * 1000))
+
+
+def render_stats():
+    """
+    Return this process's render times so far, as a dict of template
+    name to a dict of count, and total and max milliseconds.
+    """
+    with _stats_lock:
+        return dict((name, {'count': count,
+                            'total': total * 1000,
+                            'max': slowest * 1000})
+                    for name, (count, total, slowest) in _stats.items())
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _time_renders(template, name):
+    # Template.render and ExtendsNode both go through _render
+    render = template._render
+
+    def timed_render(context):
+        if not settings.TEMPLATE_TIMING:
+            return render(context)
+        start = time.time()
+        try:
+            return render(context)
+        finally:
+            record_render(name, time.time() - start)
+
+    template._render = timed_render
+
+
+class Loader(cached.Loader):
+    """
+    The cached loader, timing renders of the templates it loads when
+    TEMPLATE_TIMING is set.
+    """
+
+    def load_template(self, template_name, template_dirs=None):
+        template, origin = super(Loader, self).load_template(template_name,
+                                                             template_dirs)
+        if (hasattr(template, '_render') and
+                not getattr(template, 'vegancity_timed', False)):
+            _time_renders(template, template_name)
+            template.vegancity_timed = True
+        return template, origin
+
+
+##########################################################
+# warming
+##########################################################
+
+
+def template_names():
+    "The names of every template in TEMPLATE_DIRS and the apps."
+    names = set()
+    for template_dir in list(settings.TEMPLATE_DIRS) + list(app_template_dirs):
+        for root, dirs, files in os.walk(template_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for filename in files:
+                if filename.startswith('.') or filename.endswith('~'):
+                    continue
+                path = os.path.join(root, filename)
+                names.add(os.path.relpath(path, template_dir)
+                          .replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """
+    Compile every template into the cached loader, and return how many
+    were compiled. Templates that fail to compile are logged and
+    skipped; they will fail again when a page uses them.
+    """
+    if settings.DEBUG:
+        # templates are reloaded on every request in development
+        return 0
+    start = time.time()
+    warmed = 0
+    for name in template_names():
+        try:
+            get_template(name)
+        except Exception:
+            logger.warn("Could not compile template %s" % name,
+                        exc_info=True)
+        else:
+            warmed += 1
+    logger.info("Compiled %d templates in %.2fs"
+                % (warmed, time.time() - start))
+    return warmed
@@ -20,6 +20,38 @@ from vegancity.tests.validators import *  # NOQA
 
 from vegancity.tests.template_tags import *  # NOQA
 
+from vegancity.tests.api import *  # NOQA
+
+from vegancity.tests.benchmarks import *  # NOQA
+
+from vegancity.tests.mailqueue import *  # NOQA
+
+from vegancity.tests.notifications import *  # NOQA
+
+from vegancity.tests.fulltext import *  # NOQA
+
+from vegancity.tests.typeahead import *  # NOQA
+
+from vegancity.tests.routers import *  # NOQA
+
+from vegancity.tests.dbhealth import *  # NOQA
+
+from vegancity.tests.pagecache import *  # NOQA
+
+from vegancity.tests.templating import *  # NOQA
+
+from vegancity.tests.fragments import *  # NOQA
+
+from vegancity.tests.profiles import *  # NOQA
+
+from vegancity.tests.conditional import *  # NOQA
+
+from vegancity.tests.storage import *  # NOQA
+
+from vegancity.tests.compression import *  # NOQA
+
+from vegancity.tests.panels import *  # NOQA
+
 
 class VegancityTestRunner(DjangoTestSuiteRunner):
 
@@ -38,6 +70,15 @@ class VegancityTestRunner(DjangoTestSuiteRunner):
         return super(VegancityTestRunner, self).__init__(interactve=False,
                                                          *args, **kwargs)
 
+    def setup_test_environment(self, **kwargs):
+        super(VegancityTestRunner, self).setup_test_environment(**kwargs)
+        # the cache outlives each test's data, so cached pages could
+        # show another test's vendors. PageCacheTest turns it back on.
+        settings.PAGE_CACHE_ENABLED = False
+        # panel threads have their own connections, which can't see
+        # the data of a test's transaction. PanelThreadTest uses them.
+        settings.PANEL_WORKERS = 0
+
     def run_tests(self, *args, **kwargs):
         logging.disable(logging.CRITICAL)
         return super(VegancityTestRunner, self).run_tests(*args, **kwargs)
@@ -1,27 +1,31 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.test.client import RequestFactory
 
 import csv
+import gzip
 
-from itertools import izip_longest
+from StringIO import StringIO
 
-from vegancity.admin_views import (vendor_list, mailing_list,
-                                   pending_approval_count)
-from vegancity.models import Vendor, Neighborhood, VegLevel, User, UserProfile
+from vegancity.admin_views import (vendor_list, mailing_list, review_list,
+                                   vendor_ratings, pending_approval_count)
+from vegancity.email import NEW_VENDOR_APPROVAL
+from vegancity.models import (Vendor, Review, Neighborhood, VegLevel, User,
+                              UserProfile, OutboundEmail)
 from vegancity.tests.utils import get_user
 from vegancity.fields import StatusField as SF
 
 
 class CSVViewTest(TestCase):
-    def assertCSVIsCorrect(self, response, expected_data):
-
-        csv_data = csv.reader(response, delimiter=",")
+    def read_csv(self, response):
+        content = ''.join(response.streaming_content)
+        self.assertTrue(content.startswith('\xef\xbb\xbf'))
+        return list(csv.reader(content[3:].splitlines()))
 
-        padded_expected_data = [[], ['\xef\xbb\xbf']] + expected_data
-
-        test_along = izip_longest(csv_data, padded_expected_data)
-        for csv_row, expected_row in test_along:
-            self.assertEqual(csv_row, expected_row)
+    def assertCSVIsCorrect(self, response, expected_data):
+        self.assertEqual(self.read_csv(response), expected_data)
 
     def test_mailing_list(self):
         veggie_lover = User.objects.create(username="veggie_lover",
@@ -86,8 +90,71 @@ class CSVViewTest(TestCase):
 
         self.assertCSVIsCorrect(response, expected_data)
 
+    def test_vendor_list_filters(self):
+        Vendor.objects.create(name="approved vendor",
+                              approval_status=SF.APPROVED)
+        Vendor.objects.create(name="pending vendor")
+
+        request = RequestFactory().get('', {'status': 'pending'})
+        request.user = get_user(is_staff=True)
+        rows = self.read_csv(vendor_list(request))
+        self.assertEqual([row[0] for row in rows[1:]], ["pending vendor"])
+
+        request = RequestFactory().get('', {'status': 'all',
+                                            'since': '2001-01-01',
+                                            'until': '2002-01-01'})
+        request.user = get_user(is_staff=True)
+        self.assertEqual(len(self.read_csv(vendor_list(request))), 1)
+
+    def test_invalid_filters(self):
+        for params in ({'status': 'deleted'}, {'since': 'last tuesday-ish'}):
+            request = RequestFactory().get('', params)
+            request.user = get_user(is_staff=True)
+            self.assertEqual(vendor_list(request).status_code, 400)
+
+    def test_gzipped_export(self):
+        Vendor.objects.create(name="test vendor",
+                              approval_status=SF.APPROVED)
+        request = RequestFactory().get('', {'compress': 'gzip'})
+        request.user = get_user(is_staff=True)
+
+        response = vendor_list(request)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.GzipFile(fileobj=StringIO(
+            ''.join(response.streaming_content))).read()
+        self.assertIn("test vendor", content)
+
+    def test_review_list_and_ratings(self):
+        user = get_user(username="author")
+        vendor = Vendor.objects.create(name="test vendor",
+                                       approval_status=SF.APPROVED)
+        for rating in (2, 3, 4):
+            Review.objects.create(vendor=vendor, author=user,
+                                  content="review", food_rating=rating,
+                                  atmosphere_rating=rating,
+                                  approval_status=SF.APPROVED)
+        Review.objects.create(vendor=vendor, author=user, content="spam",
+                              food_rating=1)
+
+        request = RequestFactory().get('')
+        request.user = get_user(is_staff=True)
+
+        rows = self.read_csv(review_list(request))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][2:4], ["test vendor", "author"])
+
+        rows = self.read_csv(vendor_ratings(request))
+        self.assertEqual(rows[0], ['name', 'neighborhood__name',
+                                   'review_count', 'food_rating_avg',
+                                   'atmosphere_rating_avg'])
+        self.assertEqual(rows[1][:3], ["test vendor", "", "3"])
+        self.assertEqual(float(rows[1][3]), 3.0)
+
 
 class PendingApprovalCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_pending_approval_count_none(self):
         request = RequestFactory().get('')
         request.user = get_user(is_staff=True)
@@ -108,3 +175,136 @@ class PendingApprovalCountTest(TestCase):
         request.user = get_user(is_staff=True)
         response = pending_approval_count(request)
         self.assertEqual(response.content, "1")
+
+    def test_pending_approval_count_is_cached(self):
+        Vendor.objects.create(name="Test Vendor 1")
+        request = RequestFactory().get('')
+        request.user = get_user(is_staff=True)
+        self.assertEqual(pending_approval_count(request).content, "1")
+
+        vendor = Vendor.objects.create(name="Test Vendor 2")
+        with CaptureQueriesContext(connection) as queries:
+            response = pending_approval_count(request)
+        self.assertEqual(response.content, "2")
+        self.assertEqual(len(queries), 0)
+
+        vendor.approval_status = SF.APPROVED
+        vendor.save()
+        self.assertEqual(pending_approval_count(request).content, "1")
+
+        Vendor.objects.get(name="Test Vendor 1").delete()
+        self.assertEqual(pending_approval_count(request).content, "0")
+
+
+class ModerationQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = get_user(username="staff", is_staff=True)
+        self.staff.set_password("password")
+        self.staff.save()
+        self.client.login(username="staff", password="password")
+
+        submitter = get_user(email="submitter@example.com")
+        self.vendors = [Vendor.objects.create(name="vendor %d" % i,
+                                              submitted_by=submitter)
+                        for i in range(3)]
+        self.review = Review.objects.create(vendor=self.vendors[0],
+                                            author=submitter,
+                                            content="great")
+
+    def test_queue_pages(self):
+        response = self.client.get('/admin/pending_approval/vendors/',
+                                   {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        vendor_queue = response.context['queues'][0]
+        self.assertEqual(list(vendor_queue['items']), self.vendors[:2])
+        self.assertTrue(vendor_queue['next'])
+
+        response = self.client.get(vendor_queue['next'])
+        self.assertEqual(list(response.context['queues'][0]['items']),
+                         self.vendors[2:])
+
+    def test_overview(self):
+        response = self.client.get('/admin/pending_approval/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['pending_count'], 4)
+        self.assertContains(response, "vendor 2")
+
+    def test_bulk_approve(self):
+        ids = [self.vendors[0].pk, self.vendors[1].pk]
+
+        response = self.client.post('/admin/pending_approval/action/',
+                                    {'queue': 'vendors',
+                                     'action': 'approve',
+                                     'ids': ids})
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(
+            sorted(Vendor.objects.approved().values_list('pk', flat=True)),
+            ids)
+        self.assertEqual(OutboundEmail.objects
+                         .filter(kind=NEW_VENDOR_APPROVAL).count(), 2)
+        self.assertEqual(self.client.get(
+            '/admin/pending_approval/count/').content, "2")
+
+    def test_bulk_quarantine_skips_non_pending(self):
+        Review.objects.filter(pk=self.review.pk).update(
+            approval_status=SF.APPROVED)
+        self.client.post('/admin/pending_approval/action/',
+                         {'queue': 'reviews',
+                          'action': 'quarantine',
+                          'ids': [self.review.pk]})
+        self.assertEqual(Review.objects.get(pk=self.review.pk)
+                         .approval_status, SF.APPROVED)
+
+    def test_bad_action(self):
+        response = self.client.post('/admin/pending_approval/action/',
+                                    {'queue': 'vendors',
+                                     'action': 'delete',
+                                     'ids': [self.vendors[0].pk]})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkAdminActionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin_user = get_user(username="admin", is_staff=True,
+                              is_superuser=True)
+        admin_user.set_password("password")
+        admin_user.save()
+        self.client.login(username="admin", password="password")
+
+        submitter = get_user(email="submitter@example.com")
+        self.vendors = [Vendor.objects.create(name="vendor %d" % i,
+                                              submitted_by=submitter)
+                        for i in range(3)]
+
+    def run_action(self, action, vendors):
+        return self.client.post('/admin/vegancity/vendor/', {
+            'action': action,
+            '_selected_action': [vendor.pk for vendor in vendors],
+        })
+
+    def test_approve_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.run_action('approve_selected', self.vendors)
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(Vendor.objects.approved().count(), 3)
+        self.assertEqual(OutboundEmail.objects
+                         .filter(kind=NEW_VENDOR_APPROVAL).count(), 3)
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_quarantine_skips_approved(self):
+        approved = self.vendors[0]
+        approved.approval_status = SF.APPROVED
+        approved.save()
+
+        self.run_action('quarantine_selected', self.vendors)
+
+        self.assertEqual(Vendor.objects.get(pk=approved.pk).approval_status,
+                         SF.APPROVED)
+        self.assertEqual(
+            Vendor.objects.filter(approval_status=SF.QUARANTINED).count(), 2)
@@ -0,0 +1,342 @@
+import datetime
+import gzip
+import json
+
+from StringIO import StringIO
+
+from mock import Mock, patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vegancity.models import (Vendor, Review, VeganDish, CuisineTag,
+                              FeatureTag, Neighborhood, VegLevel)
+from vegancity.search import normalize_query
+from vegancity.tests.utils import get_user
+from vegancity.fields import StatusField as SF
+
+
+def create_reviewed_vendor(name, user, **kwargs):
+    """Create an approved vendor with tags and a handful of reviews."""
+    neighborhood, _ = Neighborhood.objects.get_or_create(name="South Philly")
+    veg_level, _ = VegLevel.objects.get_or_create(name="vegan",
+                                                  description="vegan")
+    cuisine_tag, _ = CuisineTag.objects.get_or_create(name="thai",
+                                                      description="Thai")
+    feature_tag, _ = FeatureTag.objects.get_or_create(name="brunch",
+                                                      description="Brunch")
+    dish, _ = VeganDish.objects.get_or_create(name="tofu scramble")
+
+    vendor = Vendor.objects.create(name=name,
+                                   neighborhood=neighborhood,
+                                   veg_level=veg_level,
+                                   approval_status=SF.APPROVED,
+                                   **kwargs)
+    vendor.cuisine_tags.add(cuisine_tag)
+    vendor.feature_tags.add(feature_tag)
+    vendor.vegan_dishes.add(dish)
+
+    Review.objects.create(vendor=vendor, author=user, content="good",
+                          food_rating=4, atmosphere_rating=3,
+                          best_vegan_dish=dish,
+                          approval_status=SF.APPROVED)
+    Review.objects.create(vendor=vendor, author=user, content="ok",
+                          food_rating=3, atmosphere_rating=2,
+                          approval_status=SF.APPROVED)
+    Review.objects.create(vendor=vendor, author=user, content="spam",
+                          food_rating=1, atmosphere_rating=1)
+    return vendor
+
+
+class VendorResourceTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user()
+
+    def get_vendor_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/vendors/',
+                                       {'format': 'json', 'limit': 0})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content), len(queries)
+
+    def test_query_count_does_not_grow_with_vendors(self):
+        for i in range(3):
+            create_reviewed_vendor("vendor %d" % i, self.user)
+        data, few_vendor_queries = self.get_vendor_list()
+        self.assertEqual(len(data['objects']), 3)
+
+        for i in range(3, 9):
+            create_reviewed_vendor("vendor %d" % i, self.user)
+        data, many_vendor_queries = self.get_vendor_list()
+        self.assertEqual(len(data['objects']), 9)
+
+        self.assertEqual(few_vendor_queries, many_vendor_queries)
+
+    def test_reviews_are_approved_only(self):
+        vendor = create_reviewed_vendor("test vendor", self.user)
+        data, _ = self.get_vendor_list()
+
+        reviews = vendor.approved_reviews().order_by('created')
+        expected = ['/api/v1/reviews/%d/' % review.pk for review in reviews]
+        self.assertEqual(data['objects'][0]['reviews'], expected)
+
+    def test_ratings_match_model(self):
+        vendor = create_reviewed_vendor("test vendor", self.user)
+        data, _ = self.get_vendor_list()
+        serialized = data['objects'][0]
+
+        self.assertEqual(serialized['food_rating'], vendor.food_rating())
+        self.assertEqual(serialized['atmosphere_rating'],
+                         vendor.atmosphere_rating())
+        self.assertEqual(serialized['best_vegan_dish'],
+                         unicode(vendor.best_vegan_dish()))
+
+    def test_ratings_without_reviews(self):
+        Vendor.objects.create(name="test vendor",
+                              approval_status=SF.APPROVED)
+        data, _ = self.get_vendor_list()
+        serialized = data['objects'][0]
+
+        self.assertEqual(serialized['food_rating'], None)
+        self.assertEqual(serialized['atmosphere_rating'], None)
+        self.assertEqual(serialized['best_vegan_dish'], None)
+        self.assertEqual(serialized['reviews'], [])
+
+
+class VendorExportTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user()
+
+    def get_export(self, **params):
+        response = self.client.get('/api/v1/vendors/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, ''.join(response.streaming_content)
+
+    def test_ndjson_export(self):
+        vendor = create_reviewed_vendor("test vendor", self.user)
+        Vendor.objects.create(name="pending vendor")
+
+        response, content = self.get_export()
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], vendor.id)
+        self.assertEqual(rows[0]['neighborhood'], 'South Philly')
+        self.assertEqual(rows[0]['cuisine_tags'], ['thai'])
+        self.assertEqual(rows[0]['feature_tags'], ['brunch'])
+        self.assertEqual(rows[0]['food_rating'], vendor.food_rating())
+        self.assertEqual(rows[0]['best_vegan_dish'], 'tofu scramble')
+
+    def test_gzipped_json_export(self):
+        create_reviewed_vendor("test vendor 1", self.user)
+        create_reviewed_vendor("test vendor 2", self.user)
+
+        response, content = self.get_export(format='json', compress='gzip')
+        rows = json.loads(gzip.GzipFile(fileobj=StringIO(content)).read())
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual([row['name'] for row in rows],
+                         ["test vendor 1", "test vendor 2"])
+
+    def test_empty_json_export(self):
+        response, content = self.get_export(format='json')
+        self.assertEqual(json.loads(content), [])
+
+    def test_since_export(self):
+        old_vendor = create_reviewed_vendor("old vendor", self.user)
+        new_vendor = create_reviewed_vendor("new vendor", self.user)
+        since = datetime.datetime.now() - datetime.timedelta(days=1)
+
+        Vendor.objects.filter(pk=old_vendor.pk).update(modified=since)
+        Review.objects.filter(vendor=old_vendor).update(modified=since)
+
+        response, content = self.get_export(since=since.isoformat())
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [new_vendor.id])
+
+        new_vendor.approval_status = SF.QUARANTINED
+        new_vendor.save()
+
+        response, content = self.get_export(since=since.isoformat())
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows[0]['id'], new_vendor.id)
+        self.assertTrue(rows[0]['removed'])
+
+    def test_invalid_since(self):
+        response = self.client.get('/api/v1/vendors/export/',
+                                   {'since': 'yesterday-ish'})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            Vendor.objects.create(name="vendor %d" % i,
+                                  approval_status=SF.APPROVED)
+
+    def get_json(self, uri, params=None):
+        response = self.client.get(uri, params or {})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def walk_pages(self, **params):
+        params.update({'format': 'json', 'limit': 2})
+        data = self.get_json('/api/v1/vendors/', params)
+        names = [vendor['name'] for vendor in data['objects']]
+        while data['meta']['next']:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.get_json(data['meta']['next'])
+            for query in queries:
+                self.assertNotIn('OFFSET', query['sql'])
+            names.extend(vendor['name'] for vendor in data['objects'])
+        return names
+
+    def test_walk_by_name(self):
+        self.assertEqual(self.walk_pages(),
+                         ["vendor %d" % i for i in range(5)])
+
+    def test_walk_by_modified(self):
+        Vendor.objects.filter(name="vendor 0").update(
+            modified=datetime.datetime.now() + datetime.timedelta(days=1))
+        self.assertEqual(self.walk_pages(ordering='modified'),
+                         ["vendor %d" % i for i in range(1, 5)] +
+                         ["vendor 0"])
+
+    def test_walk_with_identical_keys(self):
+        Vendor.objects.update(modified=datetime.datetime(2014, 1, 1))
+        self.assertEqual(sorted(self.walk_pages(ordering='modified')),
+                         ["vendor %d" % i for i in range(5)])
+
+    def test_skip_count(self):
+        data = self.get_json('/api/v1/vendors/', {'format': 'json'})
+        self.assertEqual(data['meta']['total_count'], 5)
+
+        data = self.get_json('/api/v1/vendors/',
+                             {'format': 'json', 'count': 'false'})
+        self.assertNotIn('total_count', data['meta'])
+
+    def test_offset_still_works(self):
+        data = self.get_json('/api/v1/vendors/',
+                             {'format': 'json', 'limit': 2, 'offset': 4})
+        self.assertEqual([vendor['name'] for vendor in data['objects']],
+                         ["vendor 4"])
+        self.assertEqual(data['meta']['offset'], 4)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/vendors/',
+                                   {'format': 'json', 'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_ordering(self):
+        response = self.client.get('/api/v1/vendors/',
+                                   {'format': 'json', 'ordering': 'phone'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsTest(TestCase):
+
+    def setUp(self):
+        self.vendor = create_reviewed_vendor("test vendor", get_user())
+
+    def get_json(self, uri, fields):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(uri, {'format': 'json',
+                                             'fields': fields})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content), queries
+
+    def test_vendor_fields(self):
+        data, queries = self.get_json('/api/v1/vendors/', 'name,address')
+        self.assertEqual(sorted(data['objects'][0]),
+                         ['address', 'name', 'resource_uri'])
+
+        # just the count and the page, without joins or rating subqueries
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertNotIn('JOIN', query['sql'])
+            self.assertNotIn('vegancity_review', query['sql'])
+
+    def test_vendor_related_fields(self):
+        data, queries = self.get_json('/api/v1/vendors/',
+                                      'name,neighborhood,food_rating')
+        vendor = data['objects'][0]
+        self.assertEqual(sorted(vendor),
+                         ['food_rating', 'name', 'neighborhood',
+                          'resource_uri'])
+        self.assertEqual(vendor['neighborhood']['name'], 'South Philly')
+        self.assertEqual(vendor['food_rating'], self.vendor.food_rating())
+        self.assertEqual(len(queries), 2)
+
+    def test_vendor_detail_fields(self):
+        data, queries = self.get_json(
+            '/api/v1/vendors/%d/' % self.vendor.pk, 'name')
+        self.assertEqual(sorted(data), ['name', 'resource_uri'])
+        self.assertEqual(len(queries), 1)
+
+    def test_review_fields(self):
+        data, queries = self.get_json('/api/v1/reviews/', 'title,content')
+        self.assertEqual(sorted(data['objects'][0]),
+                         ['content', 'resource_uri', 'title'])
+        for query in queries:
+            self.assertNotIn('JOIN', query['sql'])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/v1/vendors/',
+                                   {'format': 'json', 'fields': 'name,foo'})
+        self.assertEqual(response.status_code, 400)
+
+
+@patch('vegancity.geocode.geocode_address', Mock(return_value=None))
+class SearchApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = create_reviewed_vendor("blackbird pizzeria", get_user())
+
+    def search(self, **params):
+        params.setdefault('format', 'json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/vendors/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content), len(queries)
+
+    def test_query_normalization(self):
+        self.assertEqual(normalize_query("  The   BLACKBIRD "),
+                         "the blackbird")
+
+    def test_repeated_search_is_cached(self):
+        data, _ = self.search(q="Blackbird")
+        self.assertEqual([vendor['name'] for vendor in data['vendors']],
+                         ["blackbird pizzeria"])
+
+        cached_data, num_queries = self.search(q="  BLACKBIRD ")
+        self.assertEqual(num_queries, 0)
+        self.assertEqual(cached_data['vendors'], data['vendors'])
+
+    def test_saving_vendor_invalidates_cache(self):
+        self.search(q="blackbird")
+        self.vendor.name = "blackbird vegan pizzeria"
+        self.vendor.save()
+
+        data, num_queries = self.search(q="blackbird")
+        self.assertNotEqual(num_queries, 0)
+        self.assertEqual(data['vendors'][0]['name'],
+                         "blackbird vegan pizzeria")
+
+    def test_pagination(self):
+        create_reviewed_vendor("blackbird cafe", get_user())
+        data, _ = self.search(q="blackbird", limit=1)
+        self.assertEqual(len(data['vendors']), 1)
+        self.assertEqual(data['meta']['total_count'], 2)
+        self.assertTrue(data['meta']['next'])
+
+    def test_fields(self):
+        data, _ = self.search(q="blackbird", fields="name")
+        self.assertEqual(sorted(data['vendors'][0]),
+                         ['name', 'resource_uri'])
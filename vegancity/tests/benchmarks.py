@@ -0,0 +1,221 @@
+import json
+import os
+import sys
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from vegancity import compression, moderation, typeahead
+from vegancity.fields import StatusField as SF
+from vegancity.email import NEW_VENDOR_APPROVAL
+from vegancity.models import OutboundEmail, Review, Vendor
+from vegancity.templatetags import vegancity_template_tags as tags
+from vegancity.tests.api import create_reviewed_vendor
+from vegancity.tests.integration import IntegrationTest
+from vegancity.tests.templating import CACHED_LOADERS, LOADERS
+from vegancity.tests.utils import get_user
+
+# set to write each benchmark's results to stderr as it runs
+REPORT = bool(os.environ.get('VEGANCITY_BENCHMARK_REPORT'))
+
+
+class BenchmarkTest(IntegrationTest):
+    """
+    Benchmarks are slow, so they are flagged as integration tests, and
+    skipped with --exclude-integration-tests like the others. They run
+    with the rest of the suite otherwise.
+
+    They report their timings on stderr only when
+    VEGANCITY_BENCHMARK_REPORT is set in the environment, so the
+    suite's output stays clean otherwise.
+    """
+
+    def report(self, name, results):
+        if REPORT:
+            sys.stderr.write("\nBENCHMARK %s: %s\n" % (name, results))
+
+    def timed(self, name, fn, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            result = fn(*args, **kwargs)
+            elapsed = time.time() - start
+        self.report(name, "%.3fs, %d queries" % (elapsed, len(queries)))
+        return result, len(queries)
+
+
+class VendorResourceBenchmark(BenchmarkTest):
+
+    VENDOR_COUNT = 1000
+
+    def setUp(self):
+        user = get_user()
+        for i in range(self.VENDOR_COUNT):
+            create_reviewed_vendor("benchmark vendor %d" % i, user)
+
+    def test_vendor_list_all(self):
+        response, queries = self.timed(
+            "api vendor list (%d vendors)" % self.VENDOR_COUNT,
+            self.client.get, '/api/v1/vendors/',
+            {'format': 'json', 'limit': 0})
+
+        data = json.loads(response.content)
+        self.assertEqual(len(data['objects']), self.VENDOR_COUNT)
+        self.assertLess(queries, 10)
+
+
+class BulkApprovalBenchmark(BenchmarkTest):
+
+    VENDOR_COUNT = 500
+
+    def setUp(self):
+        submitter = get_user(email="submitter@example.com")
+        self.ids = [Vendor.objects.create(name="benchmark vendor %d" % i,
+                                          submitted_by=submitter).pk
+                    for i in range(self.VENDOR_COUNT)]
+
+    def test_bulk_approve(self):
+        changed, queries = self.timed(
+            "bulk approve (%d vendors)" % self.VENDOR_COUNT,
+            moderation.set_status, Vendor, self.ids, SF.APPROVED)
+
+        self.assertEqual(len(changed), self.VENDOR_COUNT)
+        self.assertEqual(OutboundEmail.objects
+                         .filter(kind=NEW_VENDOR_APPROVAL).count(),
+                         self.VENDOR_COUNT)
+        self.assertLess(queries, 10)
+
+
+class TypeaheadBenchmark(BenchmarkTest):
+
+    VENDOR_COUNT = 2000
+
+    def setUp(self):
+        for i in range(self.VENDOR_COUNT):
+            Vendor.objects.create(name="benchmark vendor %d" % i,
+                                  approval_status=SF.APPROVED)
+        typeahead.prefix_cache.clear()
+
+    def test_suggest(self):
+        suggestions, queries = self.timed(
+            "typeahead (%d vendors)" % self.VENDOR_COUNT,
+            typeahead.suggest, "benchmark vendr 1999")
+        self.assertEqual(suggestions[0]['name'], "benchmark vendor 1999")
+        self.assertEqual(queries, 1)
+
+    def test_suggest_cached_prefix(self):
+        typeahead.suggest("ben")
+        suggestions, queries = self.timed(
+            "typeahead cached prefix (%d vendors)" % self.VENDOR_COUNT,
+            typeahead.suggest, "ben")
+        self.assertEqual(len(suggestions), typeahead.DEFAULT_LIMIT)
+        self.assertEqual(queries, 0)
+
+
+class VendorDetailRenderBenchmark(BenchmarkTest):
+
+    REVIEW_COUNT = 200
+    RENDERS = 10
+
+    def setUp(self):
+        user = get_user()
+        self.vendor = create_reviewed_vendor("benchmark vendor", user)
+        Review.objects.bulk_create([
+            Review(vendor=self.vendor, author=user,
+                   content="benchmark review %d" % i,
+                   food_rating=4, atmosphere_rating=3,
+                   approval_status=SF.APPROVED)
+            for i in range(self.REVIEW_COUNT)])
+        self.url = self.vendor.get_absolute_url()
+
+    def render(self):
+        for i in range(self.RENDERS):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_render_uncached_templates(self):
+        with override_settings(TEMPLATE_LOADERS=LOADERS):
+            self.timed("vendor detail x%d (%d reviews), uncached templates"
+                       % (self.RENDERS, self.REVIEW_COUNT), self.render)
+
+    def test_render_cached_templates(self):
+        with override_settings(TEMPLATE_LOADERS=CACHED_LOADERS):
+            self.client.get(self.url)
+            self.timed("vendor detail x%d (%d reviews), cached templates"
+                       % (self.RENDERS, self.REVIEW_COUNT), self.render)
+
+
+class TemplateFilterBenchmark(BenchmarkTest):
+    """
+    The filters run once per review, so each is timed over as many
+    calls as a few long review pages make, next to its uncached form.
+    """
+
+    CALLS = 10000
+    EMAILS = ["reviewer%d@example.com" % i for i in range(100)]
+
+    def setUp(self):
+        tags._gravatar_urls.clear()
+
+    def call(self, fn, values):
+        start = time.time()
+        for i in range(self.CALLS):
+            fn(values[i % len(values)])
+        return time.time() - start
+
+    def test_gravatar_urlify(self):
+        uncached, queries = self.timed(
+            "gravatar_urlify x%d, uncached" % self.CALLS,
+            self.call, lambda email: tags._gravatar_url(email, 72),
+            self.EMAILS)
+        memoized, queries = self.timed(
+            "gravatar_urlify x%d" % self.CALLS,
+            self.call, tags.gravatar_urlify, self.EMAILS)
+        # the memo is only worth having while it beats hashing
+        self.assertLess(memoized, uncached)
+
+    def test_graphical_rating(self):
+        self.timed("graphical_rating x%d, uncached" % self.CALLS,
+                   self.call, tags._rating_icons, [1, 2, 3, 4])
+        self.timed("graphical_rating x%d" % self.CALLS,
+                   self.call, tags.graphical_rating, [1, 2, 3, 4])
+
+    def test_strip_http(self):
+        self.timed("strip_http x%d" % self.CALLS,
+                   self.call, tags.strip_http,
+                   ["http://www.example.com/", "https://example.org"])
+
+
+class CompressionBenchmark(BenchmarkTest):
+    """
+    Bytes over the wire and time spent compressing the vendors page and
+    the api vendor list.
+    """
+
+    VENDOR_COUNT = 500
+
+    def setUp(self):
+        user = get_user()
+        for i in range(self.VENDOR_COUNT):
+            create_reviewed_vendor("benchmark vendor %d" % i, user)
+
+    def compare(self, name, *args):
+        plain = self.client.get(*args)
+        compression.reset_stats()
+        compressed, queries = self.timed(
+            "%s (%d vendors), gzip" % (name, self.VENDOR_COUNT),
+            self.client.get, *args, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        stats = compression.compression_stats()
+        ms = sum(stat['ms'] for stat in stats.values())
+        self.report(name, "%d bytes, %d gzipped, %.1fms compressing" %
+                    (len(plain.content), len(compressed.content), ms))
+        self.assertLess(len(compressed.content), len(plain.content))
+
+    def test_vendors_page(self):
+        self.compare("vendors page", '/vendors/')
+
+    def test_api_vendor_list(self):
+        self.compare("api vendor list", '/api/v1/vendors/',
+                     {'format': 'json', 'limit': 0})
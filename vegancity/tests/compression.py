@@ -0,0 +1,94 @@
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from vegancity import compression
+from vegancity.middleware import CompressionMiddleware
+
+PAGE = "<p>Blackbird Pizzeria</p>\n" * 200
+
+
+def gunzip(content):
+    return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+
+
+class ChooseEncodingTest(TestCase):
+
+    def test_gzip(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate'),
+                         compression.GZIP)
+        self.assertEqual(compression.choose_encoding('*'), compression.GZIP)
+
+    def test_none(self):
+        for accept_encoding in ('', 'identity', 'deflate', 'gzip;q=0',
+                                'gzip;q=0, *'):
+            self.assertIsNone(compression.choose_encoding(accept_encoding))
+
+
+class CompressionMiddlewareTest(TestCase):
+
+    def setUp(self):
+        compression.reset_stats()
+        self.request = RequestFactory().get('/',
+                                            HTTP_ACCEPT_ENCODING='gzip')
+
+    def process(self, response, request=None):
+        return CompressionMiddleware().process_response(
+            request or self.request, response)
+
+    def test_compressed(self):
+        response = self.process(HttpResponse(PAGE))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gunzip(response.content), PAGE)
+
+    def test_stats(self):
+        self.process(HttpResponse(PAGE))
+        stats = compression.compression_stats()['text/html']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['bytes'], len(PAGE))
+        self.assertLess(stats['compressed'], len(PAGE))
+
+    def test_not_accepted(self):
+        request = RequestFactory().get('/')
+        response = self.process(HttpResponse(PAGE), request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, PAGE)
+
+    def test_small(self):
+        response = self.process(HttpResponse("<p>hi</p>"))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_content_type(self):
+        response = self.process(HttpResponse(PAGE, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_api(self):
+        response = HttpResponse('{"objects": []}' * 100,
+                                content_type='application/json')
+        self.assertEqual(self.process(response)['Content-Encoding'], 'gzip')
+
+    def test_streaming(self):
+        chunks = [PAGE] * 10
+        response = self.process(StreamingHttpResponse(iter(chunks)))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gunzip(''.join(response.streaming_content)),
+                         PAGE * 10)
+
+    def test_weak_etag(self):
+        response = HttpResponse(PAGE)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.process(response)['ETag'], 'W/"abc"')
+
+    @override_settings(RESPONSE_COMPRESSION_ENABLED=False)
+    def test_disabled(self):
+        response = self.process(HttpResponse(PAGE))
+        self.assertFalse(response.has_header('Content-Encoding'))
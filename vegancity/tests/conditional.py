@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from vegancity.fields import StatusField as SF
+from vegancity.models import Review, Vendor
+from vegancity.tests.utils import get_user
+
+
+class ConditionalPageTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+        self.url = self.vendor.get_absolute_url()
+
+    def get(self, url, **headers):
+        return self.client.get(url, **headers)
+
+    def revalidate(self, url, response):
+        return self.get(url,
+                        HTTP_IF_NONE_MATCH=response['ETag'],
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+    def test_headers(self):
+        for url in ('/', '/vendors/', self.url):
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header('ETag'))
+            self.assertTrue(response.has_header('Last-Modified'))
+            self.assertIn('must-revalidate', response['Cache-Control'])
+
+    def test_not_modified(self):
+        for url in ('/', '/vendors/', self.url):
+            response = self.revalidate(url, self.get(url))
+            self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_by_date(self):
+        response = self.get(self.url)
+        response = self.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_compressed(self):
+        response = self.get('/vendors/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.get('/vendors/', HTTP_ACCEPT_ENCODING='gzip',
+                            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_vendor_edit(self):
+        response = self.get(self.url)
+        self.vendor.notes = "all vegan"
+        self.vendor.save()
+        self.assertEqual(self.revalidate(self.url, response).status_code,
+                         200)
+
+    def test_new_review(self):
+        response = self.get(self.url)
+        Review.objects.create(vendor=self.vendor, author=get_user(),
+                              content="great", approval_status=SF.APPROVED)
+        self.assertEqual(self.revalidate(self.url, response).status_code,
+                         200)
+
+    def test_signed_in(self):
+        anonymous = self.get(self.url)
+        user = get_user()
+        user.set_password('password')
+        user.save()
+        self.client.login(username=user.username, password='password')
+
+        response = self.get(self.url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_search_not_conditional(self):
+        response = self.get('/vendors/', {'current_query': 'pizza'})
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_vendor_redirect(self):
+        response = self.get('/vendors/%d/' % self.vendor.pk)
+        self.assertEqual(response.status_code, 301)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_unknown_vendor(self):
+        response = self.get('/vendors/nowhere/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
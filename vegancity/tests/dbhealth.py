@@ -0,0 +1,38 @@
+import time
+
+from mock import patch
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase
+
+from vegancity import dbhealth
+
+
+class ConnectionHealthCheckTest(TestCase):
+
+    def setUp(self):
+        # make sure the connection is open
+        connection.cursor()
+
+    def tearDown(self):
+        connections[DEFAULT_DB_ALIAS].__dict__.pop('vegancity_last_used',
+                                                   None)
+
+    def check(self, usable):
+        with patch.object(connection, 'is_usable',
+                          return_value=usable) as is_usable, \
+                patch.object(connection, 'close') as close:
+            dbhealth.check_connections()
+        return is_usable.called, close.called
+
+    def test_idle_connection_checked(self):
+        connection.vegancity_last_used = time.time() - 60
+        self.assertEqual(self.check(usable=True), (True, False))
+
+    def test_unusable_connection_closed(self):
+        connection.vegancity_last_used = time.time() - 60
+        self.assertEqual(self.check(usable=False), (True, True))
+
+    def test_recently_used_connection_not_checked(self):
+        dbhealth.mark_used()
+        self.assertEqual(self.check(usable=False), (False, False))
@@ -0,0 +1,74 @@
+from mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from vegancity import fragments
+from vegancity.fields import StatusField as SF
+from vegancity.models import Review, Vendor
+from vegancity.tests.utils import get_user
+
+
+class ReviewFragmentTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user(email="moby@example.com")
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+        self.review = Review.objects.create(
+            vendor=self.vendor, author=self.user,
+            content="great seitan wings\n\nand pizza",
+            food_rating=4, approval_status=SF.APPROVED)
+
+    def reviews(self):
+        return (Review.objects
+                .select_related('author', 'vendor', 'best_vegan_dish'))
+
+    def render(self, **kwargs):
+        with patch.object(fragments, 'render_review',
+                          wraps=fragments.render_review) as render:
+            reviews = fragments.with_html(self.reviews(), **kwargs)
+        return reviews[0].html, render.call_count
+
+    def test_renders_review(self):
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn("<p>great seitan wings</p>", html)
+        self.assertIn("gravatar.com", html)
+        self.assertIn("rating-solid.png", html)
+
+    def test_cached(self):
+        self.render()
+        html, rendered = self.render()
+        self.assertEqual(rendered, 0)
+        self.assertIn("great seitan wings", html)
+
+    def test_no_queries_per_review(self):
+        with self.assertNumQueries(1):
+            fragments.with_html(self.reviews())
+
+    def test_edit_renders_again(self):
+        self.render()
+        self.review.content = "still great"
+        self.review.save()
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn("still great", html)
+
+    def test_vendor_rename_renders_again(self):
+        self.render(show_vendor_name=True)
+        self.vendor.name = "Blackbird Pizza"
+        self.vendor.save()
+        html, rendered = self.render(show_vendor_name=True)
+        self.assertEqual(rendered, 1)
+        self.assertIn("Blackbird Pizza<", html)
+
+    def test_vendor_name_variant(self):
+        self.assertNotIn("Blackbird Pizzeria", self.render()[0])
+        self.assertIn("Blackbird Pizzeria",
+                      self.render(show_vendor_name=True)[0])
+
+    def test_vendor_page(self):
+        response = self.client.get(self.vendor.get_absolute_url())
+        self.assertContains(response, "great seitan wings")
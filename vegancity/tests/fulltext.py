@@ -0,0 +1,120 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vegancity.fields import StatusField as SF
+from vegancity.models import (CuisineTag, SearchSynonym, Vendor,
+                              VeganDish)
+
+
+class SearchIndexTriggerTest(TestCase):
+
+    def search_index(self, model, pk):
+        return model.objects.values_list('search_index', flat=True) \
+                            .get(pk=pk)
+
+    def test_save_runs_no_extra_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            dish = VeganDish.objects.create(name="seitan cheesesteak")
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(list(VeganDish.objects.search("cheesesteak")),
+                         [dish])
+
+    def test_update_changes_index(self):
+        dish = VeganDish.objects.create(name="seitan cheesesteak")
+        dish.name = "tofu hoagie"
+        dish.save()
+
+        self.assertFalse(VeganDish.objects.search("cheesesteak").exists())
+        self.assertTrue(VeganDish.objects.search("hoagie").exists())
+
+    def test_trigger_matches_search_manager(self):
+        vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                       notes="Vegan pizza and cheesesteaks",
+                                       website="http://blackbirdpizzeria.com",
+                                       approval_status=SF.APPROVED)
+        from_trigger = self.search_index(Vendor, vendor.pk)
+
+        vendor.update_search_field()
+        self.assertEqual(self.search_index(Vendor, vendor.pk), from_trigger)
+
+
+class RebuildSearchIndexTest(TestCase):
+
+    def test_rebuild(self):
+        vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                       approval_status=SF.APPROVED)
+        for i in range(3):
+            VeganDish.objects.create(name="dish %d" % i)
+
+        Vendor.objects.update(search_index='')
+        VeganDish.objects.update(search_index='')
+        self.assertFalse(Vendor.objects.search("pizzeria").exists())
+
+        call_command('rebuild_search_index', batch_size=2)
+
+        self.assertEqual(list(Vendor.objects.search("pizzeria")), [vendor])
+        self.assertEqual(VeganDish.objects.search("dish").count(), 3)
+
+
+class SynonymSearchTest(TestCase):
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(
+            name="Grindcore House",
+            notes="Try the tempeh reuben and the soy latte",
+            approval_status=SF.APPROVED)
+
+    def search(self, query):
+        return list(Vendor.objects.approved().search(query))
+
+    def test_synonym_expands_query(self):
+        self.assertEqual(self.search("tempe"), [])
+        SearchSynonym.objects.create(term="tempeh", synonym="tempe")
+        self.assertEqual(self.search("tempe"), [self.vendor])
+
+    def test_both_directions(self):
+        SearchSynonym.objects.create(term="soy latte", synonym="soya latte")
+        vendor = Vendor.objects.create(name="Soya Latte Stand",
+                                       approval_status=SF.APPROVED)
+        self.assertItemsEqual(self.search("soya latte"),
+                              [self.vendor, vendor])
+        self.assertItemsEqual(self.search("soy latte"),
+                              [self.vendor, vendor])
+
+    def test_phrase_within_query(self):
+        SearchSynonym.objects.create(term="wf", synonym="wheat free")
+        vendor = Vendor.objects.create(name="Sweet Freedom",
+                                       notes="Everything is wheat free",
+                                       approval_status=SF.APPROVED)
+        self.assertEqual(self.search("wf sweet"), [vendor])
+
+    def test_deleted_synonym(self):
+        synonym = SearchSynonym.objects.create(term="tempeh", synonym="tempe")
+        synonym.delete()
+        self.assertEqual(self.search("tempe"), [])
+
+    def test_stopword_synonym_ignored(self):
+        SearchSynonym.objects.create(term="tempeh", synonym="the")
+        self.assertEqual(self.search("tempeh"), [self.vendor])
+
+    def test_vendor_search(self):
+        tag = CuisineTag.objects.create(name="cafe_fare",
+                                        description="Cafe Fare")
+        self.vendor.cuisine_tags.add(tag)
+        SearchSynonym.objects.create(term="cafe", synonym="coffee bar")
+        self.assertEqual(list(CuisineTag.objects.vendor_search("coffee bar")),
+                         [self.vendor])
+
+    def test_unaccented(self):
+        vendor = Vendor.objects.create(name=u"Caf\xe9 Soleil",
+                                       approval_status=SF.APPROVED)
+        self.assertEqual(self.search("cafe soleil"), [vendor])
+
+    def test_single_query(self):
+        SearchSynonym.objects.create(term="tempeh", synonym="tempe")
+        with CaptureQueriesContext(connection) as queries:
+            self.search("tempe")
+        self.assertEqual(len(queries), 1)
@@ -92,7 +92,7 @@ class PageLoadTest(IntegrationTest):
     fixtures = ['public_data.json']
 
     def setUp(self):
-        self.reviews = Review.objects.approved().all()
+        self.reviews = Review.objects.approved().select_related('vendor')
         self.vendors = Vendor.objects.approved().all()
 
     def assertNoBrokenTemplates(self, url):
@@ -0,0 +1,145 @@
+import datetime
+import smtplib
+
+from mock import Mock, patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from vegancity import email, mailqueue
+from vegancity.models import OutboundEmail, Vendor
+from vegancity.tests.utils import get_user
+
+
+def queue_approval(vendor):
+    mailqueue.enqueue(email.new_vendor_approval_message(vendor),
+                      email.NEW_VENDOR_APPROVAL)
+
+
+class MailQueueTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        mail.outbox = []
+        self.staff = get_user(username="staff", email="staff@example.com",
+                              is_staff=True)
+        self.submitter = get_user(email="submitter@example.com")
+
+    def test_submission_only_queues(self):
+        Vendor.objects.create(name="test vendor", submitted_by=self.submitter)
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.kind, email.NEW_VENDOR_ALERT)
+        self.assertTrue(queued.to_staff)
+        self.assertEqual(queued.status, OutboundEmail.QUEUED)
+
+    def test_send_queued(self):
+        vendor = Vendor.objects.create(name="test vendor",
+                                       submitted_by=self.submitter)
+        queue_approval(vendor)
+
+        self.assertEqual(mailqueue.send_queued(), 2)
+
+        self.assertEqual(sorted(message.to for message in mail.outbox),
+                         [["staff@example.com"], ["submitter@example.com"]])
+        self.assertEqual(OutboundEmail.objects
+                         .filter(status=OutboundEmail.SENT).count(), 2)
+        self.assertEqual(mailqueue.send_queued(), 0)
+
+    def test_alerts_are_combined(self):
+        for i in range(3):
+            Vendor.objects.create(name="vendor %d" % i)
+
+        mailqueue.send_queued()
+
+        self.assertEqual(len(mail.outbox), 1)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.to, ["staff@example.com"])
+        self.assertIn("(3)", digest.subject)
+        for i in range(3):
+            self.assertIn("vendor %d" % i, digest.body)
+
+    def test_failed_emails_are_retried(self):
+        Vendor.objects.create(name="test vendor")
+        connection = Mock()
+        connection.send_messages.side_effect = smtplib.SMTPException("down")
+
+        mailqueue.send_queued(connection)
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.status, OutboundEmail.QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(queued.last_error, "down")
+        self.assertGreater(queued.send_after, datetime.datetime.now())
+        self.assertTrue(connection.close.called)
+
+        # not due yet
+        self.assertEqual(mailqueue.send_queued(), 0)
+
+        with self.settings(EMAIL_QUEUE_MAX_ATTEMPTS=2):
+            OutboundEmail.objects.update(send_after=datetime.datetime.now())
+            mailqueue.send_queued(connection)
+        self.assertEqual(OutboundEmail.objects.get().status,
+                         OutboundEmail.FAILED)
+
+    def test_worker_reuses_connection(self):
+        for i in range(3):
+            queue_approval(Vendor.objects.create(
+                name="vendor %d" % i, submitted_by=self.submitter))
+
+        connection = Mock()
+        connection.send_messages.return_value = 1
+        with patch('vegancity.management.commands.send_queued_email.'
+                   'get_connection', Mock(return_value=connection)):
+            call_command('send_queued_email', batch_size=2)
+
+        # three batches, each with an alert and an approval, all sent
+        # over one connection.
+        self.assertEqual(connection.send_messages.call_count, 6)
+        self.assertEqual(connection.close.call_count, 1)
+        self.assertFalse(OutboundEmail.objects
+                         .filter(status=OutboundEmail.QUEUED).exists())
+
+    def test_sending_emails_are_claimed(self):
+        Vendor.objects.create(name="test vendor")
+        connection = Mock()
+
+        def send_messages(messages):
+            # a worker running now finds nothing to send
+            self.assertEqual(OutboundEmail.objects.get().status,
+                             OutboundEmail.SENDING)
+            self.assertEqual(mailqueue.send_queued(Mock()), 0)
+        connection.send_messages.side_effect = send_messages
+
+        self.assertEqual(mailqueue.send_queued(connection), 1)
+        self.assertEqual(OutboundEmail.objects.get().status,
+                         OutboundEmail.SENT)
+
+    def test_abandoned_claims_are_sent(self):
+        Vendor.objects.create(name="test vendor")
+        OutboundEmail.objects.update(
+            status=OutboundEmail.SENDING,
+            send_after=datetime.datetime.now() - datetime.timedelta(1))
+
+        self.assertEqual(mailqueue.send_queued(), 1)
+        self.assertEqual(OutboundEmail.objects.get().status,
+                         OutboundEmail.SENT)
+
+    def test_broken_emails_dont_stop_the_batch(self):
+        vendor = Vendor.objects.create(name="test vendor",
+                                       submitted_by=self.submitter)
+        queue_approval(vendor)
+
+        with patch('vegancity.notifications.staff_recipients',
+                   Mock(side_effect=ValueError("broken"))):
+            self.assertEqual(mailqueue.send_queued(), 2)
+
+        self.assertEqual([message.to for message in mail.outbox],
+                         [["submitter@example.com"]])
+        alert = OutboundEmail.objects.get(to_staff=True)
+        self.assertEqual(alert.status, OutboundEmail.QUEUED)
+        self.assertEqual(alert.attempts, 1)
+        self.assertEqual(alert.last_error, "broken")
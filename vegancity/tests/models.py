@@ -401,6 +401,38 @@ class VendorModelTest(TestCase):
         self.assertRaises(ValidationError, v.save)
 
 
+class VendorSlugTest(TestCase):
+
+    def test_slug_set_on_create(self):
+        vendor = Vendor.objects.create(name="Blackbird Pizzeria")
+        self.assertEqual(vendor.slug, "blackbird-pizzeria")
+        self.assertEqual(vendor.get_absolute_url(),
+                         "/vendors/%d-blackbird-pizzeria/" % vendor.pk)
+
+    def test_slug_follows_rename(self):
+        vendor = Vendor.objects.create(name="Blackbird Pizzeria")
+        vendor.name = "Blackbird Pizza"
+        vendor.save()
+        self.assertEqual(Vendor.objects.get(pk=vendor.pk).slug,
+                         "blackbird-pizza")
+
+    def test_slugs_unique(self):
+        Vendor.objects.create(name="Grindcore House")
+        vendor = Vendor.objects.create(name="Grindcore House!")
+        self.assertEqual(vendor.slug, "grindcore-house-2")
+
+    def test_reserved_slugs_avoided(self):
+        self.assertEqual(Vendor.objects.create(name="Add").slug, "add-2")
+
+    def test_review_url(self):
+        vendor = Vendor.objects.create(name="Blackbird Pizzeria")
+        review = Review.objects.create(vendor=vendor, author=get_user())
+        review = Review.objects.select_related('vendor').get(pk=review.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(review.get_absolute_url(),
+                             vendor.get_absolute_url())
+
+
 class VendorEmailTest(TestCase):
 
     def setUp(self):
@@ -0,0 +1,66 @@
+from mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vegancity import notifications
+from vegancity.models import Vendor
+from vegancity.tests.utils import get_user
+
+
+class StaffRecipientsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.staff = get_user(username="staff", email="staff@example.com",
+                              is_staff=True)
+
+    def test_cached(self):
+        self.assertEqual(notifications.staff_recipients(),
+                         ["staff@example.com"])
+        with CaptureQueriesContext(connection) as queries:
+            notifications.staff_recipients()
+        self.assertEqual(len(queries), 0)
+
+    def test_invalidated_when_staff_changes(self):
+        notifications.staff_recipients()
+        get_user(username="new staff", email="new@example.com",
+                 is_staff=True)
+        self.assertEqual(sorted(notifications.staff_recipients()),
+                         ["new@example.com", "staff@example.com"])
+
+        self.staff.is_staff = False
+        self.staff.save()
+        self.assertEqual(notifications.staff_recipients(),
+                         ["new@example.com"])
+
+    def test_not_invalidated_by_other_changes(self):
+        notifications.staff_recipients()
+        self.staff.first_name = "Moby"
+        self.staff.save()
+        with CaptureQueriesContext(connection) as queries:
+            notifications.staff_recipients()
+        self.assertEqual(len(queries), 0)
+
+
+class RenderTest(TestCase):
+
+    def test_template_is_compiled_once(self):
+        vendor = Vendor(pk=1, name="test vendor")
+        notifications._templates.clear()
+        with patch('vegancity.notifications.get_template',
+                   wraps=notifications.get_template) as get_template:
+            for i in range(3):
+                notifications.render('vegancity/approval_email.html',
+                                     {'vendor': vendor})
+        self.assertEqual(get_template.call_count, 1)
+
+    def test_text_and_html_parts(self):
+        text_body, html_body = notifications.render(
+            'vegancity/approval_email.html',
+            {'vendor': Vendor(pk=1, name="test vendor")})
+        self.assertIn("<h1>", html_body)
+        self.assertNotIn("<h1>", text_body)
+        self.assertIn("test vendor", text_body)
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from vegancity import moderation
+from vegancity.fields import StatusField as SF
+from vegancity.models import Review, Vendor
+from vegancity.tests.utils import get_user
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+        self.other = Vendor.objects.create(name="Grindcore House",
+                                           approval_status=SF.APPROVED)
+        self.url = self.vendor.get_absolute_url()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def cache_status(self, url):
+        return self.get(url).get('X-Page-Cache')
+
+    def test_hit(self):
+        self.assertEqual(self.cache_status(self.url), 'miss')
+        with self.assertNumQueries(0):
+            response = self.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, "Blackbird Pizzeria")
+
+    def test_edit_purges_page(self):
+        self.get(self.url)
+        self.vendor.name = "Blackbird Pizza"
+        self.vendor.save()
+
+        response = self.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertNotContains(response, "Pizzeria")
+
+    def test_unrelated_edit_keeps_page(self):
+        self.get(self.url)
+        self.other.name = "Grindcore"
+        self.other.save()
+        self.assertEqual(self.cache_status(self.url), 'hit')
+
+    def test_new_review_purges_vendor_page(self):
+        self.get(self.url)
+        Review.objects.create(vendor=self.vendor, author=get_user(),
+                              content="great pizza",
+                              approval_status=SF.APPROVED)
+        self.assertEqual(self.cache_status(self.url), 'miss')
+
+    def test_new_vendor_purges_list_page(self):
+        self.get('/vendors/')
+        self.assertEqual(self.cache_status('/vendors/'), 'hit')
+        Vendor.objects.create(name="Vedge", approval_status=SF.APPROVED)
+        self.assertEqual(self.cache_status('/vendors/'), 'miss')
+
+    def test_moderation_purges_list_page(self):
+        pending = Vendor.objects.create(name="Vedge")
+        self.get('/vendors/')
+        moderation.set_status(Vendor, [pending.pk], SF.APPROVED)
+
+        response = self.get('/vendors/')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "Vedge")
+
+    def test_moderation_purges_vendor_page(self):
+        author = get_user()
+        review = Review.objects.create(vendor=self.vendor, author=author,
+                                       content="great pizza")
+        profile_url = '/users/%s/' % author.username
+        self.get(self.url)
+        self.get(profile_url)
+        moderation.set_status(Review, [review.pk], SF.APPROVED)
+
+        response = self.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "great pizza")
+        self.assertEqual(self.cache_status(profile_url), 'miss')
+
+    def test_query_string_normalized(self):
+        self.get('/vendors/?neighborhood=&cuisine_tag=')
+        self.assertEqual(self.cache_status('/vendors/?cuisine_tag=&'
+                                           'neighborhood='), 'hit')
+
+    def test_logged_in_not_cached(self):
+        user = get_user()
+        user.set_password('password')
+        user.save()
+        self.client.login(username=user.username, password='password')
+        self.assertEqual(self.cache_status(self.url), None)
+
+    @override_settings(PAGE_CACHE_NGINX_SECONDS=30)
+    def test_nginx_headers(self):
+        response = self.get(self.url)
+        self.assertEqual(response['X-Accel-Expires'], '30')
+        self.assertIn('vendor.%d' % self.vendor.pk,
+                      response['Surrogate-Key'].split())
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from django.test import TestCase, TransactionTestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from vegancity import pagecache, panels
+from vegancity.fields import StatusField as SF
+from vegancity.models import Vendor
+
+
+def current_thread(request):
+    return threading.current_thread().ident
+
+
+def approved_vendors(request):
+    return list(Vendor.objects.approved())
+
+
+class PanelsTest(TestCase):
+
+    def setUp(self):
+        panels.reset_stats()
+        self.request = RequestFactory().get('/')
+
+    def test_load(self):
+        loaded = panels.load(self.request, (('one', lambda request: 1),
+                                            ('two', lambda request: 2)))
+        self.assertEqual(loaded, {'one': 1, 'two': 2})
+
+    def test_stats(self):
+        panels.load(self.request, (('one', lambda request: 1),))
+        panels.load(self.request, (('one', lambda request: 1),))
+        self.assertEqual(panels.panel_stats()['one']['count'], 2)
+
+    def test_errors(self):
+        def broken(request):
+            raise ValueError
+        self.assertRaises(ValueError, panels.load, self.request,
+                          (('broken', broken),))
+
+    def test_in_request_thread(self):
+        loaded = panels.load(self.request, (('thread', current_thread),))
+        self.assertEqual(loaded['thread'], threading.current_thread().ident)
+
+
+@override_settings(PANEL_WORKERS=4)
+class PanelThreadTest(TransactionTestCase):
+
+    def setUp(self):
+        panels.reset_stats()
+        self.request = RequestFactory().get('/')
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+
+    def test_other_threads(self):
+        loaded = panels.load(self.request, (('thread', current_thread),))
+        self.assertNotEqual(loaded['thread'],
+                            threading.current_thread().ident)
+
+    def test_queries(self):
+        loaded = panels.load(self.request, (('vendors', approved_vendors),))
+        self.assertEqual(loaded['vendors'], [self.vendor])
+
+    def test_concurrent(self):
+        def slow(request):
+            time.sleep(0.2)
+        start = time.time()
+        panels.load(self.request, [('slow %d' % i, slow) for i in range(4)])
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(len(panels.panel_stats()), 4)
+
+    def test_page_cache_tags(self):
+        pagecache.share_collected({})
+        try:
+            panels.load(self.request, (('vendors', approved_vendors),))
+            collected = pagecache.collected()
+        finally:
+            pagecache.share_collected(None)
+        self.assertEqual(collected, {'vendor': set([self.vendor.pk])})
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vegancity import moderation, profiles
+from vegancity.fields import StatusField as SF
+from vegancity.models import Review, Vendor
+from vegancity.tests.utils import get_user
+
+
+class ProfileReviewsTest(TestCase):
+
+    REVIEW_COUNT = profiles.REVIEW_PAGE_SIZE + 5
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user()
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+        for i in range(self.REVIEW_COUNT):
+            Review.objects.create(vendor=self.vendor, author=self.user,
+                                  content="review number %d." % i,
+                                  food_rating=i % 2 + 3,
+                                  approval_status=SF.APPROVED)
+        self.url = '/users/%s/' % self.user.username
+
+    def reviews_on(self, response):
+        return [i for i in range(self.REVIEW_COUNT)
+                if "review number %d." % i in response.content]
+
+    def test_paginated_newest_first(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.reviews_on(response),
+                         range(5, self.REVIEW_COUNT))
+        next_page = response.context['next_page']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(next_page)
+        for query in queries:
+            self.assertNotIn('OFFSET', query['sql'])
+        self.assertEqual(self.reviews_on(response), range(5))
+        self.assertIsNone(response.context['next_page'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stats(self):
+        stats = profiles.review_stats(self.user)
+        self.assertEqual(stats['review_count'], self.REVIEW_COUNT)
+        self.assertEqual(stats['vendor_count'], 1)
+        self.assertAlmostEqual(stats['food_rating'], 3.48)
+        self.assertIsNone(stats['atmosphere_rating'])
+        self.assertContains(self.client.get(self.url),
+                            "%d reviews of 1 vendor" % self.REVIEW_COUNT)
+
+    def test_stats_cached(self):
+        profiles.review_stats(self.user)
+        with self.assertNumQueries(0):
+            profiles.review_stats(self.user)
+
+    def test_stats_updated_on_delete(self):
+        profiles.review_stats(self.user)
+        Review.objects.filter(content="review number 0.").get().delete()
+        self.assertEqual(profiles.review_stats(self.user)['review_count'],
+                         self.REVIEW_COUNT - 1)
+
+    def test_stats_updated_on_moderation(self):
+        review = Review.objects.create(vendor=self.vendor, author=self.user,
+                                       content="pending")
+        profiles.review_stats(self.user)
+        moderation.set_status(Review, [review.pk], SF.APPROVED)
+        self.assertEqual(profiles.review_stats(self.user)['review_count'],
+                         self.REVIEW_COUNT + 1)
@@ -0,0 +1,82 @@
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from vegancity import caching, routers
+from vegancity.middleware import ReplicaMiddleware
+from vegancity.models import Vendor
+
+
+@override_settings(DATABASE_REPLICAS=('replica',))
+class ReplicaRoutingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware()
+        self.router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.end_request()
+
+    def start(self, request):
+        self.middleware.process_request(request)
+        return self.router.db_for_read(Vendor)
+
+    def finish(self, request):
+        return self.middleware.process_response(request, HttpResponse())
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.start(self.factory.get('/vendors/')), 'replica')
+
+    def test_post_reads_from_primary(self):
+        self.assertEqual(self.start(self.factory.post('/vendors/add/')),
+                         'default')
+
+    def test_admin_reads_from_primary(self):
+        self.assertEqual(self.start(self.factory.get('/admin/')), 'default')
+
+    def test_outside_request(self):
+        self.assertEqual(self.router.db_for_read(Vendor), 'default')
+
+    @override_settings(DATABASE_REPLICAS=())
+    def test_no_replicas(self):
+        self.assertEqual(self.start(self.factory.get('/vendors/')), 'default')
+
+    def test_sessions_read_from_primary(self):
+        self.start(self.factory.get('/vendors/'))
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    def test_reads_after_write_go_to_primary(self):
+        request = self.factory.get('/vendors/')
+        self.start(request)
+        self.assertEqual(self.router.db_for_write(Vendor), 'default')
+        self.assertEqual(self.router.db_for_read(Vendor), 'default')
+
+        response = self.finish(request)
+        self.assertIn('use_primary', response.cookies)
+
+    def test_post_sets_pin_cookie(self):
+        request = self.factory.post('/vendors/add/')
+        self.start(request)
+        response = self.finish(request)
+        self.assertEqual(response.cookies['use_primary']['max-age'], 15)
+
+    def test_pinned_client_reads_from_primary(self):
+        request = self.factory.get('/vendors/')
+        request.COOKIES['use_primary'] = '1'
+        self.assertEqual(self.start(request), 'default')
+
+    def test_read_only_request_not_pinned(self):
+        request = self.factory.get('/vendors/')
+        self.start(request)
+        self.assertNotIn('use_primary', self.finish(request).cookies)
+        self.assertEqual(self.router.db_for_read(Vendor), 'default')
+
+    def test_recent_data_change_reads_from_primary(self):
+        caching.bump_data_version()
+        self.assertEqual(self.start(self.factory.get('/vendors/')),
+                         'default')
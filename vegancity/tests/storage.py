@@ -0,0 +1,90 @@
+import gzip
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from vegancity.storage import ManifestStaticFilesStorage
+
+SCRIPT = "var vendors = [];\n" * 100
+
+
+class ManifestStaticFilesStorageTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.write('css/site.css',
+                   'body { background: url("../images/dot.png"); }')
+        self.write('images/dot.png', '\x89PNG' * 100)
+        self.write('js/map.js', SCRIPT)
+        self.write('js/tiny.js', 'var a;')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            return f.read()
+
+    def storage(self):
+        return ManifestStaticFilesStorage(location=self.root,
+                                          base_url='/static/')
+
+    def collect(self):
+        # collectstatic copies the files to STATIC_ROOT before it
+        # post processes them.
+        source = FileSystemStorage(location=self.root)
+        names = ('css/site.css', 'images/dot.png', 'js/map.js', 'js/tiny.js')
+        storage = self.storage()
+        list(storage.post_process(dict((name, (source, name))
+                                       for name in names)))
+        return storage
+
+    def test_hashed_names(self):
+        storage = self.collect()
+        hashed = storage.hashed_files['js/map.js']
+        self.assertRegexpMatches(hashed, r'^js/map\.[0-9a-f]{12}\.js$')
+        self.assertEqual(self.read(hashed), SCRIPT)
+        self.assertEqual(storage.url('js/map.js'), '/static/' + hashed)
+
+    def test_stylesheet_urls(self):
+        storage = self.collect()
+        image = os.path.basename(storage.hashed_files['images/dot.png'])
+        self.assertIn(image, self.read(storage.hashed_files['css/site.css']))
+
+    def test_manifest(self):
+        hashed_files = self.collect().hashed_files
+        self.assertEqual(self.storage().hashed_files, hashed_files)
+
+    def test_precompressed(self):
+        storage = self.collect()
+        hashed = storage.hashed_files['js/map.js']
+        compressed = gzip.GzipFile(fileobj=StringIO(self.read(hashed + '.gz')))
+        self.assertEqual(compressed.read(), SCRIPT)
+
+    def test_not_precompressed(self):
+        storage = self.collect()
+        for name in ('js/tiny.js', 'images/dot.png'):
+            hashed = storage.hashed_files[name]
+            self.assertFalse(storage.exists(hashed + '.gz'))
+
+    def test_uncollected(self):
+        self.assertEqual(self.collect().url('js/forms.js'),
+                         '/static/js/forms.js')
+
+    @override_settings(DEBUG=True)
+    def test_debug(self):
+        self.assertEqual(self.collect().url('js/map.js'), '/static/js/map.js')
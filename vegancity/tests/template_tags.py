@@ -1,12 +1,14 @@
-from django.conf import settings
+from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.test import TestCase
 
 import hashlib
 
 from django.template.loader import get_template_from_string
 from django.template.base import Context
+from vegancity.templatetags import vegancity_template_tags
 from vegancity.templatetags.vegancity_template_tags import (strip_http,
                                                             DEFAULT_USER_ICON,
+                                                            gravatar_urlify,
                                                             graphical_rating)
 
 
@@ -63,12 +65,36 @@ class TemplateTagTest(TestCase):
 
     def test_graphical_rating(self):
         rating = 3
-        img_class_src = '<img class="rating" src="' + settings.STATIC_URL
-        result_markup = ''.join((
-            img_class_src + 'images/rating-solid.png">',
-            img_class_src + 'images/rating-solid.png">',
-            img_class_src + 'images/rating-solid.png">',
-            img_class_src + 'images/rating-faded.png">'
-            ))
+        # the images are linked through the staticfiles storage, by
+        # their hashed names when collected
+        solid = '<img class="rating" src="%s">' % static(
+            'images/rating-solid.png')
+        faded = '<img class="rating" src="%s">' % static(
+            'images/rating-faded.png')
+        result_markup = solid * 3 + faded
 
         self.assertEqual(graphical_rating(rating), result_markup)
+
+    def test_graphical_rating_zero(self):
+        self.assertEqual(graphical_rating(0).count('rating-faded.png'), 4)
+
+    def test_graphical_rating_out_of_range(self):
+        self.assertEqual(graphical_rating(5).count('rating-solid.png'), 5)
+
+    def test_gravatar_urlify_memoized(self):
+        urls = vegancity_template_tags._gravatar_urls
+        urls.clear()
+        url = gravatar_urlify('ex@example.com')
+        self.assertEqual(urls.get(('ex@example.com', 72)), url)
+        self.assertEqual(gravatar_urlify('ex@example.com'), url)
+
+    def test_gravatar_urlify_memo_bounded(self):
+        urls = vegancity_template_tags._gravatar_urls
+        urls.clear()
+        size = vegancity_template_tags.GRAVATAR_CACHE_SIZE
+        for i in range(size + 1):
+            gravatar_urlify('ex%d@example.com' % i)
+        self.assertLessEqual(len(urls), size)
+        self.assertEqual(gravatar_urlify('ex0@example.com'),
+                         vegancity_template_tags._gravatar_url(
+                             'ex0@example.com', 72))
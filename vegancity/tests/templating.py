@@ -0,0 +1,50 @@
+from django.template import loader
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from vegancity import templating
+
+LOADERS = (
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+)
+
+CACHED_LOADERS = (('vegancity.templating.Loader', LOADERS),)
+
+
+@override_settings(TEMPLATE_LOADERS=CACHED_LOADERS)
+class TemplatingTest(TestCase):
+
+    def setUp(self):
+        templating.reset_stats()
+
+    def cached_loader(self):
+        loader.find_template('vegancity/about.html')
+        return loader.template_source_loaders[0]
+
+    def test_template_names(self):
+        names = templating.template_names()
+        self.assertIn('vegancity/vendor_detail.html', names)
+        self.assertIn('vegancity/partials/reviews_section.html', names)
+
+    def test_warm_templates(self):
+        self.assertGreater(templating.warm_templates(), 0)
+        cached = self.cached_loader().template_cache
+        self.assertIn('vegancity/vendor_detail.html', cached)
+        self.assertIn('vegancity/partials/reviews_section.html', cached)
+
+    def test_cached_templates_reused(self):
+        first = loader.get_template('vegancity/about.html')
+        self.assertIs(loader.get_template('vegancity/about.html'), first)
+
+    @override_settings(TEMPLATE_TIMING=True)
+    def test_render_timing(self):
+        self.client.get('/about/')
+        stats = templating.render_stats()
+        self.assertEqual(stats['vegancity/about.html']['count'], 1)
+        # templates rendered by {% extends %} are timed too
+        self.assertIn('base_page.html', stats)
+
+    def test_render_timing_off(self):
+        self.client.get('/about/')
+        self.assertEqual(templating.render_stats(), {})
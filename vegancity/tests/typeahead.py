@@ -0,0 +1,100 @@
+import json
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vegancity import typeahead
+from vegancity.fields import StatusField as SF
+from vegancity.models import CuisineTag, Vendor, VeganDish
+
+
+class SuggestTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        typeahead.prefix_cache.clear()
+        self.blackbird = Vendor.objects.create(name="Blackbird Pizzeria",
+                                               approval_status=SF.APPROVED)
+        self.black_cat = Vendor.objects.create(name="Black Cat Cafe",
+                                               approval_status=SF.APPROVED)
+        Vendor.objects.create(name="Blackwell Diner",
+                              approval_status=SF.PENDING)
+        self.dish = VeganDish.objects.create(name="seitan cheesesteak")
+        self.tag = CuisineTag.objects.create(name="pizza",
+                                             description="Pizza")
+
+    def names(self, query, **kwargs):
+        return [s['name'] for s in typeahead.suggest(query, **kwargs)]
+
+    def test_prefix(self):
+        self.assertEqual(self.names("black"),
+                         ["Black Cat Cafe", "Blackbird Pizzeria"])
+
+    def test_typo(self):
+        self.assertEqual(self.names("blakbird pizeria"),
+                         ["Blackbird Pizzeria"])
+
+    def test_prefix_ranks_first(self):
+        self.assertEqual(self.names("pizz")[0], "Pizza")
+
+    def test_dishes_and_tags(self):
+        suggestions = typeahead.suggest("cheesesteak")
+        self.assertEqual(suggestions[0]['type'], 'dish')
+        self.assertEqual(suggestions[0]['url'], reverse('vendors') +
+                         '?current_query=seitan+cheesesteak')
+
+        tag = [s for s in typeahead.suggest("pizza")
+               if s['type'] == 'cuisine']
+        self.assertEqual(tag[0]['url'],
+                         reverse('vendors') + '?cuisine_tag=%d' % self.tag.pk)
+
+    def test_vendor_url(self):
+        suggestion = typeahead.suggest("blackbird")[0]
+        self.assertEqual(suggestion['url'], self.blackbird.get_absolute_url())
+
+    def test_limit(self):
+        self.assertEqual(self.names("black", limit=1), ["Black Cat Cafe"])
+
+    def test_like_wildcards_escaped(self):
+        self.assertEqual(self.names("%"), [])
+
+    def test_short_query_cached(self):
+        self.names("bla")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names(" BLA "),
+                             ["Black Cat Cafe", "Blackbird Pizzeria"])
+        self.assertEqual(len(queries), 0)
+
+    def test_cache_invalidated_on_save(self):
+        self.names("bla")
+        Vendor.objects.create(name="Blaze Burgers",
+                              approval_status=SF.APPROVED)
+        self.assertIn("Blaze Burgers", self.names("bla"))
+
+
+class TypeaheadViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        typeahead.prefix_cache.clear()
+        Vendor.objects.create(name="Blackbird Pizzeria",
+                              approval_status=SF.APPROVED)
+
+    def get(self, **params):
+        response = self.client.get(reverse('vendor_typeahead'), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content)['suggestions']
+
+    def test_suggestions(self):
+        suggestions = self.get(q="blackb")
+        self.assertEqual([s['name'] for s in suggestions],
+                         ["Blackbird Pizzeria"])
+
+    def test_empty_query(self):
+        self.assertEqual(self.get(q=""), [])
+
+    def test_bad_limit(self):
+        self.assertEqual(len(self.get(q="blackb", limit="lots")), 1)
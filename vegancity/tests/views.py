@@ -1,8 +1,11 @@
+from django.db import connection
 from django.test import TestCase
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from vegancity import views
 from vegancity.models import Vendor, Neighborhood
+from vegancity.tests.api import create_reviewed_vendor
 from vegancity.tests.utils import get_user
 from vegancity.fields import StatusField as SF
 
@@ -39,6 +42,48 @@ class VendorViewTest(ViewTestCase):
                          Vendor.objects.filter(name="test123").count())
 
 
+class VendorDetailUrlTest(TestCase):
+
+    def setUp(self):
+        self.vendor = Vendor.objects.create(name="Blackbird Pizzeria",
+                                            approval_status=SF.APPROVED)
+
+    def assertFinds(self, url):
+        response = self.client.get(url)
+        self.assertRedirects(response, self.vendor.get_absolute_url(),
+                             status_code=301)
+
+    def test_id_and_slug(self):
+        response = self.client.get(self.vendor.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['vendor'], self.vendor)
+
+    def test_redirect_keeps_query(self):
+        response = self.client.get('/vendors/%d/' % self.vendor.pk,
+                                   {'page': '2'})
+        self.assertEqual(response['Location'],
+                         'http://testserver%s?page=2'
+                         % self.vendor.get_absolute_url())
+
+    def test_id(self):
+        self.assertFinds('/vendors/%d/' % self.vendor.pk)
+
+    def test_slug(self):
+        self.assertFinds('/vendors/blackbird-pizzeria/')
+
+    def test_old_slug(self):
+        self.assertFinds('/vendors/%d-blackbird/' % self.vendor.pk)
+
+    def test_slug_starting_with_digits(self):
+        self.vendor = Vendor.objects.create(name="2nd Street Cafe",
+                                            approval_status=SF.APPROVED)
+        self.assertFinds('/vendors/2nd-street-cafe/')
+
+    def test_unknown(self):
+        response = self.client.get('/vendors/nowhere/')
+        self.assertEqual(response.status_code, 404)
+
+
 class HomeViewTest(ViewTestCase):
     def test_home_view_empty(self):
         request = self.factory.get('')
@@ -77,3 +122,17 @@ class HomeViewTest(ViewTestCase):
         self.assertEqual(list(ctx['top_5']), [])
         self.assertEqual(list(ctx['recently_added']), [t2, t1])
         self.assertEqual(list(ctx['neighborhoods']), [n2])
+
+    def home_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_home_queries_dont_grow_with_vendors(self):
+        # the vendors in the panels are linked without a query each
+        create_reviewed_vendor("vendor 0", self.user)
+        queries = self.home_queries()
+        for i in range(1, 5):
+            create_reviewed_vendor("vendor %d" % i, self.user)
+        self.assertEqual(self.home_queries(), queries)
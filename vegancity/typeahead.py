@@ -0,0 +1,140 @@
+# Copyright (C) 2014 Steve Lamb
+
+# This file is part of Vegancity.
+
+# Vegancity is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Vegancity is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Typeahead suggestions for the search box.
+
+Vendor names, dish names and tag descriptions are matched with pg_trgm,
+so that a typo still finds its vendor, and all four are searched with
+a single query against the trigram indexes added in migration 0026.
+
+Short queries are where trigrams help least and where nearly every
+keystroke lands, so their suggestions are also kept in a small
+in-process cache.
+"""
+
+import urllib
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+
+from vegancity import caching
+from vegancity.fields import StatusField
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+# queries up to this long are cached in-process
+PREFIX_CACHE_LENGTH = 4
+PREFIX_CACHE_SIZE = 1000
+
+SUGGEST_SQL = """
+SELECT type, id, name, slug FROM (
+    SELECT 'vendor' AS type, id, name, slug,
+           similarity(name, %(query)s) +
+           CASE WHEN lower(name) LIKE %(prefix)s THEN 1 ELSE 0 END AS score
+    FROM vegancity_vendor
+    WHERE approval_status = %(approved)s
+    AND (name %% %(query)s OR name ILIKE %(contains)s)
+  UNION ALL
+    SELECT 'dish', id, name, NULL,
+           similarity(name, %(query)s) +
+           CASE WHEN lower(name) LIKE %(prefix)s THEN 1 ELSE 0 END
+    FROM vegancity_vegandish
+    WHERE name %% %(query)s OR name ILIKE %(contains)s
+  UNION ALL
+    SELECT 'cuisine', id, description, NULL,
+           similarity(description, %(query)s) +
+           CASE WHEN lower(description) LIKE %(prefix)s THEN 1 ELSE 0 END
+    FROM vegancity_cuisinetag
+    WHERE description %% %(query)s OR description ILIKE %(contains)s
+  UNION ALL
+    SELECT 'feature', id, description, NULL,
+           similarity(description, %(query)s) +
+           CASE WHEN lower(description) LIKE %(prefix)s THEN 1 ELSE 0 END
+    FROM vegancity_featuretag
+    WHERE description %% %(query)s OR description ILIKE %(contains)s
+) AS suggestions
+ORDER BY score DESC, name
+LIMIT %(limit)s
+"""
+
+
+prefix_cache = caching.LRUCache(PREFIX_CACHE_SIZE)
+
+
+def normalize(query):
+    return u' '.join(query.lower().split())
+
+
+def _escape_like(value):
+    return (value.replace('\\', '\\\\')
+            .replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+def _url(kind, pk, name, slug):
+    # imported here to keep this module importable from vegancity.models
+    from vegancity.models import Vendor
+
+    if kind == 'vendor':
+        return Vendor(pk=pk, name=name, slug=slug).get_absolute_url()
+    params = {
+        'dish': {'current_query': name.encode('utf-8')},
+        'cuisine': {'cuisine_tag': pk},
+        'feature': {'feature_tag': pk},
+    }[kind]
+    return '%s?%s' % (reverse('vendors'), urllib.urlencode(params))
+
+
+def _query(query, limit):
+    escaped = _escape_like(query)
+    cursor = connection.cursor()
+    cursor.execute(SUGGEST_SQL, {
+        'query': query,
+        'prefix': escaped + '%',
+        'contains': '%' + escaped + '%',
+        'approved': StatusField.APPROVED,
+        'limit': limit,
+    })
+    return [{'type': kind, 'id': pk, 'name': name,
+             'url': _url(kind, pk, name, slug)}
+            for kind, pk, name, slug in cursor.fetchall()]
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """
+    Return up to limit suggestions for query, best first, as dicts of
+    type ('vendor', 'dish', 'cuisine' or 'feature'), id, name and url.
+    Names that start with the query rank above those that only
+    resemble it.
+    """
+    query = normalize(query)
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+
+    if len(query) > PREFIX_CACHE_LENGTH:
+        return _query(query, limit)
+
+    # keyed on the data version so that edits show up straight away
+    key = (caching.get_data_version(), query, limit)
+    suggestions = prefix_cache.get(key)
+    if suggestions is None:
+        suggestions = _query(query, limit)
+        prefix_cache.set(key, suggestions)
+    return suggestions
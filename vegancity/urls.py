@@ -29,19 +29,24 @@ urlpatterns = patterns(
     url(r'^grappelli/', include('grappelli.urls')),
     url(r'^admin/pending_approval/$', 'vegancity.admin_views.pending_approval', name="pending_approval"),
     url(r'^admin/pending_approval/count/$', 'vegancity.admin_views.pending_approval_count', name="pending_approval_count"),
+    url(r'^admin/pending_approval/action/$', 'vegancity.admin_views.pending_approval_action', name="pending_approval_action"),
+    url(r'^admin/pending_approval/(?P<queue_name>vendors|reviews)/$', 'vegancity.admin_views.pending_approval_queue', name="pending_approval_queue"),
     url(r'^admin/mailing_list/$', 'vegancity.admin_views.mailing_list', name="mailing_list"),
     url(r'^admin/vendor_list/$', 'vegancity.admin_views.vendor_list', name="vendor_list"),
+    url(r'^admin/review_list/$', 'vegancity.admin_views.review_list', name="review_list"),
+    url(r'^admin/vendor_ratings/$', 'vegancity.admin_views.vendor_ratings', name="vendor_ratings"),
     url(r'^admin/', include(admin.site.urls)),
 
     url(r'^$', views.home, name='home'),
     url(r'^vendors/$', views.vendors, name="vendors"),
+    url(r'^vendors/typeahead/$', views.vendor_typeahead, name="vendor_typeahead"),
     url(r'^vendors/add/$', views.new_vendor, name="new_vendor"),
     url(r'^vendors/add/thanks/$', views.VendorThanksView.as_view(), name="vendor_thanks"),
     url(r'^vendors/review/(?P<vendor_id>\d+)/$', views.new_review, name="new_review"),
-    url(r'^vendors/(?P<pk>\d+)(-[\w\d]+)*/$', views.vendor_detail, name="vendor_detail"),
+    url(r'^vendors/(?P<key>[-\w]+)/$', views.vendor_detail, name="vendor_detail"),
     url(r'^connect/$', views.ConnectView.as_view(), name='connect'),
-    url(r'^about/$', views.AboutView.as_view(), name='about'),
-    url(r'^privacy/$', views.PrivacyView.as_view(), name='privacy'),
+    url(r'^about/$', views.about, name='about'),
+    url(r'^privacy/$', views.privacy, name='privacy'),
     url(r'^vendors/review/(?P<pk>\d+)/thanks/$', views.ReviewThanksView.as_view(), name="review_thanks"),
 
     url(r'^accounts/login/$',  'django.contrib.auth.views.login', name='login'),
@@ -16,9 +16,12 @@
 # along with Vegancity.  If not, see <http://www.gnu.org/licenses/>.
 
 import functools
+import json
 import logging
 
-from django.http import HttpResponseRedirect, Http404
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponsePermanentRedirect, HttpResponseRedirect,
+                         Http404)
 from django.shortcuts import render_to_response, get_object_or_404, redirect
 from django.template import RequestContext
 from django.core.urlresolvers import reverse
@@ -30,10 +33,16 @@ from django.conf import settings
 
 import django.contrib.auth.views
 
+from tastypie.exceptions import BadRequest
+
 from vegancity import forms
 from vegancity.models import (Vendor, CuisineTag, FeatureTag,
                               Neighborhood, User, Review)
-from vegancity import search
+from vegancity import fragments, panels, profiles, search, typeahead
+from vegancity.conditional import (conditional_page, data_etag,
+                                   data_last_modified, vendor_etag,
+                                   vendor_last_modified)
+from vegancity.pagecache import cache_anonymous_page
 from vegancity.fields import StatusField as SF
 
 search_logger = logging.getLogger('vegancity-search')
@@ -51,79 +60,101 @@ def password_change(request):
     return response
 
 
-def _get_home_context(request):
-    vendors = Vendor.objects.approved().all()
-
-    random_unreviewed = (Vendor
-                         .objects.approved()
-                         .get_random_unreviewed()
-                         if request.user.is_authenticated()
-                         else None)
-
-    # it would be cooler to include these queries with the model
-    # manager, but they are tiled to the presentation logic because
-    # they only get id and name, the necessary fields.
-    annotated_vendor_select = (
-        lambda query_prefix:
-        # TODO: remove string values
-        Vendor.objects.raw(
-            """
-            SELECT V.id, V.name
-            FROM vegancity_vendor V LEFT OUTER JOIN vegancity_review R
-            ON V.id = R.vendor_id
-            WHERE V.approval_status = '%(approved)s'
-            AND R.approval_status='%(approved)s'
-            %(query_prefix)s
-            LIMIT 5
-            """ % {'approved': SF.APPROVED,
-                   'query_prefix': query_prefix}))
-
-    top_5 = annotated_vendor_select(
+# it would be cooler to include these queries with the model
+# manager, but they are tiled to the presentation logic because
+# they only get id, name and slug, the necessary fields.
+def _annotated_vendor_select(query_prefix):
+    # TODO: remove string values
+    return list(Vendor.objects.raw(
+        """
+        SELECT V.id, V.name, V.slug
+        FROM vegancity_vendor V LEFT OUTER JOIN vegancity_review R
+        ON V.id = R.vendor_id
+        WHERE V.approval_status = '%(approved)s'
+        AND R.approval_status='%(approved)s'
+        %(query_prefix)s
+        LIMIT 5
+        """ % {'approved': SF.APPROVED,
+               'query_prefix': query_prefix}))
+
+
+def _top_5(request):
+    return _annotated_vendor_select(
         """
         AND (NOT R.food_rating IS NULL)
         AND (NOT R.atmosphere_rating IS NULL)
-        GROUP BY V.id, V.name
+        GROUP BY V.id, V.name, V.slug
         ORDER BY avg(R.food_rating) DESC, avg(R.atmosphere_rating) DESC,
         count(R.id) DESC, name
         """)
 
-    recently_active = annotated_vendor_select(
+
+def _recently_active(request):
+    return _annotated_vendor_select(
         """
-        GROUP BY V.id, V.name
+        GROUP BY V.id, V.name, V.slug
         ORDER BY max(R.created) DESC
         """)
 
-    recently_added = (vendors.exclude(created=None)
-                      .order_by('-created')[:5])
 
-    most_reviewed = Vendor.objects.approved().with_reviews()[:5]
+def _recently_added(request):
+    return list(Vendor.objects.approved().exclude(created=None)
+                .order_by('-created')[:5])
 
-    neighborhoods = Neighborhood.objects.with_vendors()[:21]
 
-    cuisine_tags = CuisineTag.objects.with_vendors()[:21]
+def _most_reviewed(request):
+    return list(Vendor.objects.approved().with_reviews()[:5])
 
-    feature_tags = FeatureTag.objects.with_vendors()[:21]
 
-    ctx = {
-        'top_5': top_5,
-        'most_reviewed': most_reviewed,
-        'recently_added': recently_added,
-        'recently_active': recently_active,
-        'neighborhoods': neighborhoods,
-        'cuisine_tags': cuisine_tags,
-        'feature_tags': feature_tags,
-        'random_unreviewed': random_unreviewed,
-    }
+def _neighborhoods(request):
+    return list(Neighborhood.objects.with_vendors()[:21])
+
+
+def _cuisine_tags(request):
+    return list(CuisineTag.objects.with_vendors()[:21])
+
+
+def _feature_tags(request):
+    return list(FeatureTag.objects.with_vendors()[:21])
+
 
+def _random_unreviewed(request):
+    return Vendor.objects.approved().get_random_unreviewed()
+
+
+HOME_PANELS = (
+    ('top_5', _top_5),
+    ('recently_active', _recently_active),
+    ('recently_added', _recently_added),
+    ('most_reviewed', _most_reviewed),
+    ('neighborhoods', _neighborhoods),
+    ('cuisine_tags', _cuisine_tags),
+    ('feature_tags', _feature_tags),
+)
+
+
+def _get_home_context(request):
+    # the panels don't depend on each other, so they are loaded at the
+    # same time, see vegancity.panels.
+    if request.user.is_authenticated():
+        ctx = panels.load(request, HOME_PANELS + (('random_unreviewed',
+                                                   _random_unreviewed),))
+    else:
+        ctx = panels.load(request, HOME_PANELS)
+        ctx['random_unreviewed'] = None
     return ctx
 
 
+@conditional_page(data_etag, data_last_modified)
+@cache_anonymous_page(lists=(Vendor, Review, Neighborhood, CuisineTag,
+                             FeatureTag))
 def home(request):
     return render_to_response("vegancity/home.html",
                               _get_home_context(request),
                               context_instance=RequestContext(request))
 
 
+@cache_anonymous_page()
 def user_profile(request, username):
     if username is None:
         if request.user.username == '':
@@ -132,16 +163,25 @@ def user_profile(request, username):
             return redirect('user_profile', username=request.user.username)
     else:
         profile_user = get_object_or_404(User, username=username)
-        approved_reviews = (Review.objects.approved()
-                            .filter(author=profile_user)
-                            .order_by('-created'))
+        try:
+            approved_reviews, next_page = profiles.review_page(profile_user,
+                                                               request.GET)
+        except BadRequest as e:
+            return HttpResponseBadRequest(str(e))
         return render_to_response(
             'vegancity/profile_page.html',
             {'profile_user': profile_user,
-             'approved_reviews': approved_reviews},
+             'review_stats': profiles.review_stats(profile_user),
+             'approved_reviews': approved_reviews,
+             'next_page': next_page},
             context_instance=RequestContext(request))
 
 
+# searches aren't cached, so that they are all logged
+@conditional_page(data_etag, data_last_modified,
+                  uncached_params=('current_query',))
+@cache_anonymous_page(lists=(Vendor, Neighborhood, CuisineTag, FeatureTag),
+                      uncached_params=('current_query',))
 def vendors(request):
     has_get_params = len(request.GET) > 0
     center_latitude, center_longitude = settings.DEFAULT_CENTER
@@ -199,6 +239,17 @@ def vendors(request):
                               context_instance=RequestContext(request))
 
 
+def vendor_typeahead(request):
+    "Suggestions for the search box, as JSON."
+    try:
+        limit = int(request.GET.get('limit', typeahead.DEFAULT_LIMIT))
+    except ValueError:
+        limit = typeahead.DEFAULT_LIMIT
+    suggestions = typeahead.suggest(request.GET.get('q', ''), limit)
+    return HttpResponse(json.dumps({'suggestions': suggestions}),
+                        content_type='application/json')
+
+
 ###########################
 ## data entry views
 ###########################
@@ -362,9 +413,21 @@ def account_edit(request):
                               context_instance=RequestContext(request))
 
 
-def vendor_detail(request, pk):
-    vendor = get_object_or_404(Vendor.objects.approved(), pk=pk)
-    approved_reviews = vendor.approved_reviews()
+@conditional_page(vendor_etag, vendor_last_modified)
+@cache_anonymous_page()
+def vendor_detail(request, key):
+    vendor = Vendor.objects.approved().get_by_url_key(key)
+    if vendor is None:
+        raise Http404
+    # one url per vendor: ids alone, slugs alone and old slugs redirect
+    canonical_url = vendor.get_absolute_url()
+    if request.path != canonical_url:
+        query = request.META.get('QUERY_STRING')
+        return HttpResponsePermanentRedirect(
+            canonical_url + ('?' + query if query else ''))
+    approved_reviews = fragments.with_html(
+        vendor.approved_reviews()
+        .select_related('author', 'vendor', 'best_vegan_dish'))
     return render_to_response('vegancity/vendor_detail.html',
                               {'vendor': vendor,
                                'approved_reviews': approved_reviews},
@@ -387,6 +450,10 @@ class PrivacyView(TemplateView):
     template_name = 'vegancity/privacy.html'
 
 
+about = cache_anonymous_page()(AboutView.as_view())
+privacy = cache_anonymous_page()(PrivacyView.as_view())
+
+
 class ReviewThanksView(DetailView):
     template_name = 'vegancity/review_thanks.html'
     model = Vendor